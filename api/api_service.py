@@ -5,22 +5,43 @@ This module provides the API endpoints for the GitEvents application.
 """
 
 import os
+import io
+import csv
 import json
 import logging
-from typing import Dict, Any, Optional, List
+import datetime
+from typing import Dict, Any, Iterator, Optional, List
 from fastapi import FastAPI, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from db.db_manager import DatabaseManager
+from db.db_manager import DatabaseManager, EXPORT_COLUMNS, shared_database_manager
+from api.rate_limiter import RateLimitMiddleware
+from api.settings_service import settings_service
+from managers.lifecycle import lifecycle, shutdown_on_exit, CLOSE
+from api.health import health_router
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="GitEvents API", description="API for GitEvents application")
+app = FastAPI(title="GitEvents API", description="API for GitEvents application", lifespan=shutdown_on_exit)
+
+# Added before CORS so that 429/503 responses still carry CORS headers
+app.add_middleware(
+    RateLimitMiddleware,
+    max_concurrent=int(os.getenv("API_MAX_CONCURRENT_REQUESTS", 8)),
+    rate=float(os.getenv("API_RATE_LIMIT", 10)),
+    burst=int(os.getenv("API_RATE_LIMIT_BURST", 40)),
+    queue_timeout=float(os.getenv("API_QUEUE_TIMEOUT", 10)),
+    # Webhook writes in another process (production mode) can't be waited for
+    ingestion_wait=float(os.getenv("API_INGESTION_WAIT", 2))
+    if os.getenv("GITEVENTS_INGESTION_IN_PROCESS", "true").lower() == "true" else 0,
+    trusted_proxies=os.getenv("API_TRUSTED_PROXIES", "").split(","),
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -30,19 +51,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-db_type = os.getenv("DB_TYPE", "SQLite").lower()
-if db_type == "sqlite":
-    db_path = os.getenv("GITHUB_EVENTS_DB", "github_events.db")
-    db_manager = DatabaseManager(db_path)
-else:
-    db_manager = DatabaseManager(
-        db_name=os.getenv("DB_NAME", "github_events"),
-        db_type="mysql",
-        db_host=os.getenv("DB_HOST", "localhost"),
-        db_port=int(os.getenv("DB_PORT", 3306)),
-        db_user=os.getenv("DB_USER", "admin"),
-        db_password=os.getenv("DB_PASSWORD", "password")
-    )
+app.include_router(health_router)
+
+# Shared with the webhook handler when both apps run in one process
+db_manager = shared_database_manager()
+lifecycle.register("database", db_manager.close, stage=CLOSE)
+
+DB_SETTINGS_KEYS = ["DB_TYPE", "GITHUB_EVENTS_DB", "DB_HOST", "DB_PORT", "DB_NAME", "DB_USER", "DB_PASSWORD"]
+
+def apply_db_settings(changes: Dict[str, Optional[str]]) -> None:
+    """Reconnect when the database settings in .env no longer match the current connection"""
+    settings = settings_service.get_settings()
+    if settings["db_type"].lower() == "sqlite":
+        config = {"type": "sqlite", "path": settings["github_events_db"]}
+        unchanged = db_manager.db_type.lower() == "sqlite" and db_manager.db_path == config["path"]
+    else:
+        config = {
+            "type": "mysql",
+            "host": settings["db_host"],
+            "port": settings["db_port"],
+            "name": settings["db_name"],
+            "user": settings["db_user"],
+            "password": settings["db_password"],
+        }
+        current = (db_manager.db_host, str(db_manager.db_port), db_manager.db_name,
+                   db_manager.db_user, db_manager.db_password)
+        unchanged = db_manager.db_type.lower() == "mysql" and current == (
+            config["host"], str(config["port"]), config["name"], config["user"], config["password"])
+    if not unchanged:
+        logger.info("Database settings changed, reconnecting")
+        db_manager.update_db_config(config)
+
+settings_service.subscribe(apply_db_settings, keys=DB_SETTINGS_KEYS)
 
 class SettingsUpdate(BaseModel):
     github_token: Optional[str] = None
@@ -90,8 +130,6 @@ async def update_database_config(config: DatabaseConfig):
         config_dict = config.dict()
         result = db_manager.update_db_config(config_dict)
         
-        from api.settings_service import settings_service
-        
         settings_update = {
             "db_type": config.type
         }
@@ -126,7 +164,6 @@ async def create_sqlite_database(db_path: str = Query(...)):
         new_db_manager = DatabaseManager(db_path)
         result = new_db_manager.initialize_database()
         
-        from api.settings_service import settings_service
         settings_service.update_settings({
             "db_type": "SQLite",
             "github_events_db": db_path
@@ -140,7 +177,6 @@ async def create_sqlite_database(db_path: str = Query(...)):
 @app.get("/api/settings")
 async def get_settings():
     try:
-        from api.settings_service import settings_service
         settings = settings_service.get_settings()
         
         dev_mode = os.getenv("DEV_MODE", "false").lower() == "true"
@@ -163,8 +199,6 @@ async def get_settings():
 @app.post("/api/settings")
 async def update_settings(settings: SettingsUpdate):
     try:
-        from api.settings_service import settings_service
-        
         settings_dict = {k: v for k, v in settings.dict().items() if v is not None}
         
         result = settings_service.update_settings(settings_dict)
@@ -262,15 +296,162 @@ async def get_settings_status():
         logger.error(f"Error getting settings status: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get settings status: {str(e)}")
 
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Split a comma-separated `fields` parameter; None means all fields"""
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(",") if field.strip()] or None
+
+@app.get("/api/events/pr")
+async def get_pr_events(limit: int = Query(10, ge=1, le=100), fields: Optional[str] = Query(None)):
+    try:
+        return db_manager.get_recent_pr_events(limit, _parse_fields(fields))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error retrieving PR events: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/events/branch")
+async def get_branch_events(limit: int = Query(10, ge=1, le=100), fields: Optional[str] = Query(None)):
+    try:
+        return db_manager.get_recent_branch_events(limit, _parse_fields(fields))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error retrieving branch events: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/events/push")
+async def get_push_events(limit: int = Query(10, ge=1, le=100), fields: Optional[str] = Query(None)):
+    try:
+        return db_manager.get_recent_push_events(limit, _parse_fields(fields))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error retrieving push events: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/events/all")
-async def get_all_events(limit: int = Query(30, ge=1, le=100)):
+async def get_all_events(limit: int = Query(30, ge=1, le=100), fields: Optional[str] = Query(None)):
     try:
-        events = db_manager.get_all_events(limit)
+        events = db_manager.get_all_events(limit, _parse_fields(fields))
         return events
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error retrieving all events: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/search")
+async def search_events(
+    q: str = Query(..., min_length=1, max_length=200),
+    repo: Optional[List[str]] = Query(None),
+    type: Optional[str] = Query(None, pattern="^(pull_request|commit)$"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    try:
+        return db_manager.search(q, repos=repo, doc_type=type, limit=limit, offset=offset)
+    except Exception as e:
+        logger.error(f"Error searching events: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+def _stream_ndjson(rows: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    chunk = []
+    size = 0
+    for row in rows:
+        line = json.dumps(row, default=_export_value) + "\n"
+        chunk.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield "".join(chunk)
+
+def _stream_csv(rows: Iterator[Dict[str, Any]], columns: List[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({
+            key: json.dumps(value) if isinstance(value, (dict, list)) else _export_value(value)
+            for key, value in row.items()
+        })
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+@app.get("/api/export/{category}")
+async def export_events(
+    category: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    since: Optional[datetime.datetime] = Query(None),
+    until: Optional[datetime.datetime] = Query(None),
+    repo: Optional[str] = Query(None)
+):
+    if category not in EXPORT_COLUMNS:
+        raise HTTPException(status_code=404, detail=f"Unknown event category: {category}")
+    
+    rows = db_manager.iter_events_for_export(category, since=since, until=until, repo=repo)
+    filename = f"{category}_events.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    
+    if format == "csv":
+        columns = [column.key for column in EXPORT_COLUMNS[category]]
+        return StreamingResponse(_stream_csv(rows, columns), media_type="text/csv", headers=headers)
+    return StreamingResponse(_stream_ndjson(rows), media_type="application/x-ndjson", headers=headers)
+
+@app.get("/api/analytics/activity")
+async def get_activity(
+    repo: Optional[str] = Query(None),
+    granularity: str = Query("hour", pattern="^(hour|day|weekday_hour)$"),
+    category: Optional[str] = Query(None, pattern="^(pull_request|branch|push)$"),
+    since: Optional[datetime.datetime] = Query(None),
+    until: Optional[datetime.datetime] = Query(None)
+):
+    try:
+        return db_manager.get_activity(repo, granularity, category, since, until)
+    except Exception as e:
+        logger.error(f"Error retrieving activity: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/post-merge/jobs")
+async def get_post_merge_jobs(
+    status: Optional[str] = Query(None, pattern="^(queued|running|succeeded|failed|timed_out)$"),
+    repo: Optional[str] = Query(None),
+    project: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0)
+):
+    try:
+        return db_manager.get_script_jobs(status=status, repo=repo, project=project, limit=limit, offset=offset)
+    except Exception as e:
+        logger.error(f"Error retrieving post-merge jobs: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/post-merge/jobs/{job_id}")
+async def get_post_merge_job(job_id: int):
+    try:
+        job = db_manager.get_script_job(job_id)
+    except Exception as e:
+        logger.error(f"Error retrieving post-merge job {job_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Post-merge job {job_id} not found")
+    return job
+
 @app.get("/api/repos")
 async def get_repositories():
     try:
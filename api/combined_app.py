@@ -0,0 +1,105 @@
+"""
+Combined App for GitEvents
+
+Serves the API and the GitHub webhook endpoints from a single ASGI app, for
+small deployments that would rather run one server process:
+
+    uvicorn api.combined_app:app --port 8001
+    (or python main.py --combined)
+
+Requests under /webhook go to the webhook app and everything else to the API
+app, so each keeps its own middleware (the API's rate limiter only ever sees
+API traffic). Both apps use the process-wide DatabaseManager, so there is one
+engine, connection pool and search index.
+"""
+
+import asyncio
+import logging
+from typing import Dict, List
+
+from api.api_service import app as api_app
+from api.webhook_handler import app as webhook_app
+
+logger = logging.getLogger(__name__)
+
+class PathDispatcher:
+    """
+    ASGI app routing requests by path prefix, falling back to a default app.
+    Lifespan events are passed on to every app, starting them in order and
+    shutting them down in reverse order.
+    """
+
+    def __init__(self, default, routes: Dict[str, object]):
+        self.default = default
+        self.routes = sorted(routes.items(), key=lambda item: len(item[0]), reverse=True)
+        self.apps: List[object] = [default] + [app for _, app in routes.items() if app is not default]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(scope, receive, send)
+            return
+        path = scope.get("path", "")
+        for prefix, app in self.routes:
+            if path == prefix or path.startswith(prefix.rstrip("/") + "/"):
+                await app(scope, receive, send)
+                return
+        await self.default(scope, receive, send)
+
+    async def _lifespan(self, scope, receive, send):
+        started = []
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            for app in self.apps:
+                runner = _LifespanRunner(app, scope)
+                result = await runner.startup()
+                if result["type"] != "lifespan.startup.complete":
+                    for other in reversed(started):
+                        await other.shutdown()
+                    await send({"type": "lifespan.startup.failed", "message": result.get("message", "")})
+                    return
+                started.append(runner)
+            await send({"type": "lifespan.startup.complete"})
+            message = await receive()
+
+        if message["type"] == "lifespan.shutdown":
+            for runner in reversed(started):
+                await runner.shutdown()
+            await send({"type": "lifespan.shutdown.complete"})
+
+
+class _LifespanRunner:
+    """Drives one app's lifespan protocol from inside the dispatcher's"""
+
+    def __init__(self, app, scope):
+        self.app = app
+        self.scope = scope
+        self._inbox: asyncio.Queue = asyncio.Queue()
+        self._outbox: asyncio.Queue = asyncio.Queue()
+        self._task = None
+
+    async def _exchange(self, message: dict) -> dict:
+        await self._inbox.put(message)
+        reply = asyncio.ensure_future(self._outbox.get())
+        await asyncio.wait({reply, self._task}, return_when=asyncio.FIRST_COMPLETED)
+        if reply.done():
+            return reply.result()
+        reply.cancel()
+        # The app returned without answering: it doesn't use lifespan events
+        error = self._task.exception()
+        if error is not None:
+            logger.debug(f"Lifespan not supported by {self.app}: {error}")
+        return {"type": f"{message['type']}.complete"}
+
+    async def startup(self) -> dict:
+        self._task = asyncio.ensure_future(self.app(self.scope, self._inbox.get, self._outbox.put))
+        return await self._exchange({"type": "lifespan.startup"})
+
+    async def shutdown(self) -> dict:
+        if self._task.done():
+            return {"type": "lifespan.shutdown.complete"}
+        result = await self._exchange({"type": "lifespan.shutdown"})
+        await asyncio.wait({self._task}, timeout=5)
+        return result
+
+
+app = PathDispatcher(api_app, {"/webhook": webhook_app})
@@ -0,0 +1,154 @@
+"""
+Health Checks for GitEvents
+
+`/health/live` answers as long as the process can serve requests.
+`/health/ready` checks what the app needs to do useful work and answers 503
+when a check fails, so a load balancer stops sending it traffic:
+
+- database: can the database take a write right now (SQLite write lock,
+  MySQL round trip), within HEALTH_DB_TIMEOUT seconds
+- ingestion: webhook writes in progress and the p95 latency of recent writes
+  (of this process; not checked where no webhooks are ingested, e.g. the
+  API processes in production mode)
+- post_merge_jobs: queued jobs and how long the oldest has waited (spool lag)
+- plus checks registered by other modules (e.g. the webhook handler's branch/PR tasks)
+
+Probe results are cached for HEALTH_CACHE_SECONDS and concurrent requests
+share one probe, so frequent load balancer checks don't add database load.
+Once shutdown has started the app is reported as not ready immediately.
+A threshold of 0 disables that limit.
+"""
+
+import os
+import time
+import logging
+import datetime
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from db.db_manager import ingestion_gate, shared_database_manager
+from managers.lifecycle import lifecycle
+
+logger = logging.getLogger(__name__)
+
+HealthCheck = Callable[[], Dict[str, Any]]
+
+class HealthChecker:
+    """Runs the readiness checks, caching the combined result for a short interval"""
+
+    def __init__(self, cache_seconds: Optional[float] = None, thresholds: Optional[Dict[str, float]] = None):
+        """Initialize with thresholds from the environment unless given"""
+        self.cache_seconds = cache_seconds if cache_seconds is not None else float(os.getenv("HEALTH_CACHE_SECONDS", 2))
+        self.thresholds = {
+            "db_timeout": float(os.getenv("HEALTH_DB_TIMEOUT", 1)),
+            "max_ingestion_backlog": int(os.getenv("HEALTH_MAX_INGESTION_BACKLOG", 50)),
+            "max_write_latency_ms": float(os.getenv("HEALTH_MAX_WRITE_LATENCY_MS", 2000)),
+            "max_queue_depth": int(os.getenv("HEALTH_MAX_QUEUE_DEPTH", 500)),
+            "max_spool_lag": float(os.getenv("HEALTH_MAX_SPOOL_LAG", 900)),
+        }
+        self.thresholds.update(thresholds or {})
+        self.started = time.time()
+        self._checks: Dict[str, Tuple[HealthCheck, Optional[str]]] = {}
+        self._lock = threading.Lock()
+        self._cached: Optional[Dict[str, Any]] = None
+        self._cached_at = 0.0
+
+    def add_check(self, name: str, check: HealthCheck, requires: Optional[str] = None) -> None:
+        """
+        Add a readiness check; `check()` returns a dict with an "ok" flag, and
+        raising counts as failing. With `requires`, the check is skipped (and
+        fails) when that earlier check failed, e.g. queries while the database is locked.
+        """
+        self._checks[name] = (check, requires)
+
+    def within(self, value: Optional[float], threshold_name: str) -> bool:
+        """Whether a measured value is within its threshold (always, if the threshold is 0)"""
+        limit = self.thresholds[threshold_name]
+        return not limit or value is None or value <= limit
+
+    def queue_check(self, depth: int) -> Dict[str, Any]:
+        """A check result for an in-memory queue of `depth` items"""
+        return {"ok": self.within(depth, "max_queue_depth"), "depth": depth}
+
+    def readiness(self) -> Dict[str, Any]:
+        """The combined check results, re-probed at most every `cache_seconds`"""
+        if self._cached is not None and time.monotonic() - self._cached_at < self.cache_seconds:
+            return self._cached
+        with self._lock:
+            # Requests that waited for another probe use its result
+            if self._cached is not None and time.monotonic() - self._cached_at < self.cache_seconds:
+                return self._cached
+            result = self._run_checks()
+            self._cached, self._cached_at = result, time.monotonic()
+            return result
+
+    def _run_checks(self) -> Dict[str, Any]:
+        checks = {}
+        for name, (check, requires) in list(self._checks.items()):
+            if requires and not checks.get(requires, {}).get("ok", False):
+                checks[name] = {"ok": False, "skipped": f"{requires} check failed"}
+                continue
+            started = time.monotonic()
+            try:
+                result = dict(check())
+            except Exception as e:
+                logger.warning(f"Readiness check {name} failed: {e}")
+                result = {"ok": False, "error": str(e)}
+            result["check_ms"] = round((time.monotonic() - started) * 1000, 1)
+            checks[name] = result
+        ready = all(result["ok"] for result in checks.values())
+        return {
+            "status": "ready" if ready else "not_ready",
+            "checked_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "checks": checks,
+        }
+
+    # Default checks
+
+    def check_database(self) -> Dict[str, Any]:
+        seconds = shared_database_manager().ping(timeout=self.thresholds["db_timeout"])
+        return {"ok": True, "latency_ms": round(seconds * 1000, 1)}
+
+    def check_ingestion(self) -> Dict[str, Any]:
+        backlog = ingestion_gate.active
+        latency = ingestion_gate.latency()
+        return {
+            "ok": self.within(backlog, "max_ingestion_backlog") and self.within(latency["p95_ms"], "max_write_latency_ms"),
+            "backlog": backlog,
+            **latency,
+        }
+
+    def check_post_merge_jobs(self) -> Dict[str, Any]:
+        backlog = shared_database_manager().get_script_job_backlog()
+        oldest = backlog["oldest_queued_at"]
+        lag = (datetime.datetime.utcnow() - oldest).total_seconds() if oldest else 0.0
+        return {
+            "ok": self.within(backlog["queued"], "max_queue_depth") and self.within(lag, "max_spool_lag"),
+            "queued": backlog["queued"],
+            "lag_seconds": round(lag, 1),
+        }
+
+# Shared by the apps in this process
+health = HealthChecker()
+health.add_check("database", health.check_database)
+if os.getenv("GITEVENTS_INGESTION_IN_PROCESS", "true").lower() == "true":
+    health.add_check("ingestion", health.check_ingestion)
+health.add_check("post_merge_jobs", health.check_post_merge_jobs, requires="database")
+
+health_router = APIRouter(tags=["health"])
+
+@health_router.get("/health/live")
+async def liveness():
+    """The process is up and serving requests"""
+    return {"status": "alive", "uptime_seconds": round(time.time() - health.started)}
+
+@health_router.get("/health/ready")
+def readiness():
+    """Whether the app can do useful work; 503 with the failing checks if not"""
+    if not lifecycle.accepting:
+        return JSONResponse(status_code=503, content={"status": "shutting_down"})
+    result = health.readiness()
+    return JSONResponse(status_code=200 if result["status"] == "ready" else 503, content=result)
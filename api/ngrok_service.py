@@ -1,10 +1,13 @@
 import os
 import logging
 import platform
+import threading
 import webbrowser
 from pyngrok import ngrok, conf
 from typing import Optional, Dict, Any
 
+from api.settings_service import settings_service
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -28,6 +31,15 @@ class NgrokService:
         if self.is_windows:
             logger.info("Running on Windows. Ngrok will use port 4040 for web interface.")
     
+    def apply_settings(self, changes: Dict[str, Optional[str]]) -> None:
+        """Use a changed NGROK_AUTH_TOKEN for tunnels opened from now on"""
+        token = changes.get("NGROK_AUTH_TOKEN")
+        if token == self.ngrok_auth_token:
+            return
+        self.ngrok_auth_token = token
+        conf.get_default().auth_token = token or None
+        logger.info("Ngrok auth token updated; reopen tunnels to use it")
+    
     def start_webhook_tunnel(self, port: int) -> Optional[str]:
         """Start ngrok tunnel for webhook endpoint"""
         try:
@@ -108,5 +120,27 @@ class NgrokService:
         except Exception as e:
             logger.error(f"Error closing ngrok tunnels: {e}")
 
-# Singleton instance
-ngrok_service = NgrokService()
+# Singleton instance, created on first use so that importing this module doesn't configure ngrok
+_ngrok_service: Optional[NgrokService] = None
+_ngrok_service_lock = threading.Lock()
+
+def get_ngrok_service() -> NgrokService:
+    """The shared NgrokService, created on first call"""
+    global _ngrok_service
+    if _ngrok_service is None:
+        with _ngrok_service_lock:
+            if _ngrok_service is None:
+                service = NgrokService()
+                settings_service.subscribe(service.apply_settings, keys=["NGROK_AUTH_TOKEN"])
+                _ngrok_service = service
+    return _ngrok_service
+
+def ngrok_service_started() -> bool:
+    """Whether the shared NgrokService exists (and so may have open tunnels)"""
+    return _ngrok_service is not None
+
+def __getattr__(name: str):
+    # Keeps `from api.ngrok_service import ngrok_service` working
+    if name == "ngrok_service":
+        return get_ngrok_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
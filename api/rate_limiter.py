@@ -0,0 +1,161 @@
+"""
+Rate Limiter for GitEvents
+
+This module provides an ASGI middleware that protects the shared database
+from read traffic: it caps the number of concurrent DB-bound requests,
+applies a token bucket per client, and holds reads back while webhook
+ingestion is writing.
+"""
+
+import asyncio
+import ipaddress
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple, Union
+
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+from db.db_manager import ingestion_gate
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def try_acquire(self, tokens: float = 1.0) -> Tuple[bool, float]:
+        """Take tokens if available. Returns (allowed, seconds until enough tokens)."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True, 0.0
+        return False, (tokens - self.tokens) / self.rate
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware limiting DB-bound requests under `path_prefix`.
+
+    - Each client gets a token bucket; requests over budget get 429 with
+      Retry-After. A rate of 0 disables this. Clients are identified by peer
+      address; X-Forwarded-For is only read when the peer is one of
+      `trusted_proxies` (addresses or CIDRs, e.g. 127.0.0.1 behind ngrok).
+    - At most `max_concurrent` requests run at once; others wait up to
+      `queue_timeout` seconds for a slot and then get 503.
+    - Before running, a request waits up to `ingestion_wait` seconds for
+      in-progress webhook ingestion writes to finish.
+    """
+
+    def __init__(self, app, max_concurrent: int = 8, rate: float = 10.0, burst: int = 40,
+                 queue_timeout: float = 10.0, ingestion_wait: float = 2.0,
+                 path_prefix: str = "/api/", max_clients: int = 10000,
+                 trusted_proxies: Optional[Iterable[str]] = None):
+        self.app = app
+        self.max_concurrent = max_concurrent
+        self.rate = rate
+        self.burst = burst
+        self.queue_timeout = queue_timeout
+        self.ingestion_wait = ingestion_wait
+        self.path_prefix = path_prefix
+        self.max_clients = max_clients
+        self.trusted_proxies: List[IPNetwork] = [
+            ipaddress.ip_network(proxy.strip(), strict=False) for proxy in trusted_proxies or [] if proxy.strip()
+        ]
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix) or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        if self.rate > 0:
+            client = self._client_key(scope)
+            allowed, retry_after = self._bucket_for(client).try_acquire()
+            if not allowed:
+                logger.warning(f"Rate limit exceeded for client {client} on {scope['path']}")
+                await self._reject(send, 429, "Rate limit exceeded", retry_after)
+                return
+
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"No free database slot for {scope['path']} after {self.queue_timeout}s")
+            await self._reject(send, 503, "Server busy, try again later", 1.0)
+            return
+
+        try:
+            await self._yield_to_ingestion()
+            await self.app(scope, receive, send)
+        finally:
+            self._semaphore.release()
+
+    async def _yield_to_ingestion(self) -> None:
+        """Wait (bounded) while webhook ingestion is writing to the database"""
+        deadline = time.monotonic() + self.ingestion_wait
+        while ingestion_gate.active and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+
+    def _bucket_for(self, client: str) -> TokenBucket:
+        """Get or create the token bucket for a client, evicting the least recently used"""
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+            self._buckets[client] = bucket
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket
+
+    def _is_trusted(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self.trusted_proxies)
+
+    def _client_key(self, scope) -> str:
+        """
+        Identify the client by peer address. Behind trusted proxies, use the
+        right-most X-Forwarded-For hop that isn't one of them: hops further
+        left are set by the client and can't be trusted.
+        """
+        client = scope.get("client")
+        peer = client[0] if client else "unknown"
+        if not self.trusted_proxies or not self._is_trusted(peer):
+            return peer
+
+        hops = []
+        for name, value in scope.get("headers", []):
+            if name == b"x-forwarded-for":
+                hops.extend(hop.strip() for hop in value.decode("latin-1").split(","))
+        for hop in reversed(hops):
+            if hop and not self._is_trusted(hop):
+                return hop
+        return peer
+
+    @staticmethod
+    async def _reject(send, status: int, detail: str, retry_after: float) -> None:
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -3,45 +3,87 @@ Settings Service for GitEvents
 
 This module provides functionality to manage application settings,
 including reading and updating the .env file.
+
+The parsed .env file is cached and only re-read when its mtime or size
+changes. Updates rewrite the file once, atomically, however many keys
+change. Components that depend on a setting can `subscribe` to be told
+when it changes instead of re-reading the environment.
 """
 
 import os
 import re
+import tempfile
+import threading
 from pathlib import Path
-from typing import Dict, Any, Optional
-from dotenv import load_dotenv, set_key
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
+from dotenv import dotenv_values
 import logging
 
 logger = logging.getLogger(__name__)
 
+ENV_LINE_PATTERN = re.compile(r"^\s*(?:export\s+)?([A-Za-z_][A-Za-z0-9_.]*)\s*=")
+
+SettingsListener = Callable[[Dict[str, Optional[str]]], Any]
+
 class SettingsService:
     """Service to manage application settings"""
     
-    def __init__(self):
+    def __init__(self, env_file: str = ".env"):
         """Initialize the settings service"""
-        self.env_file = Path(".env")
-        load_dotenv(self.env_file)
+        self.env_file = Path(env_file)
+        self._lock = threading.RLock()
+        self._signature = None
+        self._values: Dict[str, Optional[str]] = {}
+        self._listeners: List[Tuple[Optional[frozenset], SettingsListener]] = []
+        # Like load_dotenv(): variables already in the environment win on startup
+        self._refresh(override=False)
+    
+    def subscribe(self, callback: SettingsListener, keys: Optional[Iterable[str]] = None) -> Callable[[], None]:
+        """
+        Call `callback({ENV_KEY: new value or None})` after settings change,
+        optionally only for changes to `keys` (env names such as "GITHUB_TOKEN").
+        Returns a function that unsubscribes.
+        """
+        entry = (frozenset(keys) if keys is not None else None, callback)
+        with self._lock:
+            self._listeners.append(entry)
+        
+        def unsubscribe() -> None:
+            with self._lock:
+                if entry in self._listeners:
+                    self._listeners.remove(entry)
+        return unsubscribe
+    
+    def get(self, env_key: str, default: Optional[str] = None) -> Optional[str]:
+        """A single setting by env name, from the .env file or else the environment"""
+        self._refresh()
+        return self._lookup(env_key, default)
+    
+    def _lookup(self, env_key: str, default: Optional[str] = None) -> Optional[str]:
+        value = self._values.get(env_key)
+        if value is None:
+            value = os.environ.get(env_key)
+        return default if value is None else value
     
     def get_settings(self) -> Dict[str, Any]:
         """Get current application settings"""
         try:
-            # Reload environment variables
-            load_dotenv(self.env_file, override=True)
-            
+            self._refresh()
+            get = self._lookup
             settings = {
-                "github_token": os.getenv("GITHUB_TOKEN", ""),
-                "github_events_db": os.getenv("GITHUB_EVENTS_DB", "github_events.db"),
-                "api_port": int(os.getenv("API_PORT", 8001)),
-                "webhook_port": int(os.getenv("WEBHOOK_PORT", 8002)),
-                "enable_ngrok": os.getenv("ENABLE_NGROK", "true").lower() == "true",
-                "ngrok_auth_token": os.getenv("NGROK_AUTH_TOKEN", ""),
-                "open_browser": os.getenv("OPEN_BROWSER", "true").lower() == "true",
-                "db_type": os.getenv("DB_TYPE", "SQLite"),
-                "db_host": os.getenv("DB_HOST", "localhost"),
-                "db_port": int(os.getenv("DB_PORT", 3306)),
-                "db_name": os.getenv("DB_NAME", "github_events"),
-                "db_user": os.getenv("DB_USER", "admin"),
-                "db_password": os.getenv("DB_PASSWORD", "password")
+                "github_token": get("GITHUB_TOKEN", ""),
+                "github_events_db": get("GITHUB_EVENTS_DB", "github_events.db"),
+                "api_port": int(get("API_PORT", 8001)),
+                "webhook_port": int(get("WEBHOOK_PORT", 8002)),
+                "enable_ngrok": get("ENABLE_NGROK", "true").lower() == "true",
+                "ngrok_auth_token": get("NGROK_AUTH_TOKEN", ""),
+                "open_browser": get("OPEN_BROWSER", "true").lower() == "true",
+                "db_type": get("DB_TYPE", "SQLite"),
+                "db_host": get("DB_HOST", "localhost"),
+                "db_port": int(get("DB_PORT", 3306)),
+                "db_name": get("DB_NAME", "github_events"),
+                "db_user": get("DB_USER", "admin"),
+                "db_password": get("DB_PASSWORD", "password")
             }
             
             return settings
@@ -59,18 +101,22 @@ class SettingsService:
                     "message": "Environment file not found. Run setup.py to create it."
                 }
             
-            # Update each setting in the .env file
+            updates = {}
             for key, value in settings.items():
                 env_key = self._convert_to_env_key(key)
                 if env_key:
                     # Convert boolean values to strings
                     if isinstance(value, bool):
                         value = str(value).lower()
-                    
-                    set_key(self.env_file, env_key, str(value))
+                    updates[env_key] = str(value)
             
-            # Reload environment variables
-            load_dotenv(self.env_file, override=True)
+            self._refresh()
+            with self._lock:
+                updates = {key: value for key, value in updates.items() if self._values.get(key) != value}
+                if updates:
+                    self._rewrite(updates)
+            # Outside the lock, so listeners may read settings
+            self._refresh()
             
             return {
                 "success": True,
@@ -83,6 +129,116 @@ class SettingsService:
                 "message": f"Failed to update settings: {str(e)}"
             }
     
+    def _stat(self):
+        try:
+            stat = os.stat(self.env_file)
+            return stat.st_ino, stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+    
+    def _refresh(self, override: bool = True) -> None:
+        """Re-parse the .env file if it changed, apply it to os.environ and notify listeners"""
+        signature = self._stat()
+        if signature == self._signature:
+            return
+        with self._lock:
+            signature = self._stat()
+            if signature == self._signature:
+                return
+            values = dotenv_values(self.env_file) if signature is not None else {}
+            changes = {key: value for key, value in values.items() if self._values.get(key) != value}
+            changes.update({key: None for key in self._values if key not in values})
+            self._values = values
+            self._signature = signature
+            
+            for key, value in changes.items():
+                if value is None:
+                    continue
+                if override or key not in os.environ:
+                    os.environ[key] = value
+            listeners = list(self._listeners)
+        
+        if changes and listeners:
+            self._notify(listeners, changes)
+    
+    @staticmethod
+    def _notify(listeners, changes: Dict[str, Optional[str]]) -> None:
+        for keys, callback in listeners:
+            relevant = changes if keys is None else {k: v for k, v in changes.items() if k in keys}
+            if not relevant:
+                continue
+            try:
+                callback(relevant)
+            except Exception as e:
+                logger.error(f"Error in settings listener {getattr(callback, '__qualname__', callback)}: {e}")
+    
+    @staticmethod
+    def _quote(value: str) -> str:
+        # Same quoting as dotenv's set_key
+        return "'{}'".format(value.replace("'", "\\'"))
+    
+    @classmethod
+    def _replace_value(cls, line: str, match: "re.Match", value: str) -> str:
+        """
+        Put a new value into an assignment line, keeping everything around it:
+        an `export ` prefix, spacing and a trailing `# comment`
+        """
+        rest = line[match.end():]
+        body = rest.rstrip("\r\n")
+        newline = rest[len(body):] or "\n"
+        spacing = body[:len(body) - len(body.lstrip())]
+        old = body[len(spacing):]
+        
+        tail = ""
+        if old[:1] in ("'", '"'):
+            # Quoted: whatever follows the closing quote
+            index = 1
+            while index < len(old) and old[index] != old[0]:
+                index += 2 if old[index] == "\\" else 1
+            tail = old[index + 1:]
+        else:
+            # Unquoted: a comment starts at whitespace followed by #
+            comment = re.search(r"\s+#", old)
+            if comment:
+                tail = old[comment.start():]
+        return f"{line[:match.end()]}{spacing}{cls._quote(value)}{tail}{newline}"
+    
+    def _rewrite(self, updates: Dict[str, str]) -> None:
+        """Apply all updates in one pass and replace the file atomically (caller holds the lock)"""
+        with open(self.env_file, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+        
+        remaining = dict(updates)
+        for index, line in enumerate(lines):
+            match = ENV_LINE_PATTERN.match(line)
+            if match and match.group(1) in updates:
+                key = match.group(1)
+                if key in remaining:
+                    lines[index] = self._replace_value(line, match, remaining.pop(key))
+                else:
+                    lines[index] = ""  # Duplicate definition; the first one now holds the value
+        if remaining:
+            if lines and not lines[-1].endswith("\n"):
+                lines[-1] += "\n"
+            lines.extend(f"{key}={self._quote(value)}\n" for key, value in remaining.items())
+        
+        directory = os.path.dirname(os.path.abspath(self.env_file))
+        fd, tmp_path = tempfile.mkstemp(prefix=".env-", suffix=".tmp", dir=directory)
+        try:
+            # mkstemp creates the file private; keep the .env file's own permissions
+            os.chmod(tmp_path, os.stat(self.env_file).st_mode & 0o777)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.env_file)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+    
     def _convert_to_env_key(self, key: str) -> Optional[str]:
         """Convert a camelCase or snake_case key to UPPER_SNAKE_CASE for .env file"""
         if not key:
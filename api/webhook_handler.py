@@ -9,13 +9,18 @@ from fastapi import FastAPI, Request, Response, HTTPException, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
 
 from handlers.github_event_handler import GitHub
+from api.settings_service import settings_service
+from managers.auto_branch_pr_manager import AutoBranchPRManager
+from managers.lifecycle import lifecycle, shutdown_on_exit, DRAIN, CLOSE
+from api.health import health, health_router
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
-app = FastAPI(title="GitHub Webhook Handler", description="Webhook handler for GitHub events")
+app = FastAPI(title="GitHub Webhook Handler", description="Webhook handler for GitHub events",
+              lifespan=shutdown_on_exit)
 
 # Add CORS middleware
 app.add_middleware(
@@ -28,6 +33,43 @@ app.add_middleware(
 
 # Initialize GitHub event handler
 github_handler = GitHub(app)
+settings_service.subscribe(github_handler.reset_client, keys=["GITHUB_TOKEN"])
+
+# Create PRs for new branches as their webhooks arrive; polling only reconciles
+auto_branch_pr_manager = AutoBranchPRManager(db_manager=github_handler.db_manager)
+auto_branch_pr_manager.subscribe(github_handler)
+settings_service.subscribe(auto_branch_pr_manager.apply_settings, keys=["GITHUB_TOKEN"])
+if os.getenv("GITHUB_TOKEN"):
+    auto_branch_pr_manager.initialize(os.getenv("GITHUB_TOKEN"))
+
+def start_background_services() -> None:
+    """Start the branch monitor and the post-merge job queue"""
+    if auto_branch_pr_manager.github_client and auto_branch_pr_manager.config["auto_pr_enabled"]:
+        auto_branch_pr_manager.start_branch_monitor()
+    # Resume post-merge jobs queued before a restart
+    if auto_branch_pr_manager.job_queue and auto_branch_pr_manager.config["post_merge_scripts"]["enabled"]:
+        auto_branch_pr_manager.job_queue.start()
+
+def stop_background_services() -> None:
+    """Stop the branch monitor and stop claiming post-merge jobs"""
+    if auto_branch_pr_manager.running:
+        auto_branch_pr_manager.stop_branch_monitor()
+    if auto_branch_pr_manager.job_queue:
+        auto_branch_pr_manager.job_queue.stop()
+
+app.include_router(health_router)
+health.add_check("branch_tasks", lambda: health.queue_check(auto_branch_pr_manager.pending_tasks))
+
+# On shutdown: finish webhook follow-up work, let running post-merge scripts end, then close the database
+lifecycle.register("auto-branch-pr", auto_branch_pr_manager.drain, stage=DRAIN)
+if auto_branch_pr_manager.job_queue:
+    lifecycle.register("post-merge-jobs", auto_branch_pr_manager.job_queue.drain, stage=DRAIN)
+lifecycle.register("database", github_handler.db_manager.close, stage=CLOSE)
+
+# With several server worker processes these run once, in a separate process (see main.py --production);
+# the workers only handle webhooks and queue work in the database
+if os.getenv("GITEVENTS_RUN_BACKGROUND", "true").lower() == "true":
+    start_background_services()
 
 def verify_webhook_signature(request: Request, x_hub_signature_256: Optional[str] = Header(None)) -> bool:
     """Verify the webhook signature from GitHub"""
@@ -59,6 +101,10 @@ def verify_webhook_signature(request: Request, x_hub_signature_256: Optional[str
 @app.post("/webhook/github")
 async def github_webhook(request: Request):
     """Handle GitHub webhook events"""
+    # GitHub shows the failed delivery so it can be redelivered once we're back
+    if not lifecycle.accepting:
+        raise HTTPException(status_code=503, detail="Shutting down")
+    
     # Verify the webhook signature
     if not verify_webhook_signature(request):
         raise HTTPException(status_code=401, detail="Invalid webhook signature")
@@ -77,7 +123,7 @@ async def github_webhook(request: Request):
 
 @app.get("/webhook/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (liveness only; /health/ready checks the database and queues)"""
     return {"status": "ok"}
 
 if __name__ == "__main__":
@@ -2,19 +2,211 @@ import os
 import logging
 import json
 import sqlite3
-from typing import Dict, Any, List, Optional, Union, Tuple
+import time
+import datetime
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Union, Tuple
 
-from sqlalchemy import create_engine, desc, inspect
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy import create_engine, desc, func, inspect, select, text, update
+from sqlalchemy.orm import aliased, sessionmaker, Session
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
-from db.db_schema import Base, Repository, User, PullRequest, PREvent, BranchEvent, PushEvent
+from db.db_schema import (
+    Base, Repository, User, PullRequest, PREvent, BranchEvent, PushEvent, ActivityBucket,
+    BranchSnapshot, RepositoryScanState, ScriptJob
+)
+from db.search_index import SearchIndex
 
 logger = logging.getLogger(__name__)
 
+# Flat column sets used for bulk exports, keyed by event category
+EXPORT_COLUMNS = {
+    'pull_request': [
+        PREvent.id, PREvent.event_type, PREvent.created_at,
+        PullRequest.id.label('pull_request_id'), PullRequest.number, PullRequest.title,
+        PullRequest.state, PullRequest.merged, PullRequest.head_ref, PullRequest.base_ref,
+        Repository.full_name.label('repository'), User.login.label('user'), PREvent.payload,
+    ],
+    'branch': [
+        BranchEvent.id, BranchEvent.event_type, BranchEvent.ref, BranchEvent.created_at,
+        BranchEvent.repository_id, Repository.full_name.label('repository'), BranchEvent.payload,
+    ],
+    'push': [
+        PushEvent.id, PushEvent.ref, PushEvent.before, PushEvent.after, PushEvent.created,
+        PushEvent.deleted, PushEvent.forced, PushEvent.created_at, PushEvent.repository_id,
+        Repository.full_name.label('repository'), PushEvent.sender_id, User.login.label('sender'),
+        PushEvent.commits,
+    ],
+}
+
+# Fields that can be requested from the recent-event queries. Dotted names are
+# returned nested under their prefix, e.g. "repository.full_name".
+PR_EVENT_FIELDS = {
+    'id': PREvent.id,
+    'event_type': PREvent.event_type,
+    'created_at': PREvent.created_at,
+    'pull_request.id': PullRequest.id,
+    'pull_request.number': PullRequest.number,
+    'pull_request.title': PullRequest.title,
+    'pull_request.state': PullRequest.state,
+    'pull_request.created_at': PullRequest.created_at,
+    'pull_request.merged': PullRequest.merged,
+    'pull_request.head_ref': PullRequest.head_ref,
+    'pull_request.base_ref': PullRequest.base_ref,
+    'repository.id': Repository.id,
+    'repository.name': Repository.name,
+    'repository.full_name': Repository.full_name,
+    'user.id': User.id,
+    'user.login': User.login,
+    'payload': PREvent.payload,
+}
+
+BRANCH_EVENT_FIELDS = {
+    'id': BranchEvent.id,
+    'event_type': BranchEvent.event_type,
+    'ref': BranchEvent.ref,
+    'created_at': BranchEvent.created_at,
+    'repository_id': BranchEvent.repository_id,
+    'payload': BranchEvent.payload,
+}
+
+PUSH_EVENT_FIELDS = {
+    'id': PushEvent.id,
+    'ref': PushEvent.ref,
+    'before': PushEvent.before,
+    'after': PushEvent.after,
+    'created': PushEvent.created,
+    'deleted': PushEvent.deleted,
+    'forced': PushEvent.forced,
+    'created_at': PushEvent.created_at,
+    'repository_id': PushEvent.repository_id,
+    'sender_id': PushEvent.sender_id,
+    'commits': PushEvent.commits,
+}
+
+class IngestionGate:
+    """
+    Tracks in-progress webhook ingestion so that read-heavy callers (the API)
+    can hold back and give writers priority on the shared database. The
+    duration of recent writes is kept for health checks.
+    """
+    
+    def __init__(self, history: int = 256):
+        self._lock = threading.Lock()
+        self._active = 0
+        self._idle = threading.Event()
+        self._idle.set()
+        self._durations = deque(maxlen=history)  # (finished at, seconds) of recent writes
+    
+    @contextmanager
+    def writing(self):
+        """Mark an ingestion write as in progress for the duration of the block"""
+        with self._lock:
+            self._active += 1
+            self._idle.clear()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            finished = time.monotonic()
+            with self._lock:
+                self._active -= 1
+                if self._active == 0:
+                    self._idle.set()
+                self._durations.append((finished, finished - started))
+    
+    def latency(self, window: float = 300.0) -> Dict[str, Any]:
+        """Write count, p95 and max duration (ms) of the writes finished in the last `window` seconds"""
+        since = time.monotonic() - window
+        with self._lock:
+            durations = sorted(seconds for finished, seconds in self._durations if finished >= since)
+        if not durations:
+            return {"writes": 0, "p95_ms": None, "max_ms": None}
+        p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+        return {"writes": len(durations), "p95_ms": round(p95 * 1000, 1), "max_ms": round(durations[-1] * 1000, 1)}
+    
+    @property
+    def active(self) -> int:
+        """Number of ingestion writes currently in progress"""
+        return self._active
+    
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until no ingestion writes are in progress. Returns False on timeout."""
+        return self._idle.wait(timeout)
+
+# Shared by every DatabaseManager in the process
+ingestion_gate = IngestionGate()
+
+class _TrackedSession(Session):
+    """Session that counts itself in and out of the engine binding it was created from"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._tracked_binding = self.info.get("binding")
+        if self._tracked_binding is not None:
+            self._tracked_binding.session_opened()
+    
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            binding, self._tracked_binding = self._tracked_binding, None
+            if binding is not None:
+                binding.session_closed()
+
+class _EngineBinding:
+    """
+    One engine with its session factory and search index. Reconfiguring the
+    database builds a new binding and swaps it in whole, so a session never
+    mixes two engines; open sessions are counted so that a replaced binding
+    can be drained before its pool is disposed.
+    """
+    
+    def __init__(self, engine):
+        self.engine = engine
+        self.search_index = SearchIndex(engine)
+        # Saved objects are handed back to callers after the session closes
+        self.Session = sessionmaker(bind=engine, class_=_TrackedSession, expire_on_commit=False,
+                                    info={"binding": self})
+        self._lock = threading.Lock()
+        self._open = 0
+        self._idle = threading.Event()
+        self._idle.set()
+    
+    def session_opened(self) -> None:
+        with self._lock:
+            self._open += 1
+            self._idle.clear()
+    
+    def session_closed(self) -> None:
+        with self._lock:
+            self._open -= 1
+            if self._open == 0:
+                self._idle.set()
+    
+    @property
+    def open_sessions(self) -> int:
+        """Sessions created from this binding and not closed yet"""
+        return self._open
+    
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until every session is closed. Returns False on timeout."""
+        return self._idle.wait(timeout)
+
 class DatabaseManager:
-    """Manages database operations for GitHub events"""
+    """
+    Manages database operations for GitHub events.
+    
+    `update_db_config` switches databases without interrupting callers: the
+    new engine is built and checked first, new sessions then go to it, and the
+    old engine is disposed once its in-flight sessions have finished (or after
+    `drain_timeout` seconds).
+    """
     
     def __init__(self, db_path: str = "github_events.db", db_type: str = "sqlite", db_host: str = None, db_port: int = None, db_name: str = None, db_user: str = None, db_password: str = None):
         """Initialize the database manager with the path to the SQLite database or MySQL credentials"""
@@ -25,12 +217,34 @@ class DatabaseManager:
         self.db_name = db_name
         self.db_user = db_user
         self.db_password = db_password
-        self.engine = None
-        self.Session = None
+        self.drain_timeout = float(os.getenv("DB_DRAIN_TIMEOUT", 30))
+        self._binding: Optional[_EngineBinding] = None
+        self._retired: List[_EngineBinding] = []  # Replaced engines still draining
+        self._reconfigure_lock = threading.Lock()
         self._initialize_db()
     
+    @property
+    def engine(self):
+        """The current engine (replaced as a whole by update_db_config)"""
+        return self._binding.engine if self._binding else None
+    
+    @property
+    def Session(self):
+        """Session factory for the current engine"""
+        return self._binding.Session if self._binding else None
+    
+    @property
+    def search_index(self) -> Optional[SearchIndex]:
+        """Search index for the current engine"""
+        return self._binding.search_index if self._binding else None
+    
     def _initialize_db(self) -> None:
         """Initialize the database connection and create tables if they don't exist"""
+        self._binding = self._connect()
+    
+    def _connect(self) -> _EngineBinding:
+        """Build, check and prepare an engine for the configured database without switching to it"""
+        engine = None
         try:
             # Determine database type
             db_type = self.db_type.lower() if self.db_type else os.getenv("DB_TYPE", "sqlite").lower()
@@ -57,18 +271,88 @@ class DatabaseManager:
                 db_url = f"sqlite:///{self.db_path}"
                 logger.info(f"Using SQLite database at {self.db_path}")
             
-            # Create engine and session
-            self.engine = create_engine(db_url)
-            self.Session = sessionmaker(bind=self.engine)
+            # Create engine and check that it answers before anything uses it
+            engine = create_engine(db_url)
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            binding = _EngineBinding(engine)
             
             # Create tables if they don't exist
-            Base.metadata.create_all(self.engine)
+            existing_tables = set(inspect(engine).get_table_names())
+            Base.metadata.create_all(engine)
+            
+            # create_all only creates new tables; add columns and indexes introduced since
+            if PullRequest.__tablename__ in existing_tables:
+                self._add_missing_columns(engine, PullRequest)
+                for index in PullRequest.__table__.indexes:
+                    index.create(engine, checkfirst=True)
+            
+            # Set up the full-text index and backfill it the first time it is created
+            if binding.search_index.ensure_schema():
+                self._rebuild_search_index(binding)
+            
+            # Backfill the activity counters from stored events when the table is new
+            if ActivityBucket.__tablename__ not in existing_tables:
+                self._rebuild_activity_buckets(binding)
             
             logger.info("Database initialized successfully")
+            return binding
         except Exception as e:
             logger.error(f"Error initializing database: {e}")
+            if engine is not None:
+                engine.dispose()
             raise
     
+    @staticmethod
+    def _add_missing_columns(engine, model) -> None:
+        """Add nullable columns of `model` that an existing table predates"""
+        existing = {column["name"] for column in inspect(engine).get_columns(model.__tablename__)}
+        with engine.begin() as conn:
+            for column in model.__table__.columns:
+                if column.name not in existing:
+                    conn.execute(text(
+                        f"ALTER TABLE {model.__tablename__} ADD COLUMN {column.name} "
+                        f"{column.type.compile(engine.dialect)}"
+                    ))
+                    logger.info(f"Added column {model.__tablename__}.{column.name}")
+    
+    def _swap_binding(self, binding: _EngineBinding) -> None:
+        """Send new sessions to `binding` and retire the previous engine in the background"""
+        previous, self._binding = self._binding, binding
+        if previous is not None:
+            self._retired.append(previous)
+            threading.Thread(target=self._retire_binding, args=(previous,), name="db-engine-drain",
+                             daemon=True).start()
+    
+    def _retire_binding(self, binding: _EngineBinding) -> None:
+        """Wait for in-flight sessions on a replaced engine, then close its pool"""
+        if binding.open_sessions:
+            logger.info(f"Draining {binding.open_sessions} session(s) on the previous database")
+        if not binding.wait_idle(self.drain_timeout):
+            logger.warning(f"{binding.open_sessions} session(s) still open on the previous database "
+                           f"after {self.drain_timeout:.0f}s, disposing it anyway")
+        binding.engine.dispose()
+        if binding in self._retired:
+            self._retired.remove(binding)
+        logger.info("Previous database engine disposed")
+    
+    def close(self, timeout: float = 5.0) -> Dict[str, int]:
+        """
+        Wait up to `timeout` seconds for open sessions, then dispose every
+        engine (including replaced ones still draining). Returns the number of
+        sessions that were still open.
+        """
+        deadline = time.monotonic() + timeout
+        bindings = list(self._retired) + ([self._binding] if self._binding else [])
+        open_sessions = 0
+        for binding in bindings:
+            if not binding.wait_idle(max(0.0, deadline - time.monotonic())):
+                open_sessions += binding.open_sessions
+            binding.engine.dispose()
+        if open_sessions:
+            logger.warning(f"Closed the database with {open_sessions} session(s) still open")
+        return {"open_sessions": open_sessions}
+    
     def initialize_database(self) -> Dict[str, Any]:
         """Initialize the database and create all tables"""
         try:
@@ -101,9 +385,10 @@ class DatabaseManager:
     
     def get_session(self) -> Session:
         """Get a new database session"""
-        if not self.Session:
+        binding = self._binding  # Read once: update_db_config may swap it concurrently
+        if binding is None:
             raise RuntimeError("Database session factory not initialized")
-        return self.Session()
+        return binding.Session()
     
     def get_db_info(self) -> Dict[str, Any]:
         """Get information about the current database configuration"""
@@ -190,11 +475,7 @@ class DatabaseManager:
                 
                 # Test connection by creating a temporary engine
                 test_url = f"sqlite:///{db_path}"
-                test_engine = create_engine(test_url)
-                
-                # Try to connect
-                conn = test_engine.connect()
-                conn.close()
+                self._check_engine(create_engine(test_url))
                 
                 return {
                     "success": True,
@@ -209,11 +490,7 @@ class DatabaseManager:
                 
                 # Test MySQL connection
                 test_url = f"mysql+pymysql://{user}:{password}@{host}:{port}/{name}"
-                test_engine = create_engine(test_url)
-                
-                # Try to connect
-                conn = test_engine.connect()
-                conn.close()
+                self._check_engine(create_engine(test_url))
                 
                 return {
                     "success": True,
@@ -226,74 +503,103 @@ class DatabaseManager:
                 "message": f"Failed to connect to database: {str(e)}"
             }
     
-    def update_db_config(self, db_config: Dict[str, Any]) -> Dict[str, Any]:
-        """Update the database configuration and reconnect"""
+    def ping(self, timeout: float = 1.0) -> float:
+        """
+        Check that the database can take a write right now; returns the seconds
+        it took. On SQLite this briefly takes the write lock with a `timeout`
+        busy wait, so a locked database fails fast instead of stalling the caller.
+        """
+        started = time.monotonic()
+        with self.engine.connect() as conn:
+            if conn.dialect.name == "sqlite":
+                conn.exec_driver_sql(f"PRAGMA busy_timeout = {int(timeout * 1000)}")
+                try:
+                    conn.exec_driver_sql("BEGIN IMMEDIATE")
+                    conn.exec_driver_sql("ROLLBACK")
+                finally:
+                    conn.exec_driver_sql("PRAGMA busy_timeout = 5000")  # pysqlite's default
+            else:
+                conn.execute(text("SELECT 1"))
+        return time.monotonic() - started
+    
+    @staticmethod
+    def _check_engine(engine) -> None:
+        """Connect once with a temporary engine, then close its pool"""
         try:
-            db_type = db_config.get("type", "sqlite").lower()
-            
-            # Set environment variables for the new configuration
-            os.environ["DB_TYPE"] = db_type
-            
-            if db_type == "sqlite":
-                db_path = db_config.get("path", "github_events.db")
-                self.db_path = db_path
+            conn = engine.connect()
+            conn.close()
+        finally:
+            engine.dispose()
+    
+    def update_db_config(self, db_config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Update the database configuration and reconnect. The new database is
+        connected and prepared before any request uses it; if that fails the
+        current connection stays in place.
+        """
+        with self._reconfigure_lock:
+            previous = (self.db_type, self.db_path, self.db_host, self.db_port,
+                        self.db_name, self.db_user, self.db_password)
+            try:
+                db_type = db_config.get("type", "sqlite").lower()
                 
-                # Create new database if requested
-                if db_config.get("create_new", False):
-                    # Create directory if it doesn't exist
-                    db_dir = os.path.dirname(db_path)
-                    if db_dir and not os.path.exists(db_dir):
-                        os.makedirs(db_dir)
+                if db_type == "sqlite":
+                    db_path = db_config.get("path", "github_events.db")
+                    self.db_type = "sqlite"
+                    self.db_path = db_path
                     
-                    # Remove existing database if it exists
-                    if os.path.exists(db_path):
-                        os.remove(db_path)
-                
-                # Update environment variables
-                os.environ["GITHUB_EVENTS_DB"] = db_path
-                
-                # Reinitialize database connection
-                self._initialize_db()
-                
-                return {
-                    "success": True,
-                    "message": f"Database configuration updated to SQLite at {db_path}"
-                }
-            else:  # MySQL
-                host = db_config.get("host", "localhost")
-                port = db_config.get("port", "3306")
-                name = db_config.get("name", "github_events")
-                user = db_config.get("user", "root")
-                password = db_config.get("password", "")
-                
-                # Update instance variables
-                self.db_type = "mysql"
-                self.db_host = host
-                self.db_port = port
-                self.db_name = name
-                self.db_user = user
-                self.db_password = password
-                
-                # Update environment variables
-                os.environ["DB_HOST"] = host
-                os.environ["DB_PORT"] = str(port)
-                os.environ["DB_NAME"] = name
-                os.environ["DB_USER"] = user
-                if password:
-                    os.environ["DB_PASSWORD"] = password
-                
-                # Reinitialize database connection
-                self._initialize_db()
+                    # Create new database if requested
+                    if db_config.get("create_new", False):
+                        # Create directory if it doesn't exist
+                        db_dir = os.path.dirname(db_path)
+                        if db_dir and not os.path.exists(db_dir):
+                            os.makedirs(db_dir)
+                        
+                        # Remove existing database if it exists
+                        if os.path.exists(db_path):
+                            os.remove(db_path)
+                    
+                    environment = {"DB_TYPE": db_type, "GITHUB_EVENTS_DB": db_path}
+                    message = f"Database configuration updated to SQLite at {db_path}"
+                else:  # MySQL
+                    host = db_config.get("host", "localhost")
+                    port = db_config.get("port", "3306")
+                    name = db_config.get("name", "github_events")
+                    user = db_config.get("user", "root")
+                    password = db_config.get("password", "")
+                    
+                    # Update instance variables
+                    self.db_type = "mysql"
+                    self.db_host = host
+                    self.db_port = port
+                    self.db_name = name
+                    self.db_user = user
+                    self.db_password = password
+                    
+                    environment = {"DB_TYPE": db_type, "DB_HOST": host, "DB_PORT": str(port),
+                                   "DB_NAME": name, "DB_USER": user}
+                    if password:
+                        environment["DB_PASSWORD"] = password
+                    message = f"Database configuration updated to MySQL at {host}:{port}/{name}"
                 
+                # Connect and prepare the new database while requests keep using the current one
+                binding = self._connect()
+            except Exception as e:
+                (self.db_type, self.db_path, self.db_host, self.db_port,
+                 self.db_name, self.db_user, self.db_password) = previous
+                logger.error(f"Error updating database configuration: {e}")
                 return {
-                    "success": True,
-                    "message": f"Database configuration updated to MySQL at {host}:{port}/{name}"
+                    "success": False,
+                    "message": f"Failed to update database configuration: {str(e)}"
                 }
-        except Exception as e:
-            logger.error(f"Error updating database configuration: {e}")
+            
+            # Update environment variables
+            os.environ.update(environment)
+            self._swap_binding(binding)
+            logger.info(message)
             return {
-                "success": False,
-                "message": f"Failed to update database configuration: {str(e)}"
+                "success": True,
+                "message": message
             }
     
     def save_repository(self, repo_data: Dict[str, Any]) -> Repository:
@@ -314,9 +620,7 @@ class DatabaseManager:
                         github_id=repo_data['id'],
                         name=repo_data['name'],
                         full_name=repo_data['full_name'],
-                        private=repo_data.get('private', False),
-                        description=repo_data.get('description'),
-                        url=repo_data.get('html_url')
+                        private=repo_data.get('private', False)
                     )
                     session.add(repo)
                 
@@ -366,6 +670,13 @@ class DatabaseManager:
                     for key, value in pr_data.items():
                         if hasattr(existing_pr, key) and key not in ('id', 'repository_id', 'user_id'):
                             setattr(existing_pr, key, value)
+                    # Branch refs arrive nested; keep them current for open-PR-by-head lookups
+                    for side in ('head', 'base'):
+                        if pr_data.get(side):
+                            setattr(existing_pr, f'{side}_ref', pr_data[side].get('ref'))
+                            setattr(existing_pr, f'{side}_sha', pr_data[side].get('sha'))
+                    if pr_data.get('head'):
+                        existing_pr.head_repo = pr_data['head'].get('repo')
                     pr = existing_pr
                 else:
                     # Create new pull request
@@ -382,12 +693,17 @@ class DatabaseManager:
                         repository_id=repo_id,
                         user_id=user_id,
                         head_ref=pr_data.get('head', {}).get('ref'),
+                        head_repo=pr_data.get('head', {}).get('repo'),
                         base_ref=pr_data.get('base', {}).get('ref'),
                         head_sha=pr_data.get('head', {}).get('sha'),
                         base_sha=pr_data.get('base', {}).get('sha')
                     )
                     session.add(pr)
                 
+                # Keep the search index in sync within the same transaction
+                session.flush()
+                self._search_index_for(session).index_pull_request(session, pr)
+                
                 session.commit()
                 return pr
             except SQLAlchemyError as e:
@@ -395,7 +711,7 @@ class DatabaseManager:
                 logger.error(f"Error saving pull request: {e}")
                 raise
     
-    def save_pr_event(self, event_type: str, pr_id: int, payload: Dict[str, Any] = None) -> PREvent:
+    def save_pr_event(self, event_type: str, pr_id: int, payload: Dict[str, Any] = None, repo_id: int = None) -> PREvent:
         """Save pull request event to the database"""
         with self.get_session() as session:
             try:
@@ -406,6 +722,12 @@ class DatabaseManager:
                     payload=json.dumps(payload) if payload else None
                 )
                 session.add(pr_event)
+                
+                if repo_id is None:
+                    pr = session.get(PullRequest, pr_id)
+                    repo_id = pr.repository_id if pr else None
+                self._record_activity(session, repo_id, 'pull_request')
+                
                 session.commit()
                 return pr_event
             except SQLAlchemyError as e:
@@ -425,6 +747,7 @@ class DatabaseManager:
                     payload=json.dumps(payload) if payload else None
                 )
                 session.add(branch_event)
+                self._record_activity(session, repo_id, 'branch')
                 session.commit()
                 return branch_event
             except SQLAlchemyError as e:
@@ -449,6 +772,12 @@ class DatabaseManager:
                     commits=json.dumps(push_data.get('commits', [])),
                 )
                 session.add(push_event)
+                
+                # Keep the search index in sync within the same transaction
+                session.flush()
+                self._search_index_for(session).index_push_commits(session, push_event, push_data.get('commits', []))
+                self._record_activity(session, repo_id, 'push')
+                
                 session.commit()
                 return push_event
             except SQLAlchemyError as e:
@@ -456,128 +785,152 @@ class DatabaseManager:
                 logger.error(f"Error saving push event: {e}")
                 raise
     
-    def get_recent_pr_events(self, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get recent pull request events with related data"""
+    def get_recent_pr_events(self, limit: int = 10, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Get recent pull request events with related data.
+        `fields` selects a subset of PR_EVENT_FIELDS (or whole groups such as
+        "repository"); only the columns and joins it needs are queried.
+        """
+        selected = self._resolve_fields(PR_EVENT_FIELDS, fields)
+        stmt = select(*[PR_EVENT_FIELDS[name].label(name) for name in selected]).select_from(PREvent)
+        
+        groups = {name.split('.', 1)[0] for name in selected}
+        if groups & {'pull_request', 'repository', 'user'}:
+            stmt = stmt.outerjoin(PullRequest, PREvent.pull_request_id == PullRequest.id)
+        if 'repository' in groups:
+            stmt = stmt.outerjoin(Repository, PullRequest.repository_id == Repository.id)
+        if 'user' in groups:
+            stmt = stmt.outerjoin(User, PullRequest.user_id == User.id)
+        stmt = stmt.order_by(desc(PREvent.created_at)).limit(limit)
+        
         with self.get_session() as session:
             try:
-                events = session.query(PREvent).order_by(desc(PREvent.created_at)).limit(limit).all()
-                
-                result = []
-                for event in events:
-                    pr = event.pull_request
-                    repo = pr.repository
-                    user = pr.user
-                    
-                    event_data = {
-                        'id': event.id,
-                        'event_type': event.event_type,
-                        'created_at': event.created_at.isoformat(),
-                        'pull_request': {
-                            'id': pr.id,
-                            'number': pr.number,
-                            'title': pr.title,
-                            'state': pr.state,
-                            'created_at': pr.created_at.isoformat() if pr.created_at else None,
-                            'merged': pr.merged,
-                            'head_ref': pr.head_ref,
-                            'base_ref': pr.base_ref,
-                        },
-                        'repository': {
-                            'id': repo.id,
-                            'name': repo.name,
-                            'full_name': repo.full_name,
-                        },
-                        'user': {
-                            'id': user.id,
-                            'login': user.login,
-                        },
-                        'payload': json.loads(event.payload) if event.payload else None,
-                    }
-                    result.append(event_data)
-                
-                return result
+                return [self._build_event(row, selected) for row in session.execute(stmt)]
             except SQLAlchemyError as e:
                 logger.error(f"Error retrieving PR events: {e}")
                 raise
     
-    def get_recent_branch_events(self, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get recent branch events"""
+    def get_recent_branch_events(self, limit: int = 10, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Get recent branch events, optionally restricted to a subset of BRANCH_EVENT_FIELDS"""
+        selected = self._resolve_fields(BRANCH_EVENT_FIELDS, fields)
+        stmt = (
+            select(*[BRANCH_EVENT_FIELDS[name].label(name) for name in selected])
+            .select_from(BranchEvent)
+            .order_by(desc(BranchEvent.created_at))
+            .limit(limit)
+        )
+        
         with self.get_session() as session:
             try:
-                events = session.query(BranchEvent).order_by(desc(BranchEvent.created_at)).limit(limit).all()
-                
-                result = []
-                for event in events:
-                    event_data = {
-                        'id': event.id,
-                        'event_type': event.event_type,
-                        'ref': event.ref,
-                        'created_at': event.created_at.isoformat(),
-                        'repository_id': event.repository_id,
-                        'payload': json.loads(event.payload) if event.payload else None,
-                    }
-                    result.append(event_data)
-                
-                return result
+                return [self._build_event(row, selected) for row in session.execute(stmt)]
             except SQLAlchemyError as e:
                 logger.error(f"Error retrieving branch events: {e}")
                 raise
     
-    def get_recent_push_events(self, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get recent push events"""
+    def get_recent_push_events(self, limit: int = 10, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Get recent push events, optionally restricted to a subset of PUSH_EVENT_FIELDS"""
+        selected = self._resolve_fields(PUSH_EVENT_FIELDS, fields)
+        stmt = (
+            select(*[PUSH_EVENT_FIELDS[name].label(name) for name in selected])
+            .select_from(PushEvent)
+            .order_by(desc(PushEvent.created_at))
+            .limit(limit)
+        )
+        
         with self.get_session() as session:
             try:
-                events = session.query(PushEvent).order_by(desc(PushEvent.created_at)).limit(limit).all()
-                
-                result = []
-                for event in events:
-                    event_data = {
-                        'id': event.id,
-                        'ref': event.ref,
-                        'before': event.before,
-                        'after': event.after,
-                        'created': event.created,
-                        'deleted': event.deleted,
-                        'forced': event.forced,
-                        'created_at': event.created_at.isoformat(),
-                        'repository_id': event.repository_id,
-                        'sender_id': event.sender_id,
-                        'commits': json.loads(event.commits) if event.commits else [],
-                    }
-                    result.append(event_data)
-                
-                return result
+                events = [self._build_event(row, selected) for row in session.execute(stmt)]
+                if 'commits' in selected:
+                    for event in events:
+                        event['commits'] = event['commits'] or []
+                return events
             except SQLAlchemyError as e:
                 logger.error(f"Error retrieving push events: {e}")
                 raise
     
-    def get_all_events(self, limit: int = 30) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _resolve_fields(field_map: Dict[str, Any], fields: Optional[List[str]]) -> List[str]:
+        """Expand a requested field list (names or group prefixes) into keys of field_map"""
+        if not fields:
+            return list(field_map)
+        
+        selected = []
+        for field in fields:
+            matches = [name for name in field_map if DatabaseManager._field_matches(name, field)]
+            if not matches:
+                raise ValueError(f"Unknown field: {field}")
+            selected.extend(name for name in matches if name not in selected)
+        return selected
+    
+    @staticmethod
+    def _field_matches(name: str, field: str) -> bool:
+        """Check whether a field map key is selected by a requested field or group"""
+        return name == field or name.startswith(f"{field}.")
+    
+    @staticmethod
+    def _field_in(field_map: Dict[str, Any], field: str) -> bool:
+        """Check whether a requested field or group exists in a field map"""
+        return any(DatabaseManager._field_matches(name, field) for name in field_map)
+    
+    @staticmethod
+    def _build_event(row, selected: List[str]) -> Dict[str, Any]:
+        """Turn a projected row into the nested event dictionary shape"""
+        event_data = {}
+        for name in selected:
+            value = row._mapping[name]
+            if isinstance(value, datetime.datetime):
+                value = value.isoformat()
+            elif name in ('payload', 'commits') and value:
+                # JSON blobs are stored pre-encoded
+                value = json.loads(value)
+            
+            if '.' in name:
+                group, key = name.split('.', 1)
+                event_data.setdefault(group, {})[key] = value
+            else:
+                event_data[name] = value
+        return event_data
+    
+    def get_all_events(self, limit: int = 30, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """Get all recent events (PR, branch, push) combined"""
         try:
-            pr_events = self.get_recent_pr_events(limit)
-            branch_events = self.get_recent_branch_events(limit)
-            push_events = self.get_recent_push_events(limit)
+            sources = [
+                ('pull_request', self.get_recent_pr_events, PR_EVENT_FIELDS),
+                ('branch', self.get_recent_branch_events, BRANCH_EVENT_FIELDS),
+                ('push', self.get_recent_push_events, PUSH_EVENT_FIELDS),
+            ]
+            
+            # created_at is needed to merge the three lists even when not requested
+            query_fields = None
+            if fields:
+                for field in fields:
+                    if not any(self._field_in(field_map, field) for _, _, field_map in sources):
+                        raise ValueError(f"Unknown field: {field}")
+                query_fields = fields if 'created_at' in fields else list(fields) + ['created_at']
             
             # Combine all events with a type identifier
             combined_events = []
             
-            for event in pr_events:
-                event['event_category'] = 'pull_request'
-                combined_events.append(event)
+            for category, getter, field_map in sources:
+                category_fields = None
+                if query_fields:
+                    # Fields are shared across categories; each one takes what it knows
+                    category_fields = [field for field in query_fields if self._field_in(field_map, field)]
                 
-            for event in branch_events:
-                event['event_category'] = 'branch'
-                combined_events.append(event)
-                
-            for event in push_events:
-                event['event_category'] = 'push'
-                combined_events.append(event)
+                for event in getter(limit, category_fields):
+                    event['event_category'] = category
+                    combined_events.append(event)
             
             # Sort by created_at in descending order
             combined_events.sort(key=lambda x: x['created_at'], reverse=True)
+            combined_events = combined_events[:limit]
+            
+            if fields and 'created_at' not in fields:
+                for event in combined_events:
+                    event.pop('created_at', None)
             
             # Limit the total number of events
-            return combined_events[:limit]
+            return combined_events
         except Exception as e:
             logger.error(f"Error retrieving all events: {e}")
             raise
@@ -606,3 +959,626 @@ class DatabaseManager:
             except SQLAlchemyError as e:
                 logger.error(f"Error retrieving repositories: {e}")
                 raise
+    
+    def search(self, query: str, repos: Optional[List[str]] = None, doc_type: Optional[str] = None,
+               limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+        """Full-text search over pull request titles/bodies and commit messages"""
+        with self.get_session() as session:
+            try:
+                return self._search_index_for(session).search(session, query, repos, doc_type, limit, offset)
+            except SQLAlchemyError as e:
+                logger.error(f"Error searching events: {e}")
+                raise
+    
+    @staticmethod
+    def _search_index_for(session: Session) -> SearchIndex:
+        """The search index of the engine a session came from (the current one may have been swapped since)"""
+        return session.info["binding"].search_index
+    
+    def rebuild_search_index(self) -> Dict[str, Any]:
+        """Rebuild the full-text index from stored pull requests and push events"""
+        return self._rebuild_search_index(self._binding)
+    
+    def _rebuild_search_index(self, binding: _EngineBinding) -> Dict[str, Any]:
+        with binding.Session() as session:
+            try:
+                count = binding.search_index.rebuild(session)
+                logger.info(f"Search index rebuilt with {count} documents")
+                return {
+                    "success": True,
+                    "message": f"Search index rebuilt with {count} documents"
+                }
+            except SQLAlchemyError as e:
+                session.rollback()
+                logger.error(f"Error rebuilding search index: {e}")
+                return {
+                    "success": False,
+                    "message": f"Failed to rebuild search index: {str(e)}"
+                }
+    
+    def iter_events_for_export(self, category: str, since: Optional[datetime.datetime] = None,
+                               until: Optional[datetime.datetime] = None, repo: Optional[str] = None,
+                               batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        Stream events of one category as flat dictionaries, oldest first.
+        Rows are fetched through a server-side cursor in batches of `batch_size`,
+        so memory use does not grow with the size of the export.
+        """
+        if category not in EXPORT_COLUMNS:
+            raise ValueError(f"Unknown event category: {category}")
+        
+        if category == 'pull_request':
+            event_model = PREvent
+            stmt = (
+                select(*EXPORT_COLUMNS[category])
+                .outerjoin(PullRequest, PREvent.pull_request_id == PullRequest.id)
+                .outerjoin(Repository, PullRequest.repository_id == Repository.id)
+                .outerjoin(User, PullRequest.user_id == User.id)
+            )
+        elif category == 'branch':
+            event_model = BranchEvent
+            stmt = (
+                select(*EXPORT_COLUMNS[category])
+                .outerjoin(Repository, BranchEvent.repository_id == Repository.id)
+            )
+        else:
+            event_model = PushEvent
+            stmt = (
+                select(*EXPORT_COLUMNS[category])
+                .outerjoin(Repository, PushEvent.repository_id == Repository.id)
+                .outerjoin(User, PushEvent.sender_id == User.id)
+            )
+        
+        if since:
+            stmt = stmt.where(event_model.created_at >= since)
+        if until:
+            stmt = stmt.where(event_model.created_at < until)
+        if repo:
+            stmt = stmt.where(Repository.full_name == repo)
+        stmt = stmt.order_by(event_model.created_at, event_model.id)
+        
+        with self.get_session() as session:
+            try:
+                result = session.execute(
+                    stmt,
+                    execution_options={"stream_results": True, "yield_per": batch_size}
+                )
+                for row in result:
+                    event_data = dict(row._mapping)
+                    for key in ('payload', 'commits'):
+                        # JSON blobs are stored pre-encoded
+                        if isinstance(event_data.get(key), str):
+                            event_data[key] = json.loads(event_data[key])
+                    yield event_data
+            except SQLAlchemyError as e:
+                logger.error(f"Error exporting {category} events: {e}")
+                raise
+    
+    def _record_activity(self, session: Session, repo_id: Optional[int], category: str,
+                         when: Optional[datetime.datetime] = None, count: int = 1) -> None:
+        """Increment the hourly activity counter for a repository with a single upsert"""
+        if repo_id is None:
+            return
+        
+        bucket = (when or datetime.datetime.utcnow()).replace(minute=0, second=0, microsecond=0)
+        values = {'repository_id': repo_id, 'category': category, 'bucket': bucket, 'count': count}
+        
+        dialect = session.get_bind().dialect.name
+        if dialect == 'mysql':
+            stmt = mysql_insert(ActivityBucket).values(**values)
+            stmt = stmt.on_duplicate_key_update(count=ActivityBucket.count + stmt.inserted.count)
+        elif dialect == 'sqlite':
+            stmt = sqlite_insert(ActivityBucket).values(**values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['repository_id', 'category', 'bucket'],
+                set_={'count': ActivityBucket.count + stmt.excluded.count}
+            )
+        else:
+            existing = session.query(ActivityBucket).filter_by(
+                repository_id=repo_id, category=category, bucket=bucket
+            ).first()
+            if existing:
+                existing.count += count
+            else:
+                session.add(ActivityBucket(**values))
+            return
+        
+        session.execute(stmt)
+    
+    def rebuild_activity_buckets(self) -> Dict[str, Any]:
+        """Recompute the hourly activity counters from the stored event tables"""
+        return self._rebuild_activity_buckets(self._binding)
+    
+    def _rebuild_activity_buckets(self, binding: _EngineBinding) -> Dict[str, Any]:
+        with binding.Session() as session:
+            try:
+                counts = Counter()
+                sources = [
+                    ('pull_request', select(PullRequest.repository_id, PREvent.created_at)
+                        .join(PullRequest, PREvent.pull_request_id == PullRequest.id)),
+                    ('branch', select(BranchEvent.repository_id, BranchEvent.created_at)),
+                    ('push', select(PushEvent.repository_id, PushEvent.created_at)),
+                ]
+                for category, stmt in sources:
+                    rows = session.execute(stmt, execution_options={"stream_results": True, "yield_per": 1000})
+                    for repo_id, created_at in rows:
+                        if repo_id is None or created_at is None:
+                            continue
+                        counts[(repo_id, category, created_at.replace(minute=0, second=0, microsecond=0))] += 1
+                
+                session.query(ActivityBucket).delete()
+                session.add_all(
+                    ActivityBucket(repository_id=repo_id, category=category, bucket=bucket, count=count)
+                    for (repo_id, category, bucket), count in counts.items()
+                )
+                session.commit()
+                
+                logger.info(f"Activity buckets rebuilt with {len(counts)} buckets")
+                return {
+                    "success": True,
+                    "message": f"Activity buckets rebuilt with {len(counts)} buckets"
+                }
+            except SQLAlchemyError as e:
+                session.rollback()
+                logger.error(f"Error rebuilding activity buckets: {e}")
+                return {
+                    "success": False,
+                    "message": f"Failed to rebuild activity buckets: {str(e)}"
+                }
+    
+    def get_activity(self, repo: Optional[str] = None, granularity: str = 'hour', category: Optional[str] = None,
+                     since: Optional[datetime.datetime] = None, until: Optional[datetime.datetime] = None) -> Dict[str, Any]:
+        """
+        Get event counts per time bucket from the pre-aggregated hourly counters.
+        granularity is 'hour', 'day' or 'weekday_hour' (a 7x24 heatmap, Monday first).
+        """
+        if granularity not in ('hour', 'day', 'weekday_hour'):
+            raise ValueError(f"Unknown granularity: {granularity}")
+        
+        until = until or datetime.datetime.utcnow()
+        if since is None:
+            since = until - datetime.timedelta(days=2 if granularity == 'hour' else 30)
+        
+        with self.get_session() as session:
+            try:
+                stmt = (
+                    select(ActivityBucket.category, ActivityBucket.bucket, func.sum(ActivityBucket.count))
+                    .where(ActivityBucket.bucket >= since.replace(minute=0, second=0, microsecond=0))
+                    .where(ActivityBucket.bucket < until)
+                    .group_by(ActivityBucket.category, ActivityBucket.bucket)
+                )
+                if repo:
+                    stmt = stmt.join(Repository, ActivityBucket.repository_id == Repository.id)
+                    stmt = stmt.where(Repository.full_name == repo)
+                if category:
+                    stmt = stmt.where(ActivityBucket.category == category)
+                
+                totals = Counter()
+                series = Counter()
+                heatmap = [[0] * 24 for _ in range(7)]
+                for row_category, bucket, count in session.execute(stmt):
+                    count = int(count or 0)
+                    totals[row_category] += count
+                    if granularity == 'weekday_hour':
+                        heatmap[bucket.weekday()][bucket.hour] += count
+                    elif granularity == 'day':
+                        series[(bucket.replace(hour=0), row_category)] += count
+                    else:
+                        series[(bucket, row_category)] += count
+                
+                result = {
+                    'repository': repo,
+                    'granularity': granularity,
+                    'since': since.isoformat(),
+                    'until': until.isoformat(),
+                    'totals': dict(totals),
+                }
+                if granularity == 'weekday_hour':
+                    result['heatmap'] = heatmap
+                else:
+                    result['buckets'] = [
+                        {'bucket': bucket.isoformat(), 'category': row_category, 'count': count}
+                        for (bucket, row_category), count in sorted(series.items())
+                    ]
+                return result
+            except SQLAlchemyError as e:
+                logger.error(f"Error retrieving activity: {e}")
+                raise
+    
+    def get_event_rates(self, window_hours: int = 24) -> Dict[str, float]:
+        """Get the average events per hour of each repository over the last `window_hours`"""
+        since = datetime.datetime.utcnow() - datetime.timedelta(hours=window_hours)
+        with self.get_session() as session:
+            try:
+                stmt = (
+                    select(Repository.full_name, func.sum(ActivityBucket.count))
+                    .join(Repository, ActivityBucket.repository_id == Repository.id)
+                    .where(ActivityBucket.bucket >= since.replace(minute=0, second=0, microsecond=0))
+                    .group_by(Repository.full_name)
+                )
+                return {
+                    full_name: int(count or 0) / window_hours
+                    for full_name, count in session.execute(stmt)
+                }
+            except SQLAlchemyError as e:
+                logger.error(f"Error retrieving event rates: {e}")
+                raise
+    
+    def has_open_pull_request(self, repo_full_name: str, head_ref: str, fresh_within_hours: int = 168) -> Optional[bool]:
+        """
+        Check ingested pull_request events for an open PR from `head_ref` of this
+        repository (not a fork's branch of the same name).
+        Returns True/False when local state can be trusted, or None when it may be
+        stale: no open PR is stored and the repository has had no PR webhook
+        activity within `fresh_within_hours`, so PRs may exist that we never saw,
+        or an open PR from `head_ref` has no recorded head repository.
+        """
+        with self.get_session() as session:
+            try:
+                repo_id = session.execute(
+                    select(Repository.id).where(Repository.full_name == repo_full_name)
+                ).scalar()
+                if repo_id is None:
+                    return None
+                
+                # PRs from a fork's same-named branch don't count; rows stored before
+                # head_repo was recorded (NULL) can't tell, so they make the answer unknown
+                head_repos = set(session.execute(
+                    select(PullRequest.head_repo).distinct()
+                    .where(PullRequest.repository_id == repo_id, PullRequest.head_ref == head_ref,
+                           PullRequest.state == 'open')
+                ).scalars())
+                if repo_full_name in head_repos:
+                    return True
+                if None in head_repos:
+                    return None
+                
+                since = datetime.datetime.utcnow() - datetime.timedelta(hours=fresh_within_hours)
+                recent_activity = session.execute(
+                    select(ActivityBucket.id)
+                    .where(ActivityBucket.repository_id == repo_id, ActivityBucket.category == 'pull_request',
+                           ActivityBucket.bucket >= since)
+                    .limit(1)
+                ).first()
+                return False if recent_activity else None
+            except SQLAlchemyError as e:
+                logger.error(f"Error looking up open pull requests: {e}")
+                raise
+    
+    def get_branch_snapshots(self) -> Dict[str, Dict[str, Optional[str]]]:
+        """Get the stored branch sets of every scanned repository as {repo: {branch: head_sha}}"""
+        with self.get_session() as session:
+            try:
+                snapshots = {
+                    state.repository_full_name: {}
+                    for state in session.query(RepositoryScanState).all()
+                }
+                for branch in session.query(BranchSnapshot).yield_per(1000):
+                    if branch.repository_full_name in snapshots:
+                        snapshots[branch.repository_full_name][branch.name] = branch.head_sha
+                return snapshots
+            except SQLAlchemyError as e:
+                logger.error(f"Error retrieving branch snapshots: {e}")
+                raise
+    
+    def save_branch_snapshot(self, repo_full_name: str, branches: Dict[str, Optional[str]]) -> Dict[str, int]:
+        """
+        Replace the stored branch set of a repository with the result of a scan,
+        writing only the rows that changed, and record the scan time.
+        """
+        with self.get_session() as session:
+            try:
+                existing = {
+                    branch.name: branch
+                    for branch in session.query(BranchSnapshot).filter_by(repository_full_name=repo_full_name)
+                }
+                
+                added = updated = 0
+                for name, head_sha in branches.items():
+                    branch = existing.pop(name, None)
+                    if branch is None:
+                        session.add(BranchSnapshot(repository_full_name=repo_full_name, name=name, head_sha=head_sha))
+                        added += 1
+                    elif head_sha and branch.head_sha != head_sha:
+                        branch.head_sha = head_sha
+                        updated += 1
+                
+                # Whatever is left no longer exists
+                for branch in existing.values():
+                    session.delete(branch)
+                
+                state = session.query(RepositoryScanState).filter_by(repository_full_name=repo_full_name).first()
+                if not state:
+                    state = RepositoryScanState(repository_full_name=repo_full_name)
+                    session.add(state)
+                state.last_scan_at = datetime.datetime.utcnow()
+                state.branch_count = len(branches)
+                
+                session.commit()
+                return {"added": added, "updated": updated, "removed": len(existing)}
+            except SQLAlchemyError as e:
+                session.rollback()
+                logger.error(f"Error saving branch snapshot: {e}")
+                raise
+    
+    def update_snapshot_branch(self, repo_full_name: str, name: str, head_sha: Optional[str] = None,
+                               deleted: bool = False) -> bool:
+        """
+        Apply a single branch creation/deletion seen from a webhook to the stored
+        snapshot. Repositories that were never scanned are left alone so the
+        first scan still establishes their baseline. Returns True if applied.
+        """
+        with self.get_session() as session:
+            try:
+                if not session.query(RepositoryScanState).filter_by(repository_full_name=repo_full_name).first():
+                    return False
+                
+                branch = session.query(BranchSnapshot).filter_by(
+                    repository_full_name=repo_full_name, name=name
+                ).first()
+                if deleted:
+                    if branch:
+                        session.delete(branch)
+                elif branch:
+                    if head_sha:
+                        branch.head_sha = head_sha
+                else:
+                    session.add(BranchSnapshot(repository_full_name=repo_full_name, name=name, head_sha=head_sha))
+                
+                session.commit()
+                return True
+            except SQLAlchemyError as e:
+                session.rollback()
+                logger.error(f"Error updating branch snapshot: {e}")
+                raise
+    
+    def _script_job_to_dict(self, job: ScriptJob) -> Dict[str, Any]:
+        return {
+            'id': job.id,
+            'project_name': job.project_name,
+            'script_path': job.script_path,
+            'status': job.status,
+            'timeout': job.timeout,
+            'max_concurrent': job.max_concurrent,
+            'repository': job.repository_full_name,
+            'branch': job.branch,
+            'pr_number': job.pr_number,
+            'worker': job.worker,
+            'exit_code': job.exit_code,
+            'error': job.error,
+            'output_tail': job.output_tail,
+            'log_file': job.log_file,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'started_at': job.started_at.isoformat() if job.started_at else None,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        }
+    
+    def enqueue_script_job(self, job_data: Dict[str, Any]) -> int:
+        """Add a queued post-merge script job. Returns the job id."""
+        with self.get_session() as session:
+            try:
+                job = ScriptJob(status='queued', **job_data)
+                session.add(job)
+                session.commit()
+                return job.id
+            except SQLAlchemyError as e:
+                session.rollback()
+                logger.error(f"Error enqueuing script job: {e}")
+                raise
+    
+    @staticmethod
+    def _running_script_jobs(project_name):
+        """Scalar subquery counting running jobs of a project (a column or a value)"""
+        running = aliased(ScriptJob)
+        return (
+            select(func.count(running.id))
+            .where(running.project_name == project_name, running.status == 'running')
+            .scalar_subquery()
+        )
+    
+    def claim_script_job(self, worker: str) -> Optional[Dict[str, Any]]:
+        """
+        Claim the oldest queued job whose project is below its concurrency limit.
+        Projects at their limit are filtered out in the query, so runnable jobs
+        queued behind theirs are still found.
+        
+        The limit is checked again as part of the claim: on SQLite inside the
+        claiming UPDATE (which holds the write lock), elsewhere after locking
+        the project's job rows. So several processes can share the queue
+        without exceeding a project's limit.
+        """
+        with self.get_session() as session:
+            try:
+                # A few attempts in case other workers claim the candidates first
+                for _ in range(5):
+                    candidate = session.execute(
+                        select(ScriptJob.id, ScriptJob.project_name, ScriptJob.max_concurrent)
+                        .where(
+                            ScriptJob.status == 'queued',
+                            self._running_script_jobs(ScriptJob.project_name) < func.coalesce(ScriptJob.max_concurrent, 1),
+                        )
+                        .order_by(ScriptJob.id)
+                        .limit(1)
+                    ).first()
+                    if candidate is None:
+                        session.rollback()
+                        return None
+                    job_id, project_name, max_concurrent = candidate
+                    
+                    claim = update(ScriptJob).where(ScriptJob.id == job_id, ScriptJob.status == 'queued')
+                    if session.get_bind().dialect.name == 'sqlite':
+                        claim = claim.where(self._running_script_jobs(project_name) < (max_concurrent or 1))
+                    else:
+                        # Claims for the same project wait on these locks; the
+                        # locked read also sees jobs claimed since the query above
+                        statuses = session.execute(
+                            select(ScriptJob.status).where(ScriptJob.project_name == project_name).with_for_update()
+                        ).scalars().all()
+                        if statuses.count('running') >= (max_concurrent or 1):
+                            session.rollback()
+                            continue
+                    
+                    claimed = session.execute(
+                        claim.values(status='running', worker=worker, started_at=datetime.datetime.utcnow())
+                    ).rowcount
+                    session.commit()
+                    if claimed:
+                        return self._script_job_to_dict(session.get(ScriptJob, job_id))
+                    # Another worker got it (or the project's last slot) first
+                return None
+            except SQLAlchemyError as e:
+                session.rollback()
+                logger.error(f"Error claiming script job: {e}")
+                raise
+    
+    def requeue_script_job(self, job_id: int, worker: str) -> bool:
+        """Put a job claimed by `worker` but not started back in the queue. Returns True if it was."""
+        with self.get_session() as session:
+            try:
+                requeued = session.execute(
+                    update(ScriptJob)
+                    .where(ScriptJob.id == job_id, ScriptJob.status == 'running', ScriptJob.worker == worker)
+                    .values(status='queued', worker=None, started_at=None)
+                ).rowcount
+                session.commit()
+                return bool(requeued)
+            except SQLAlchemyError as e:
+                session.rollback()
+                logger.error(f"Error requeuing script job {job_id}: {e}")
+                raise
+    
+    def finish_script_job(self, job_id: int, status: str, exit_code: Optional[int] = None,
+                          error: Optional[str] = None, output_tail: Optional[str] = None,
+                          log_file: Optional[str] = None) -> None:
+        """Record the outcome of a job"""
+        with self.get_session() as session:
+            try:
+                session.execute(
+                    update(ScriptJob)
+                    .where(ScriptJob.id == job_id)
+                    .values(status=status, exit_code=exit_code, error=error, output_tail=output_tail,
+                            log_file=log_file, finished_at=datetime.datetime.utcnow())
+                )
+                session.commit()
+            except SQLAlchemyError as e:
+                session.rollback()
+                logger.error(f"Error finishing script job {job_id}: {e}")
+                raise
+    
+    def get_script_job_workers(self) -> List[str]:
+        """Workers (host:pid) that have running jobs"""
+        with self.get_session() as session:
+            try:
+                return list(session.execute(
+                    select(ScriptJob.worker).where(ScriptJob.status == 'running').distinct()
+                ).scalars())
+            except SQLAlchemyError as e:
+                logger.error(f"Error retrieving script job workers: {e}")
+                raise
+    
+    def fail_stale_script_jobs(self, grace_seconds: int = 60, dead_workers: Iterable[str] = ()) -> int:
+        """
+        Mark running jobs as failed once they are past their timeout plus a grace
+        period, which only happens if the process running them died, and right
+        away if their worker is in `dead_workers`. Returns the count.
+        """
+        now = datetime.datetime.utcnow()
+        dead_workers = set(dead_workers)
+        with self.get_session() as session:
+            try:
+                stale = [
+                    job for job in session.query(ScriptJob).filter(ScriptJob.status == 'running')
+                    if job.worker in dead_workers or job.started_at and job.started_at + datetime.timedelta(
+                        seconds=(job.timeout or 0) + grace_seconds) < now
+                ]
+                for job in stale:
+                    job.status = 'failed'
+                    job.error = f"Worker {job.worker} stopped before the job finished"
+                    job.finished_at = now
+                session.commit()
+                return len(stale)
+            except SQLAlchemyError as e:
+                session.rollback()
+                logger.error(f"Error failing stale script jobs: {e}")
+                raise
+    
+    def get_script_jobs(self, status: Optional[str] = None, repo: Optional[str] = None,
+                        project: Optional[str] = None, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+        """Get post-merge script jobs, newest first"""
+        with self.get_session() as session:
+            try:
+                query = session.query(ScriptJob)
+                if status:
+                    query = query.filter(ScriptJob.status == status)
+                if repo:
+                    query = query.filter(ScriptJob.repository_full_name == repo)
+                if project:
+                    query = query.filter(ScriptJob.project_name == project)
+                
+                total = query.count()
+                jobs = query.order_by(ScriptJob.id.desc()).offset(offset).limit(limit).all()
+                return {
+                    'total': total,
+                    'limit': limit,
+                    'offset': offset,
+                    'jobs': [self._script_job_to_dict(job) for job in jobs],
+                }
+            except SQLAlchemyError as e:
+                logger.error(f"Error retrieving script jobs: {e}")
+                raise
+    
+    def get_script_job_backlog(self) -> Dict[str, Any]:
+        """Number of queued post-merge jobs and when the oldest was queued, in one query"""
+        with self.get_session() as session:
+            try:
+                count, oldest = session.query(func.count(ScriptJob.id), func.min(ScriptJob.created_at)).filter(
+                    ScriptJob.status == 'queued'
+                ).one()
+                return {'queued': count, 'oldest_queued_at': oldest}
+            except SQLAlchemyError as e:
+                logger.error(f"Error retrieving script job backlog: {e}")
+                raise
+    
+    def get_script_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Get a single post-merge script job"""
+        with self.get_session() as session:
+            try:
+                job = session.get(ScriptJob, job_id)
+                return self._script_job_to_dict(job) if job else None
+            except SQLAlchemyError as e:
+                logger.error(f"Error retrieving script job {job_id}: {e}")
+                raise
+
+_shared_manager = None
+_shared_manager_lock = threading.Lock()
+
+def shared_database_manager() -> DatabaseManager:
+    """
+    The process-wide DatabaseManager configured from the environment (DB_TYPE etc.),
+    so apps served from one process share one engine, connection pool and search index.
+    """
+    global _shared_manager
+    if _shared_manager is None:
+        with _shared_manager_lock:
+            if _shared_manager is None:
+                if os.getenv("DB_TYPE", "SQLite").lower() == "sqlite":
+                    _shared_manager = DatabaseManager(os.getenv("GITHUB_EVENTS_DB", "github_events.db"))
+                else:
+                    _shared_manager = DatabaseManager(
+                        db_name=os.getenv("DB_NAME", "github_events"),
+                        db_type="mysql",
+                        db_host=os.getenv("DB_HOST", "localhost"),
+                        db_port=int(os.getenv("DB_PORT", 3306)),
+                        db_user=os.getenv("DB_USER", "admin"),
+                        db_password=os.getenv("DB_PASSWORD", "password")
+                    )
+    return _shared_manager
+
+def dispose_inherited_connections() -> None:
+    """
+    Call first thing in a forked child process: drops the pooled connections
+    inherited from the parent without closing them, since the parent still
+    uses them. The child opens its own on first use.
+    """
+    if _shared_manager is not None:
+        _shared_manager.engine.dispose(close=False)
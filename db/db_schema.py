@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import create_engine, Column, Integer, String, Boolean, Text, DateTime, ForeignKey, JSON, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 import datetime
@@ -38,6 +38,10 @@ class User(Base):
 
 class PullRequest(Base):
     __tablename__ = 'pull_requests'
+    __table_args__ = (
+        # Open-PR-by-head lookups before auto-creating a PR
+        Index('ix_pull_requests_repo_head_state', 'repository_id', 'head_ref', 'state'),
+    )
     
     id = Column(Integer, primary_key=True)
     github_id = Column(Integer, unique=True)
@@ -56,6 +60,7 @@ class PullRequest(Base):
     
     # Extra data storage
     head_ref = Column(String(255))  # Source branch
+    head_repo = Column(String(255), nullable=True)  # Full name of the repository head_ref is in (forks differ)
     base_ref = Column(String(255))  # Target branch
     head_sha = Column(String(255))
     base_sha = Column(String(255))
@@ -125,4 +130,96 @@ class PushEvent(Base):
     commits = Column(JSON, nullable=True)
     
     def __repr__(self):
-        return f"<PushEvent(id={self.id}, ref='{self.ref}', repo_id={self.repository_id})>"
\ No newline at end of file
+        return f"<PushEvent(id={self.id}, ref='{self.ref}', repo_id={self.repository_id})>"
+
+class SearchDocument(Base):
+    __tablename__ = 'search_documents'
+    
+    id = Column(Integer, primary_key=True)
+    doc_type = Column(String(50))  # pull_request, commit
+    doc_key = Column(String(255), unique=True)  # pr:<github_id>, commit:<repo_id>:<sha>
+    ref_id = Column(Integer)  # pull_requests.id or push_events.id
+    title = Column(String(255))
+    body = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    
+    # Foreign keys
+    repository_id = Column(Integer, ForeignKey('repositories.id'))
+    
+    def __repr__(self):
+        return f"<SearchDocument(id={self.id}, type='{self.doc_type}', key='{self.doc_key}')>"
+
+
+class ActivityBucket(Base):
+    __tablename__ = 'activity_buckets'
+    __table_args__ = (
+        UniqueConstraint('repository_id', 'category', 'bucket', name='uq_activity_bucket'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    category = Column(String(50))  # pull_request, branch, push
+    bucket = Column(DateTime)  # Start of the hour (UTC)
+    count = Column(Integer, default=0)
+    
+    # Foreign keys
+    repository_id = Column(Integer, ForeignKey('repositories.id'))
+    
+    def __repr__(self):
+        return f"<ActivityBucket(repo_id={self.repository_id}, category='{self.category}', bucket={self.bucket}, count={self.count})>"
+
+
+class BranchSnapshot(Base):
+    __tablename__ = 'branch_snapshots'
+    __table_args__ = (
+        UniqueConstraint('repository_full_name', 'name', name='uq_branch_snapshot'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    repository_full_name = Column(String(255), index=True)  # owner/name, may not be in repositories yet
+    name = Column(String(255))  # Branch name without refs/heads/
+    head_sha = Column(String(255), nullable=True)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<BranchSnapshot(repo='{self.repository_full_name}', name='{self.name}', sha='{self.head_sha}')>"
+
+
+class RepositoryScanState(Base):
+    __tablename__ = 'repository_scan_state'
+    
+    id = Column(Integer, primary_key=True)
+    repository_full_name = Column(String(255), unique=True)
+    last_scan_at = Column(DateTime, nullable=True)
+    branch_count = Column(Integer, default=0)
+    
+    def __repr__(self):
+        return f"<RepositoryScanState(repo='{self.repository_full_name}', last_scan_at={self.last_scan_at})>"
+
+
+class ScriptJob(Base):
+    __tablename__ = 'script_jobs'
+    
+    id = Column(Integer, primary_key=True)
+    project_name = Column(String(255), index=True)  # Concurrency limits apply per project script
+    script_path = Column(String(1024))
+    status = Column(String(20), default='queued', index=True)  # queued, running, succeeded, failed, timed_out
+    timeout = Column(Integer)  # Seconds before the script is killed
+    max_concurrent = Column(Integer, default=1)  # Running jobs allowed for this project at once
+    
+    # What triggered the job
+    repository_full_name = Column(String(255))
+    branch = Column(String(255))
+    pr_number = Column(Integer)
+    
+    # Execution
+    worker = Column(String(255), nullable=True)  # host:pid of the claiming process
+    exit_code = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+    output_tail = Column(Text, nullable=True)  # Last lines of output; the full output is in log_file
+    log_file = Column(String(1024), nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<ScriptJob(id={self.id}, project='{self.project_name}', status='{self.status}')>"
@@ -0,0 +1,244 @@
+import json
+import logging
+import re
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import inspect, text, bindparam
+from sqlalchemy.orm import Session
+
+from db.db_schema import SearchDocument, PullRequest, PushEvent
+
+logger = logging.getLogger(__name__)
+
+class SearchIndex:
+    """
+    Full-text index over pull request titles/bodies and commit messages.
+
+    Documents live in the regular `search_documents` table so both backends
+    share the same ingest path. On SQLite external-content FTS5 tables are
+    kept in sync with it by triggers: a stemmed one (so "merge" finds
+    "merged") and an unstemmed one for prefix queries, because porter stems
+    a partial word differently from the stored word ("tokeniz*" would miss
+    "tokenizer"). On MySQL a FULLTEXT index is used.
+    """
+
+    FTS_TABLE = "search_documents_fts"
+    FTS_PREFIX_TABLE = "search_documents_fts_prefix"
+    # FTS5 table -> (tokenizer, trigger name prefix)
+    FTS_TABLES = {
+        FTS_TABLE: ("porter unicode61", "search_documents"),
+        FTS_PREFIX_TABLE: ("unicode61", "search_documents_prefix"),
+    }
+    FULLTEXT_INDEX = "ix_search_documents_fulltext"
+
+    def __init__(self, engine):
+        """Initialize the index for the given engine"""
+        self.engine = engine
+        self.dialect = engine.dialect.name
+        self.fulltext_available = False
+
+    def ensure_schema(self) -> bool:
+        """Create the full-text structures if needed. Returns True if they were newly created."""
+        try:
+            if self.dialect == "sqlite":
+                return self._ensure_sqlite_schema()
+            elif self.dialect == "mysql":
+                return self._ensure_mysql_schema()
+            logger.warning(f"Full-text search not supported for {self.dialect}, falling back to LIKE queries")
+        except Exception as e:
+            logger.warning(f"Full-text index unavailable, falling back to LIKE queries: {e}")
+        return False
+
+    def _ensure_sqlite_schema(self) -> bool:
+        """Create the FTS5 tables and the triggers that mirror search_documents into them"""
+        created = []
+        with self.engine.begin() as conn:
+            for table, (tokenizer, trigger_prefix) in self.FTS_TABLES.items():
+                exists = conn.execute(
+                    text("SELECT name FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {"name": table}
+                ).first()
+                if exists:
+                    continue
+
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE {table} USING fts5("
+                    "title, body, content='search_documents', content_rowid='id', "
+                    f"tokenize='{tokenizer}')"
+                ))
+                conn.execute(text(
+                    f"CREATE TRIGGER {trigger_prefix}_ai AFTER INSERT ON search_documents BEGIN "
+                    f"INSERT INTO {table}(rowid, title, body) VALUES (new.id, new.title, new.body); END"
+                ))
+                conn.execute(text(
+                    f"CREATE TRIGGER {trigger_prefix}_ad AFTER DELETE ON search_documents BEGIN "
+                    f"INSERT INTO {table}({table}, rowid, title, body) "
+                    f"VALUES ('delete', old.id, old.title, old.body); END"
+                ))
+                conn.execute(text(
+                    f"CREATE TRIGGER {trigger_prefix}_au AFTER UPDATE ON search_documents BEGIN "
+                    f"INSERT INTO {table}({table}, rowid, title, body) "
+                    f"VALUES ('delete', old.id, old.title, old.body); "
+                    f"INSERT INTO {table}(rowid, title, body) VALUES (new.id, new.title, new.body); END"
+                ))
+                # Index documents stored before this table existed
+                conn.execute(text(f"INSERT INTO {table}({table}) VALUES ('rebuild')"))
+                created.append(table)
+
+        self.fulltext_available = True
+        if created:
+            logger.info(f"Created SQLite FTS5 search index ({', '.join(created)})")
+        # Documents are rebuilt from the source tables only for a new database
+        return self.FTS_TABLE in created
+
+    def _ensure_mysql_schema(self) -> bool:
+        """Add a FULLTEXT index on search_documents(title, body)"""
+        indexes = inspect(self.engine).get_indexes("search_documents")
+        if any(index["name"] == self.FULLTEXT_INDEX for index in indexes):
+            self.fulltext_available = True
+            return False
+
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                f"ALTER TABLE search_documents ADD FULLTEXT INDEX {self.FULLTEXT_INDEX} (title, body)"
+            ))
+
+        self.fulltext_available = True
+        logger.info("Created MySQL FULLTEXT search index")
+        return True
+
+    def index_pull_request(self, session: Session, pr: PullRequest) -> None:
+        """Add or refresh the search document for a pull request (caller commits)"""
+        try:
+            self._upsert(session, {
+                "doc_type": "pull_request",
+                "doc_key": f"pr:{pr.github_id}",
+                "ref_id": pr.id,
+                "repository_id": pr.repository_id,
+                "title": pr.title,
+                "body": pr.body,
+                "created_at": pr.created_at,
+            })
+        except Exception as e:
+            logger.error(f"Error indexing pull request {pr.id}: {e}")
+
+    def index_push_commits(self, session: Session, push_event: PushEvent, commits: List[Dict[str, Any]]) -> None:
+        """Add search documents for the commits of a push event (caller commits)"""
+        try:
+            for commit in commits:
+                message = commit.get("message") or ""
+                self._upsert(session, {
+                    "doc_type": "commit",
+                    "doc_key": f"commit:{push_event.repository_id}:{commit.get('id')}",
+                    "ref_id": push_event.id,
+                    "repository_id": push_event.repository_id,
+                    "title": message.split("\n", 1)[0][:255],
+                    "body": message,
+                    "created_at": push_event.created_at,
+                })
+        except Exception as e:
+            logger.error(f"Error indexing commits for push event {push_event.id}: {e}")
+
+    def _upsert(self, session: Session, doc: Dict[str, Any]) -> None:
+        """Insert a document or update the existing one with the same key"""
+        existing = session.query(SearchDocument).filter_by(doc_key=doc["doc_key"]).first()
+        if existing:
+            for key, value in doc.items():
+                if value is not None:
+                    setattr(existing, key, value)
+        else:
+            session.add(SearchDocument(**doc))
+
+    def rebuild(self, session: Session) -> int:
+        """Re-index all stored pull requests and push commits. Returns the document count."""
+        for pr in session.query(PullRequest).yield_per(500):
+            self.index_pull_request(session, pr)
+
+        for push_event in session.query(PushEvent).yield_per(500):
+            commits = push_event.commits
+            if isinstance(commits, str):
+                commits = json.loads(commits)
+            self.index_push_commits(session, push_event, commits or [])
+
+        session.commit()
+        return session.query(SearchDocument).count()
+
+    def search(self, session: Session, query: str, repos: Optional[List[str]] = None,
+               doc_type: Optional[str] = None, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+        """Run a ranked search. Results are ordered best match first."""
+        result = {"query": query, "total": 0, "limit": limit, "offset": offset, "results": []}
+
+        filters = []
+        params: Dict[str, Any] = {"limit": limit, "offset": offset}
+        if repos:
+            filters.append("r.full_name IN :repos")
+            params["repos"] = list(repos)
+        if doc_type:
+            filters.append("d.doc_type = :doc_type")
+            params["doc_type"] = doc_type
+
+        if self.fulltext_available and self.dialect == "sqlite":
+            match = self._to_fts5_query(query)
+            if not match:
+                return result
+            params["match"] = match
+            # Prefix terms only match reliably against unstemmed tokens
+            fts = self.FTS_PREFIX_TABLE if "*" in match else self.FTS_TABLE
+            where = " AND ".join([f"{fts} MATCH :match"] + filters)
+            from_clause = (
+                f"FROM {fts} JOIN search_documents d ON d.id = {fts}.rowid "
+                "LEFT JOIN repositories r ON r.id = d.repository_id"
+            )
+            # bm25() is lower-is-better; weight title matches above body matches
+            score = f"-bm25({fts}, 10.0, 1.0)"
+            snippet = f"snippet({fts}, 1, '<mark>', '</mark>', '…', 16)"
+        elif self.fulltext_available and self.dialect == "mysql":
+            params["match"] = query
+            match = "MATCH(d.title, d.body) AGAINST (:match IN NATURAL LANGUAGE MODE)"
+            where = " AND ".join([match] + filters)
+            from_clause = "FROM search_documents d LEFT JOIN repositories r ON r.id = d.repository_id"
+            score = match
+            snippet = "LEFT(d.body, 200)"
+        else:
+            params["like"] = f"%{query}%"
+            where = " AND ".join(["(d.title LIKE :like OR d.body LIKE :like)"] + filters)
+            from_clause = "FROM search_documents d LEFT JOIN repositories r ON r.id = d.repository_id"
+            score = "0"
+            snippet = "SUBSTR(d.body, 1, 200)"
+
+        count_stmt = text(f"SELECT COUNT(*) {from_clause} WHERE {where}")
+        rows_stmt = text(
+            f"SELECT d.id, d.doc_type, d.ref_id, d.repository_id, r.full_name, d.title, "
+            f"{snippet} AS snippet, {score} AS score, d.created_at "
+            f"{from_clause} WHERE {where} ORDER BY score DESC, d.created_at DESC "
+            "LIMIT :limit OFFSET :offset"
+        )
+        if repos:
+            count_stmt = count_stmt.bindparams(bindparam("repos", expanding=True))
+            rows_stmt = rows_stmt.bindparams(bindparam("repos", expanding=True))
+
+        result["total"] = session.execute(count_stmt, params).scalar() or 0
+        for row in session.execute(rows_stmt, params):
+            created_at = row.created_at
+            result["results"].append({
+                "id": row.id,
+                "type": row.doc_type,
+                "ref_id": row.ref_id,
+                "repository_id": row.repository_id,
+                "repository": row.full_name,
+                "title": row.title,
+                "snippet": row.snippet,
+                "score": float(row.score or 0),
+                "created_at": created_at.isoformat() if hasattr(created_at, "isoformat") else created_at,
+            })
+
+        return result
+
+    @staticmethod
+    def _to_fts5_query(query: str) -> str:
+        """Turn free text into a safe FTS5 expression (all terms required, trailing * for prefix)"""
+        terms = re.findall(r"\w+\*?", query, re.UNICODE)
+        return " ".join(
+            f'"{term[:-1]}"*' if term.endswith("*") else f'"{term}"'
+            for term in terms
+        )
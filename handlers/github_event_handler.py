@@ -1,12 +1,16 @@
 import logging
 import os
-from typing import Any, Callable, Dict, TypeVar, Optional
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any, Callable, Dict, TypeVar, Optional
 
 from fastapi import Request
-from github import Github
 from pydantic import BaseModel
 
-from db.db_manager import DatabaseManager
+from db.db_manager import DatabaseManager, ingestion_gate, shared_database_manager
+
+if TYPE_CHECKING:
+    from github import Github
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -14,27 +18,74 @@ logger.setLevel(logging.DEBUG)
 # Type variable for event types
 T = TypeVar("T", bound=BaseModel)
 
+def _as_attributes(value: Any) -> Any:
+    """Give a raw webhook dict the attribute access of the parsed event models"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _as_attributes(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_as_attributes(item) for item in value]
+    return value
+
+def _utc_datetime(value: Any) -> Optional[datetime]:
+    """Parse a webhook timestamp (ISO string or datetime) into a naive UTC datetime"""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 class GitHub:
-    def __init__(self, app):
+    def __init__(self, app, db_manager: Optional[DatabaseManager] = None):
         self.app = app
         self.registered_handlers = {}
+        self.listeners = {}
         self._client = None
         
-        # Initialize database manager
-        db_path = os.getenv("GITHUB_EVENTS_DB", "github_events.db")
-        self.db_manager = DatabaseManager(db_path)
-        logger.info(f"GitHub event handler initialized with database at {db_path}")
+        # Use the process-wide database manager unless one is given
+        self.db_manager = db_manager or shared_database_manager()
+        logger.info(f"GitHub event handler initialized with {self.db_manager.db_type} database")
 
     @property
-    def client(self) -> Github:
+    def client(self) -> "Github":
         if not os.getenv("GITHUB_TOKEN"):
             msg = "GITHUB_TOKEN is not set"
             logger.exception(msg)
             raise ValueError(msg)
         if not self._client:
-            self._client = Github(os.getenv("GITHUB_TOKEN"))
+            # PyGithub is only loaded once something actually calls the API
+            from github import Github
+            from managers.github_http_cache import enable_conditional_requests
+            
+            client = Github(os.getenv("GITHUB_TOKEN"))
+            enable_conditional_requests(client, store_dir=os.getenv("GITHUB_HTTP_CACHE_DIR"))
+            self._client = client
         return self._client
 
+    def reset_client(self, changes: Optional[dict] = None) -> None:
+        """Drop the cached GitHub client so the next use picks up a changed token"""
+        if self._client is not None:
+            logger.info("GitHub token changed, the client will be recreated")
+        self._client = None
+
+    def subscribe(self, event_name: str, callback: Callable[[dict], Any]) -> None:
+        """
+        Register a listener that receives the raw event dict for `event_name`
+        (e.g. "create", "push", "pull_request:closed"). Listeners run in addition
+        to the registered handler and should return quickly.
+        """
+        logger.info(f"[LISTENER] Subscribing {getattr(callback, '__qualname__', callback)} to {event_name}")
+        self.listeners.setdefault(event_name, []).append(callback)
+
+    def _notify_listeners(self, event_name: str, event: dict) -> None:
+        """Call the listeners for an event; a failing listener never blocks the others"""
+        for callback in self.listeners.get(event_name, []):
+            try:
+                callback(event)
+            except Exception as e:
+                logger.exception(f"Error in listener for {event_name}: {e}")
+
     def unsubscribe_all_handlers(self):
         logger.info("[HANDLERS] Clearing all handlers")
         self.registered_handlers.clear()
@@ -78,15 +129,21 @@ class GitHub:
         try:
             logger.debug(f"Storing event {event_name} in database")
             
-            # Handle different event types
-            if event_name.startswith('pull_request:'):
-                self._store_pr_event(event_name, event_data)
-            elif event_name == 'push':
-                self._store_push_event(event_data)
-            elif event_name in ['create', 'delete'] and getattr(event_data, 'ref_type', None) == 'branch':
-                self._store_branch_event(event_name, event_data)
-            else:
-                logger.debug(f"Event type {event_name} not configured for DB storage")
+            # Events without a registered model arrive as plain dicts
+            if isinstance(event_data, dict):
+                event_data = _as_attributes(event_data)
+            
+            # Ingestion takes priority over API reads while it holds the database
+            with ingestion_gate.writing():
+                # Handle different event types
+                if event_name.startswith('pull_request:'):
+                    self._store_pr_event(event_name, event_data)
+                elif event_name == 'push':
+                    self._store_push_event(event_data)
+                elif event_name in ['create', 'delete'] and getattr(event_data, 'ref_type', None) == 'branch':
+                    self._store_branch_event(event_name, event_data)
+                else:
+                    logger.debug(f"Event type {event_name} not configured for DB storage")
         except Exception as e:
             logger.error(f"Error storing event in database: {e}")
             # Don't re-raise; we don't want to block event processing if DB fails
@@ -137,13 +194,15 @@ class GitHub:
                 'title': pr_data.title,
                 'body': pr_data.body,
                 'state': pr_data.state,
-                'created_at': pr_data.created_at,
-                'updated_at': pr_data.updated_at,
+                'created_at': _utc_datetime(pr_data.created_at),
+                'updated_at': _utc_datetime(pr_data.updated_at),
                 'merged': getattr(pr_data, 'merged', False),
-                'merged_at': getattr(pr_data, 'merged_at', None),
+                'merged_at': _utc_datetime(getattr(pr_data, 'merged_at', None)),
                 'head': {
                     'ref': pr_data.head.ref,
                     'sha': pr_data.head.sha,
+                    # None when the head repository (a fork) has been deleted
+                    'repo': getattr(getattr(pr_data.head, 'repo', None), 'full_name', None),
                 },
                 'base': {
                     'ref': pr_data.base.ref,
@@ -159,7 +218,7 @@ class GitHub:
                     'color': event_data.label.color,
                 }
             
-            self.db_manager.save_pr_event(event_type, pr.id, payload)
+            self.db_manager.save_pr_event(event_type, pr.id, payload, repo.id)
             logger.info(f"Stored PR event: {event_type} for PR #{pr_data.number}")
         except Exception as e:
             logger.error(f"Error storing PR event: {e}")
@@ -210,7 +269,7 @@ class GitHub:
                         'author': {
                             'name': commit.author.name,
                             'email': commit.author.email,
-                            'username': commit.author.username,
+                            'username': getattr(commit.author, 'username', None),
                         },
                         'added': commit.added,
                         'removed': commit.removed,
@@ -310,6 +369,7 @@ class GitHub:
             # For simulation, use event data directly
             if not request:
                 event_type = f"pull_request:{event['action']}" if "action" in event else event.get("type", "unknown")
+                self._notify_listeners(event_type, event)
                 if event_type not in self.registered_handlers:
                     logger.info(f"[HANDLER] No handler found for event type: {event_type}")
                     
@@ -329,6 +389,7 @@ class GitHub:
             event_type = headers.get("x-github-event", "unknown")
             action = event.get("action")
             full_event_type = f"{event_type}:{action}" if action else event_type
+            self._notify_listeners(full_event_type, event)
 
             if full_event_type not in self.registered_handlers:
                 logger.info(f"[HANDLER] No handler found for event type: {full_event_type}")
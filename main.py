@@ -1,13 +1,26 @@
 import os
 import sys
+
+# Installed before anything heavy is imported so that every import is timed
+if "--profile-startup" in sys.argv:
+    from managers.startup_profiler import StartupProfiler
+    profiler = StartupProfiler().install()
+else:
+    profiler = None
+
+import signal
 import logging
-import uvicorn
+import argparse
+import importlib.util
+import multiprocessing
 import threading
 import time
 import platform
 import webbrowser
 from dotenv import load_dotenv
 
+from managers.lifecycle import lifecycle, STOP_ACCEPTING, CLOSE
+
 # Load environment variables from .env file if it exists
 load_dotenv()
 
@@ -42,6 +55,34 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# uvicorn servers running in this process, stopped first on shutdown
+servers = []
+
+def serve(app, port: int) -> None:
+    """Run an app under uvicorn until it is asked to stop"""
+    import uvicorn
+    
+    server = uvicorn.Server(uvicorn.Config(
+        app,
+        host="0.0.0.0",
+        port=port,
+        timeout_graceful_shutdown=int(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", 30))
+    ))
+    servers.append(server)
+    server.run()
+
+def stop_servers(timeout: float, threads=()) -> dict:
+    """Shutdown hook: stop accepting connections and wait for in-flight requests"""
+    deadline = time.monotonic() + timeout
+    for server in servers:
+        server.should_exit = True
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+    still_running = [thread.name for thread in threads if thread.is_alive()]
+    if still_running:
+        logger.warning(f"{', '.join(still_running)} still busy at the shutdown deadline")
+    return {"servers": len(servers)}
+
 def start_api_server():
     """Start the FastAPI server for the main API"""
     from api.api_service import app
@@ -49,7 +90,7 @@ def start_api_server():
     port = int(os.getenv("API_PORT", 8001))
     logger.info(f"Starting API server on port {port}")
     
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    serve(app, port)
 
 def start_webhook_server():
     """Start the FastAPI server for the webhook handler"""
@@ -58,11 +99,200 @@ def start_webhook_server():
     port = int(os.getenv("WEBHOOK_PORT", 8002))
     logger.info(f"Starting webhook server on port {port}")
     
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    serve(app, port)
+
+def start_combined_server():
+    """Serve the API and webhook endpoints from one app and one server on API_PORT"""
+    from api.combined_app import app
+    
+    port = int(os.getenv("API_PORT", 8001))
+    logger.info(f"Starting combined API and webhook server on port {port}")
+    
+    serve(app, port)
+
+def default_worker_count() -> int:
+    """Workers per app in production mode: the two apps together use about one process per CPU"""
+    return max(1, (os.cpu_count() or 1) // 2 + 1)
+
+def server_options() -> dict:
+    """Event loop and HTTP parser for production workers: uvloop/httptools when installed"""
+    loop = "uvloop" if importlib.util.find_spec("uvloop") and not is_windows else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    return {"loop": loop, "http": http}
+
+def forget_inherited_connections() -> None:
+    """Stop a forked child from using the supervisor's pooled database connections"""
+    if "db.db_manager" in sys.modules:
+        from db.db_manager import dispose_inherited_connections
+        dispose_inherited_connections()
+
+def reset_inherited_signals() -> None:
+    """Drop the supervisor's signal handlers in a forked child, so signals aren't swallowed by its copy"""
+    for name in ("SIGTERM", "SIGINT", "SIGHUP"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), signal.SIG_DFL)
+
+def run_production_server(app_path: str, port: int, workers: int, ingests: bool = True) -> None:
+    """
+    Run one app under uvicorn's multi-process supervisor (runs in its own process).
+    Without `ingests` the app's processes receive no webhooks, so their
+    in-process ingestion gate would never see a write.
+    """
+    import uvicorn
+    
+    reset_inherited_signals()
+    forget_inherited_connections()
+    # Only the background services process runs the branch monitor and job queue
+    os.environ["GITEVENTS_RUN_BACKGROUND"] = "false"
+    os.environ["GITEVENTS_INGESTION_IN_PROCESS"] = "true" if ingests else "false"
+    # multiprocessing gave this process a private /dev/null stdin that uvicorn's workers can't reopen
+    sys.stdin = None
+    uvicorn.run(
+        app_path,
+        host="0.0.0.0",
+        port=port,
+        workers=workers,
+        timeout_graceful_shutdown=int(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", 30)),
+        **server_options()
+    )
+
+def run_background_services() -> None:
+    """Run the branch monitor and post-merge job queue once, outside the server workers"""
+    reset_inherited_signals()
+    forget_inherited_connections()
+    os.environ["GITEVENTS_RUN_BACKGROUND"] = "false"
+    # Tunnels belong to the supervisor that opened them
+    lifecycle.unregister("ngrok")
+    from api import webhook_handler
+    
+    stopped = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stopped.set())
+    
+    webhook_handler.start_background_services()
+    logger.info(f"Background services running (pid {os.getpid()})")
+    stopped.wait()
+    lifecycle.shutdown(reason="background services stopped")
+
+class ProductionSupervisor:
+    """
+    Runs the API server, the webhook server and the background services as
+    separate processes, restarting any that exit unexpectedly.
+    
+    SIGHUP gracefully reloads: uvicorn replaces the workers of multi-worker
+    apps one at a time, single-worker apps (which run without uvicorn's
+    supervisor, so nothing there handles SIGHUP) and the background services
+    process are restarted. SIGTERM/SIGINT stop everything.
+    
+    Restarts back off exponentially (up to 30s); a process that ran for
+    `healthy_after` seconds before exiting starts from the shortest delay again.
+    """
+    
+    def __init__(self, api_workers: int, webhook_workers: int, healthy_after: float = 60):
+        self.targets = {
+            "api": (run_production_server, ("api.api_service:app", int(os.getenv("API_PORT", 8001)), api_workers, False)),
+            "webhook": (run_production_server, ("api.webhook_handler:app", int(os.getenv("WEBHOOK_PORT", 8002)), webhook_workers)),
+            "background": (run_background_services, ()),
+        }
+        self.healthy_after = healthy_after
+        self.processes = {}
+        self.started_at = {}
+        self.stopping = False
+        self.reload_requested = False
+        self._restart_at = {}  # Exited process name -> when to restart it
+        self._wakeup = threading.Event()
+    
+    def _spawn(self, name: str) -> None:
+        target, args = self.targets[name]
+        process = multiprocessing.Process(target=target, args=args, name=f"gitevents-{name}")
+        process.start()
+        self.processes[name] = process
+        self.started_at[name] = time.monotonic()
+        self._restart_at.pop(name, None)
+        logger.info(f"Started {name} process (pid {process.pid})")
+    
+    def _stop(self, name: str, timeout: float = 35) -> None:
+        process = self.processes.get(name)
+        if process is None or not process.is_alive():
+            return
+        process.terminate()
+        process.join(timeout)
+        if process.is_alive():
+            logger.warning(f"{name} process did not stop in {timeout}s, killing it")
+            process.kill()
+            process.join()
+    
+    def _reload(self) -> None:
+        logger.info("Reloading: restarting server workers and background services")
+        for name in ("api", "webhook"):
+            process = self.processes.get(name)
+            if process is None or not process.is_alive():
+                continue
+            workers = self.targets[name][1][2]
+            if workers > 1:
+                os.kill(process.pid, signal.SIGHUP)
+            else:
+                self._stop(name)
+                self._spawn(name)
+        self._stop("background")
+        self._spawn("background")
+    
+    def _request(self, attribute: str) -> None:
+        setattr(self, attribute, True)
+        self._wakeup.set()
+    
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, lambda *_: self._request("stopping"))
+        signal.signal(signal.SIGINT, lambda *_: self._request("stopping"))
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda *_: self._request("reload_requested"))
+        
+        for name in self.targets:
+            self._spawn(name)
+        
+        restarts = {name: 0 for name in self.targets}
+        while not self.stopping:
+            # Signals cut the wait short, so a stop during a restart backoff is immediate
+            self._wakeup.wait(0.5)
+            self._wakeup.clear()
+            if self.stopping:
+                break
+            if self.reload_requested:
+                self.reload_requested = False
+                self._reload()
+            
+            now = time.monotonic()
+            for name, process in list(self.processes.items()):
+                if process.is_alive() or name in self._restart_at:
+                    continue
+                if now - self.started_at[name] >= self.healthy_after:
+                    restarts[name] = 0
+                restarts[name] += 1
+                delay = min(30, 2 ** min(restarts[name], 5))
+                logger.error(f"{name} process exited with code {process.exitcode}, restarting in {delay}s")
+                self._restart_at[name] = now + delay
+            for name, due in list(self._restart_at.items()):
+                if now >= due:
+                    self._spawn(name)
+        
+        logger.info(f"{YELLOW}Shutting down GitHub Events application{RESET}")
+        for name in self.processes:
+            self._stop(name)
+
+def start_production(api_workers: int = None, webhook_workers: int = None) -> None:
+    """Run both apps with multiple worker processes each"""
+    api_workers = api_workers or int(os.getenv("API_WORKERS", 0)) or default_worker_count()
+    webhook_workers = webhook_workers or int(os.getenv("WEBHOOK_WORKERS", 0)) or default_worker_count()
+    options = server_options()
+    logger.info(f"Production mode: {api_workers} API worker(s), {webhook_workers} webhook worker(s), "
+                f"loop={options['loop']}, http={options['http']}")
+    if os.getenv("DB_TYPE", "sqlite").lower() == "sqlite" and webhook_workers > 1:
+        logger.warning("SQLite allows one writer at a time; with several webhook workers consider MySQL")
+    ProductionSupervisor(api_workers, webhook_workers).run()
 
 def init_database():
     """Initialize the database"""
-    from db.db_manager import DatabaseManager
+    from db.db_manager import shared_database_manager
     
     # Get database configuration from environment
     db_type = os.getenv("DB_TYPE", "sqlite").lower()
@@ -75,8 +305,9 @@ def init_database():
     else:
         db_path = os.getenv("GITHUB_EVENTS_DB", "github_events.db")
         logger.info(f"Initializing SQLite database at {db_path}")
-        # Create database manager (which will create tables if they don't exist)
-        db_manager = DatabaseManager(db_path)
+    # Create the process-wide database manager (which will create tables if they don't exist);
+    # the apps reuse it instead of connecting again
+    shared_database_manager()
     
     # Log success
     logger.info(f"{GREEN}Database initialized successfully{RESET}")
@@ -86,7 +317,8 @@ def start_ngrok_tunnels():
     # Check if ngrok is enabled
     if os.getenv("ENABLE_NGROK", "false").lower() == "true":
         try:
-            from api.ngrok_service import ngrok_service
+            from api.ngrok_service import get_ngrok_service
+            ngrok_service = get_ngrok_service()
             
             # Start tunnels
             webhook_port = int(os.getenv("WEBHOOK_PORT", 8002))
@@ -112,6 +344,34 @@ def start_ngrok_tunnels():
         except Exception as e:
             logger.error(f"{RED}Failed to start ngrok tunnels: {e}{RESET}")
 
+def close_ngrok_tunnels():
+    """Close ngrok tunnels if this process opened any"""
+    ngrok_module = sys.modules.get("api.ngrok_service")
+    if ngrok_module is None or not ngrok_module.ngrok_service_started():
+        return
+    try:
+        ngrok_module.get_ngrok_service().close_tunnels()
+    except Exception as e:
+        logger.error(f"Error closing ngrok tunnels: {e}")
+
+def profile_startup(combined: bool = False) -> None:
+    """Initialize everything a normal start would, without serving, and report where the time went"""
+    profiler.phases.append(("main.py imports, .env and logging", time.perf_counter() - profiler.started))
+    with profiler.phase("init database"):
+        init_database()
+    if combined:
+        with profiler.phase("import api.combined_app (both apps)"):
+            import api.combined_app
+    else:
+        with profiler.phase("import api.api_service"):
+            import api.api_service
+        with profiler.phase("import api.webhook_handler"):
+            import api.webhook_handler
+    with profiler.phase("import uvicorn"):
+        import uvicorn
+    profiler.uninstall()
+    print(profiler.report())
+
 def print_startup_banner():
     """Print a startup banner with instructions"""
     banner = f"""
@@ -140,8 +400,30 @@ def open_frontend():
         except Exception as e:
             logger.error(f"Failed to open frontend in browser: {e}")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="GitEvents server")
+    parser.add_argument("--production", action="store_true",
+                        help="Run each app with several worker processes (see API_WORKERS/WEBHOOK_WORKERS)")
+    parser.add_argument("--api-workers", type=int, help="API worker processes in production mode")
+    parser.add_argument("--webhook-workers", type=int, help="Webhook worker processes in production mode")
+    parser.add_argument("--combined", action="store_true",
+                        help="Serve the API and webhook endpoints from one server on API_PORT")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Report import and initialization time per module and phase, then exit")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
     logger.info(f"{GREEN}Starting GitHub Events application{RESET}")
+    if args.combined:
+        # Webhooks are served on the API port (tunnels and the banner follow)
+        os.environ["WEBHOOK_PORT"] = os.getenv("API_PORT", "8001")
+    
+    if args.profile_startup:
+        # Only measure: no tunnels, servers or background services
+        os.environ["GITEVENTS_RUN_BACKGROUND"] = "false"
+        profile_startup(args.combined)
+        sys.exit(0)
     
     # Initialize database
     init_database()
@@ -152,6 +434,20 @@ if __name__ == "__main__":
     # Print startup banner
     print_startup_banner()
     
+    # Tunnels close last, after in-flight requests have been answered
+    lifecycle.register("ngrok", lambda timeout: close_ngrok_tunnels(), stage=CLOSE)
+    
+    if args.production:
+        start_production(args.api_workers, args.webhook_workers)
+        lifecycle.shutdown(reason="supervisor stopped")
+        sys.exit(0)
+    
+    if args.combined:
+        # uvicorn handles Ctrl+C/SIGTERM itself; the app's lifespan runs the shutdown hooks
+        start_combined_server()
+        lifecycle.shutdown(reason="server stopped")
+        sys.exit(0)
+    
     # Start servers in separate threads
     api_thread = threading.Thread(target=start_api_server)
     webhook_thread = threading.Thread(target=start_webhook_server)
@@ -161,6 +457,8 @@ if __name__ == "__main__":
     
     api_thread.start()
     webhook_thread.start()
+    lifecycle.register("servers", lambda timeout: stop_servers(timeout, (api_thread, webhook_thread)),
+                       stage=STOP_ACCEPTING)
     
     # Open frontend in browser on Windows (if requested)
     if is_windows and os.getenv("OPEN_BROWSER", "false").lower() == "true":
@@ -168,21 +466,16 @@ if __name__ == "__main__":
         frontend_thread.daemon = True
         frontend_thread.start()
     
-    # Keep the main thread alive
+    # Keep the main thread alive until Ctrl+C or SIGTERM
+    stop_requested = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_requested.set())
     try:
-        while True:
-            time.sleep(1)
+        while not stop_requested.wait(1):
+            pass
     except KeyboardInterrupt:
-        logger.info(f"{YELLOW}Shutting down GitHub Events application{RESET}")
-        
-        # Close ngrok tunnels if enabled
-        if os.getenv("ENABLE_NGROK", "false").lower() == "true":
-            try:
-                from api.ngrok_service import ngrok_service
-                ngrok_service.close_tunnels()
-            except ImportError:
-                pass
-            except Exception as e:
-                logger.error(f"Error closing ngrok tunnels: {e}")
-        
-        sys.exit(0)
+        pass
+    
+    logger.info(f"{YELLOW}Shutting down GitHub Events application{RESET}")
+    # Stop the servers, drain background work, then close the database and tunnels
+    lifecycle.shutdown(reason="interrupted")
+    sys.exit(0)
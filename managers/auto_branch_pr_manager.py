@@ -1,16 +1,24 @@
 import os
 import logging
 import subprocess
-import json
-from typing import Dict, List, Optional, Tuple, Any
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Any
 from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
 import threading
 import time
 
-from github import Github
-from github.Repository import Repository
-from github.Branch import Branch
-from github.PullRequest import PullRequest
+from managers.poll_scheduler import RepoPollScheduler
+from managers.script_job_queue import PostMergeJobQueue
+from managers.rule_matcher import RuleMatcher
+from managers.config_store import JsonConfigStore, thaw
+
+# PyGithub, the scanners and httpx are imported when the manager first talks to GitHub
+if TYPE_CHECKING:
+    from github.Repository import Repository
+    from github.PullRequest import PullRequest
+    from managers.repo_scanner import ConcurrentRepoScanner
+    from managers.graphql_discovery import GraphQLBranchDiscovery
 
 logger = logging.getLogger(__name__)
 
@@ -21,76 +29,140 @@ class AutoBranchPRManager:
     1. Auto-create PRs for new branches
     2. Execute scripts after PR merges
     3. Add comments to newly created PRs
+    
+    New branches are picked up from `create`/`push` webhooks when the manager
+    is subscribed to the GitHub event handler; the branch monitor then only
+    runs as a low-frequency reconciliation pass.
+    
+    With a `db_manager`, the known branch sets (with head SHAs) are persisted,
+    so after a restart the first scan diffs against the stored state and
+    branches created while the service was down still get PRs.
     """
     
-    def __init__(self, config_path: str = "auto_branch_pr_config.json"):
+    def __init__(self, config_path: str = "auto_branch_pr_config.json", db_manager=None):
         """Initialize the manager with configuration path"""
         self.config_path = config_path
+        self.db_manager = db_manager
         self.github_client = None
-        self.config = self._load_config()
+        self.github_token = None
+        # Shared with other processes; edits are atomic and picked up on the next read
+        self._config_store = JsonConfigStore(config_path, self._default_config())
+        self._rules = None
+        self._rules_config = None
         self.branch_monitor_thread = None
         self.running = False
+        self.event_driven = False
+        self.known_branches = {}  # {repo_name: set(branch_names)}
+        self._branches_lock = threading.Lock()
+        self._recent_branch_events = OrderedDict()  # (repo_name, branch_name) -> None
+        self._stop_event = threading.Event()
+        self._executor = None
+        self._pending = set()  # Futures of webhook follow-up work not finished yet
+        self._pending_lock = threading.Lock()
+        self._accepting_work = True
+        self.job_queue = None
+        if db_manager:
+            settings = self.config["post_merge_scripts"]
+            self.job_queue = PostMergeJobQueue(db_manager, workers=settings["workers"], log_dir=settings["log_dir"])
     
     def initialize(self, github_token: str) -> bool:
         """Initialize with GitHub token"""
         try:
-            self.github_client = Github(github_token)
+            from github import Github
+            from managers.github_http_cache import enable_conditional_requests
+            
+            # One pooled connection per concurrent scan worker
+            github_client = Github(github_token, pool_size=self.config["branch_monitor"]["max_workers"])
+            # Unchanged repos/branches/PR lists then come back as 304s
+            enable_conditional_requests(github_client, store_dir=os.getenv("GITHUB_HTTP_CACHE_DIR"))
+            self.github_client = github_client
+            self.github_token = github_token
             logger.info("Auto Branch PR Manager initialized")
             return True
         except Exception as e:
             logger.error(f"Error initializing Auto Branch PR Manager: {e}")
             return False
-    
-    def _load_config(self) -> Dict[str, Any]:
-        """Load configuration from JSON file"""
-        default_config = {
+
+    def apply_settings(self, changes: Dict[str, Optional[str]]) -> None:
+        """
+        Re-initialize with a changed GITHUB_TOKEN. A running branch monitor is
+        restarted so it scans with the new client.
+        """
+        token = changes.get("GITHUB_TOKEN")
+        if token == self.github_token:
+            return
+        was_running = self.running
+        if was_running:
+            self.stop_branch_monitor()
+        self.github_client = None
+        self.github_token = None
+        if not token:
+            logger.info("GitHub token removed, auto branch PRs are paused until one is set")
+            return
+        if self.initialize(token):
+            logger.info("GitHub token changed, Auto Branch PR Manager re-initialized")
+            if was_running:
+                self.start_branch_monitor()
+
+    @staticmethod
+    def _default_config() -> Dict[str, Any]:
+        """Default configuration, also used to fill in fields missing from the file"""
+        return {
             "auto_pr_enabled": False,
             "auto_pr_settings": {
                 "title_template": "PR for branch: {branch_name}",
                 "body_template": "Automatically created PR for branch `{branch_name}`.",
                 "base_branch": "main",
                 "auto_assign_creator": True,
+                # Plain entries are substrings (branches) or exact names (repos);
+                # "glob:feature/*" and "re:^release-\\d+$" patterns are also accepted
                 "excluded_branches": ["main", "master", "dev", "develop", "release", "hotfix"],
                 "included_repos": [],
                 "add_comment": False,
-                "comment_text": "This PR was automatically created by GitEvents."
+                "comment_text": "This PR was automatically created by GitEvents.",
+                # Trust stored PR state for repos with PR webhooks within this many hours
+                "local_pr_state_hours": 168
+            },
+            "branch_monitor": {
+                "poll_interval": 60,  # Seconds between scans when webhooks are not used
+                "reconcile_interval": 900,  # Seconds between scans when driven by webhooks
+                "max_workers": 8,  # Concurrent GitHub requests while scanning
+                "min_rate_limit_remaining": 100,  # Slow down and pause below this budget
+                "max_poll_interval": 1800,  # Seconds between scans of repositories without recent events
+                "activity_window_hours": 24,  # Event history used to adapt each repository's interval
+                "error_backoff": 120,  # Initial per-repository delay after a failed scan (doubles per failure)
+                "discovery": "rest"  # "rest" or "graphql" (batched branch and open-PR discovery)
             },
             "post_merge_scripts": {
                 "enabled": False,
                 "selected_project": "",
                 "selected_script": "",
                 "projects": [],
-                "scripts": []
+                "scripts": [],  # Each may set "timeout" (seconds) and "max_concurrent"
+                "workers": 2,  # Scripts running at once across all projects
+                "default_timeout": 1800,  # Seconds before a script without its own timeout is killed
+                "log_dir": "logs/post_merge"  # Rotating output log per project
             }
         }
-        
-        try:
-            if os.path.exists(self.config_path):
-                with open(self.config_path, "r") as f:
-                    loaded_config = json.load(f)
-                    # Merge with default config to ensure all fields exist
-                    for key, value in default_config.items():
-                        if key not in loaded_config:
-                            loaded_config[key] = value
-                        elif isinstance(value, dict):
-                            for subkey, subvalue in value.items():
-                                if subkey not in loaded_config[key]:
-                                    loaded_config[key][subkey] = subvalue
-                    return loaded_config
-            else:
-                # Save default config
-                with open(self.config_path, "w") as f:
-                    json.dump(default_config, f, indent=2)
-                return default_config
-        except Exception as e:
-            logger.error(f"Error loading config: {e}")
-            return default_config
+    
+    @property
+    def config(self):
+        """Current configuration as a read-only snapshot (reloaded when the file changes)"""
+        return self._config_store.snapshot()
+    
+    @property
+    def rules(self) -> RuleMatcher:
+        """Matching rules compiled from the current snapshot, rebuilt once per config change"""
+        config = self.config
+        if self._rules_config is not config:
+            self._rules = RuleMatcher(config)
+            self._rules_config = config
+        return self._rules
     
     def save_config(self) -> bool:
         """Save configuration to JSON file"""
         try:
-            with open(self.config_path, "w") as f:
-                json.dump(self.config, f, indent=2)
+            self._config_store.update(lambda config: None)
             logger.info(f"Configuration saved to {self.config_path}")
             return True
         except Exception as e:
@@ -99,16 +171,19 @@ class AutoBranchPRManager:
     
     def update_config(self, new_config: Dict[str, Any]) -> bool:
         """Update configuration with new settings"""
-        try:
+        def apply(config: Dict[str, Any]) -> None:
             # Update only the fields that are provided
             for key, value in new_config.items():
-                if key in self.config:
-                    if isinstance(value, dict) and isinstance(self.config[key], dict):
-                        self.config[key].update(value)
+                if key in config:
+                    if isinstance(value, dict) and isinstance(config[key], dict):
+                        config[key].update(value)
                     else:
-                        self.config[key] = value
-            
-            return self.save_config()
+                        config[key] = value
+        
+        try:
+            self._config_store.update(apply)
+            logger.info(f"Configuration saved to {self.config_path}")
+            return True
         except Exception as e:
             logger.error(f"Error updating config: {e}")
             return False
@@ -128,25 +203,27 @@ class AutoBranchPRManager:
                 "added_at": datetime.now().isoformat()
             }
             
-            self.config["post_merge_scripts"]["scripts"].append(new_script)
+            self._config_store.update(lambda config: config["post_merge_scripts"]["scripts"].append(new_script))
             logger.info(f"Added post-merge script: {project_name}")
-            return self.save_config()
+            return True
         except Exception as e:
             logger.error(f"Error adding post-merge script: {e}")
             return False
     
     def remove_post_merge_script(self, project_name: str) -> bool:
         """Remove a post-merge script by project name"""
+        def remove(config: Dict[str, Any]) -> bool:
+            scripts = config["post_merge_scripts"]["scripts"]
+            remaining = [script for script in scripts if script["project_name"] != project_name]
+            if len(remaining) == len(scripts):
+                return False  # Nothing to write
+            config["post_merge_scripts"]["scripts"] = remaining
+            return True
+        
         try:
-            initial_count = len(self.config["post_merge_scripts"]["scripts"])
-            self.config["post_merge_scripts"]["scripts"] = [
-                script for script in self.config["post_merge_scripts"]["scripts"]
-                if script["project_name"] != project_name
-            ]
-            
-            if len(self.config["post_merge_scripts"]["scripts"]) < initial_count:
+            if self._config_store.update(remove):
                 logger.info(f"Removed post-merge script: {project_name}")
-                return self.save_config()
+                return True
             else:
                 logger.warning(f"Post-merge script not found: {project_name}")
                 return False
@@ -156,30 +233,33 @@ class AutoBranchPRManager:
     
     def get_post_merge_scripts(self) -> List[Dict[str, Any]]:
         """Get all configured post-merge scripts"""
-        return self.config["post_merge_scripts"]["scripts"]
+        return thaw(self.config["post_merge_scripts"]["scripts"])
     
     def get_projects(self) -> List[Dict[str, Any]]:
         """Get all available projects"""
-        return self.config["post_merge_scripts"]["projects"]
+        return thaw(self.config["post_merge_scripts"]["projects"])
     
     def add_project(self, project_name: str, project_id: str) -> bool:
         """Add a new project"""
-        try:
+        def add(config: Dict[str, Any]) -> bool:
             # Check if project already exists
-            for project in self.config["post_merge_scripts"]["projects"]:
+            for project in config["post_merge_scripts"]["projects"]:
                 if project["id"] == project_id:
-                    logger.warning(f"Project with ID {project_id} already exists")
                     return False
             
-            new_project = {
+            config["post_merge_scripts"]["projects"].append({
                 "id": project_id,
                 "name": project_name,
                 "added_at": datetime.now().isoformat()
-            }
-            
-            self.config["post_merge_scripts"]["projects"].append(new_project)
+            })
+            return True
+        
+        try:
+            if not self._config_store.update(add):
+                logger.warning(f"Project with ID {project_id} already exists")
+                return False
             logger.info(f"Added project: {project_name}")
-            return self.save_config()
+            return True
         except Exception as e:
             logger.error(f"Error adding project: {e}")
             return False
@@ -194,39 +274,51 @@ class AutoBranchPRManager:
         selected_script = self.config["post_merge_scripts"]["selected_script"]
         
         if selected_project and selected_script:
-            # Find the script by ID
+            # Find the script by ID (scripts added through add_post_merge_script have none)
             script_to_run = None
             for script in self.config["post_merge_scripts"]["scripts"]:
-                if script["id"] == selected_script:
+                if script.get("id") == selected_script:
                     script_to_run = script
                     break
             
             if script_to_run:
+                if self.job_queue:
+                    return self._queue_scripts([script_to_run], repo_name, branch_name, pr_number)
                 return self._run_script(script_to_run, repo_name, branch_name, pr_number)
             else:
                 return False, f"Selected script ID {selected_script} not found"
         
         # If no specific script is selected, run all enabled scripts that match the repo
-        for script in self.config["post_merge_scripts"]["scripts"]:
-            if not script["enabled"]:
+        matching_scripts = []
+        for script in self.rules.scripts_for_repo(repo_name):
+            if self.job_queue:
+                matching_scripts.append(script)
                 continue
-                
-            # Check if this script applies to this repository
-            if script["repo_patterns"]:
-                matches = False
-                for pattern in script["repo_patterns"]:
-                    if pattern in repo_name:
-                        matches = True
-                        break
-                if not matches:
-                    continue
             
             success, message = self._run_script(script, repo_name, branch_name, pr_number)
             if success:
                 return True, message
         
+        if matching_scripts:
+            return self._queue_scripts(matching_scripts, repo_name, branch_name, pr_number)
         return False, "No matching post-merge scripts found"
     
+    def _queue_scripts(self, scripts: List[Dict[str, Any]], repo_name: str, branch_name: str,
+                       pr_number: int) -> Tuple[bool, str]:
+        """Queue scripts on the post-merge job queue instead of running them on the caller's thread"""
+        try:
+            if not self.job_queue.running:
+                self.job_queue.start()
+            default_timeout = self.config["post_merge_scripts"]["default_timeout"]
+            job_ids = [
+                self.job_queue.submit(script, repo_name, branch_name, pr_number, default_timeout)
+                for script in scripts
+            ]
+            return True, f"Queued post-merge job(s): {', '.join(f'#{job_id}' for job_id in job_ids)}"
+        except Exception as e:
+            logger.error(f"Error queuing post-merge scripts: {e}")
+            return False, f"Error queuing scripts: {str(e)}"
+    
     def _run_script(self, script: Dict[str, Any], repo_name: str, branch_name: str, pr_number: int) -> Tuple[bool, str]:
         """Run a specific script with the appropriate environment variables"""
         script_path = script["script_path"]
@@ -240,13 +332,16 @@ class AutoBranchPRManager:
             env["GITHUB_PR_NUMBER"] = str(pr_number)
             env["GITHUB_PROJECT"] = project_name
             
+            timeout = script.get("timeout") or self.config["post_merge_scripts"]["default_timeout"]
+            
             # Check script type and execute
             if script_path.endswith(".py"):
                 result = subprocess.run(
                     ["python", script_path],
                     env=env,
                     capture_output=True,
-                    text=True
+                    text=True,
+                    timeout=timeout
                 )
             elif script_path.endswith(".bat"):
                 result = subprocess.run(
@@ -254,7 +349,8 @@ class AutoBranchPRManager:
                     env=env,
                     capture_output=True,
                     text=True,
-                    shell=True
+                    shell=True,
+                    timeout=timeout
                 )
             else:
                 logger.error(f"Unsupported script type: {script_path}")
@@ -270,38 +366,58 @@ class AutoBranchPRManager:
             logger.error(f"Error executing post-merge script: {e}")
             return False, f"Error executing script: {str(e)}"
     
-    def create_pull_request_for_branch(self, repo: Repository, branch_name: str) -> Optional[PullRequest]:
-        """Create a pull request for a new branch"""
+    def _should_create_pr(self, repo_name: str, branch_name: str) -> bool:
+        """Check the auto-PR settings for a branch without touching the GitHub API"""
         if not self.config["auto_pr_enabled"]:
             logger.info("Auto PR creation is disabled")
-            return None
+            return False
         
         # Check if branch should be excluded
-        excluded_branches = self.config["auto_pr_settings"]["excluded_branches"]
-        for excluded in excluded_branches:
-            if excluded in branch_name:
-                logger.info(f"Branch {branch_name} matches exclusion pattern {excluded}, skipping PR creation")
-                return None
+        excluded = self.rules.excluded_branch_pattern(branch_name)
+        if excluded is not None:
+            logger.info(f"Branch {branch_name} matches exclusion pattern {excluded}, skipping PR creation")
+            return False
         
         # Check if repo should be included
-        included_repos = self.config["auto_pr_settings"]["included_repos"]
-        if included_repos and repo.full_name not in included_repos:
-            logger.info(f"Repository {repo.full_name} not in inclusion list, skipping PR creation")
+        if not self.rules.repo_included(repo_name):
+            logger.info(f"Repository {repo_name} not in inclusion list, skipping PR creation")
+            return False
+        
+        return True
+    
+    def create_pull_request_for_branch(self, repo: "Repository", branch_name: str,
+                                       open_pr_heads: Optional[set] = None,
+                                       raise_errors: bool = False) -> Optional["PullRequest"]:
+        """
+        Create a pull request for a new branch.
+        `open_pr_heads` are head branches (of this repository, not forks) of open PRs already known from discovery;
+        when given, the branch is known to exist and the per-branch lookups are skipped.
+        With `raise_errors`, failures are raised instead of logged, so callers can retry later.
+        """
+        if not self._should_create_pr(repo.full_name, branch_name):
             return None
         
         try:
-            # Check if PR already exists for this branch
-            existing_prs = repo.get_pulls(state='open', head=f"{repo.owner.login}:{branch_name}")
-            if existing_prs.totalCount > 0:
-                logger.info(f"PR already exists for branch {branch_name} in {repo.full_name}")
-                return None
-            
-            # Get branch
-            try:
-                branch = repo.get_branch(branch_name)
-            except Exception:
-                logger.error(f"Branch {branch_name} not found in {repo.full_name}")
-                return None
+            if open_pr_heads is not None:
+                if branch_name in open_pr_heads:
+                    logger.info(f"PR already exists for branch {branch_name} in {repo.full_name}")
+                    return None
+            else:
+                # Ingested pull_request events answer this without an API call unless they may be stale
+                has_open_pr = self._local_open_pr_state(repo.full_name, branch_name)
+                if has_open_pr is None:
+                    existing_prs = repo.get_pulls(state='open', head=f"{repo.owner.login}:{branch_name}")
+                    has_open_pr = existing_prs.totalCount > 0
+                if has_open_pr:
+                    logger.info(f"PR already exists for branch {branch_name} in {repo.full_name}")
+                    return None
+                
+                # Get branch
+                try:
+                    branch = repo.get_branch(branch_name)
+                except Exception:
+                    logger.error(f"Branch {branch_name} not found in {repo.full_name}")
+                    return None
             
             # Generate PR title and body from templates
             title_template = self.config["auto_pr_settings"]["title_template"]
@@ -311,13 +427,22 @@ class AutoBranchPRManager:
             title = title_template.format(branch_name=branch_name, repo_name=repo.name)
             body = body_template.format(branch_name=branch_name, repo_name=repo.name)
             
+            from github.GithubException import GithubException
+            
             # Create the PR
-            pr = repo.create_pull(
-                title=title,
-                body=body,
-                head=branch_name,
-                base=base_branch
-            )
+            try:
+                pr = repo.create_pull(
+                    title=title,
+                    body=body,
+                    head=branch_name,
+                    base=base_branch
+                )
+            except GithubException as e:
+                # A PR opened since our lookup (e.g. its webhook is still in flight)
+                if e.status == 422 and "already exists" in str(e.data).lower():
+                    logger.info(f"PR already exists for branch {branch_name} in {repo.full_name}")
+                    return None
+                raise
             
             logger.info(f"Created PR #{pr.number} for branch {branch_name} in {repo.full_name}")
             
@@ -330,9 +455,206 @@ class AutoBranchPRManager:
             
             return pr
         except Exception as e:
+            if raise_errors:
+                raise
             logger.error(f"Error creating PR for branch {branch_name}: {e}")
             return None
     
+    def _local_open_pr_state(self, repo_name: str, branch_name: str) -> Optional[bool]:
+        """Open-PR state from the database, or None if unknown or possibly stale"""
+        if not self.db_manager:
+            return None
+        try:
+            return self.db_manager.has_open_pull_request(
+                repo_name, branch_name, self.config["auto_pr_settings"]["local_pr_state_hours"]
+            )
+        except Exception as e:
+            logger.error(f"Error checking stored pull requests for {branch_name} in {repo_name}: {e}")
+            return None
+    
+    def subscribe(self, github_handler) -> None:
+        """Receive branch creations from the webhook handler instead of waiting for the next poll"""
+        github_handler.subscribe("create", self._on_create_event)
+        github_handler.subscribe("push", self._on_push_event)
+        github_handler.subscribe("delete", self._on_delete_event)
+        github_handler.subscribe("pull_request:closed", self._on_pull_request_closed)
+        self.event_driven = True
+        logger.info("Auto Branch PR Manager subscribed to create/push/delete/pull_request:closed events")
+    
+    def _on_pull_request_closed(self, event: Dict[str, Any]) -> None:
+        """Queue post-merge scripts when a pull request is merged"""
+        pr = event.get("pull_request") or {}
+        repo_name = (event.get("repository") or {}).get("full_name")
+        if not pr.get("merged") or not repo_name or not self.config["post_merge_scripts"]["enabled"]:
+            return
+        branch_name = (pr.get("head") or {}).get("ref", "")
+        # Queuing is a database write; keep it (and the no-database fallback) off the request thread
+        self._submit(self._handle_merge, repo_name, branch_name, pr.get("number"))
+    
+    def _handle_merge(self, repo_name: str, branch_name: str, pr_number: int) -> None:
+        success, message = self.execute_post_merge_script(repo_name, branch_name, pr_number)
+        logger.info(f"Post-merge scripts for {repo_name}#{pr_number}: {message}")
+    
+    def _on_create_event(self, event: Dict[str, Any]) -> None:
+        """Handle a `create` webhook; only branch creations are relevant"""
+        if event.get("ref_type") != "branch":
+            return
+        repo_name = (event.get("repository") or {}).get("full_name")
+        if repo_name and event.get("ref"):
+            self._submit_new_branch(repo_name, event["ref"])
+    
+    def _on_push_event(self, event: Dict[str, Any]) -> None:
+        """Handle a `push` webhook; only pushes that create a branch are relevant"""
+        ref = event.get("ref") or ""
+        if not event.get("created") or not ref.startswith("refs/heads/"):
+            return
+        repo_name = (event.get("repository") or {}).get("full_name")
+        if repo_name:
+            self._submit_new_branch(repo_name, ref[len("refs/heads/"):], event.get("after"))
+    
+    def _on_delete_event(self, event: Dict[str, Any]) -> None:
+        """Forget a deleted branch so that re-creating it counts as new again"""
+        if event.get("ref_type") != "branch":
+            return
+        repo_name = (event.get("repository") or {}).get("full_name")
+        self._forget_branch(repo_name, event.get("ref"))
+        if repo_name and event.get("ref"):
+            self._submit(self._persist_branch_change, repo_name, event["ref"], None, True)
+    
+    def _submit_new_branch(self, repo_name: str, branch_name: str, head_sha: Optional[str] = None) -> None:
+        """Queue PR creation for a branch reported by a webhook, off the request thread"""
+        if not self._mark_branch_seen(repo_name, branch_name):
+            return
+        
+        logger.info(f"New branch from webhook: {branch_name} in {repo_name}")
+        self._submit(self._create_pr_for_new_branch, repo_name, branch_name, head_sha)
+    
+    def _submit(self, fn, *args) -> None:
+        """Run webhook follow-up work on the manager's executor"""
+        with self._pending_lock:
+            if not self._accepting_work:
+                logger.warning(f"Shutting down, not running {fn.__name__}{args}")
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="auto-branch-pr")
+            future = self._executor.submit(fn, *args)
+            self._pending.add(future)
+        future.add_done_callback(self._work_done)
+    
+    @property
+    def pending_tasks(self) -> int:
+        """Webhook follow-up tasks queued or running"""
+        return len(self._pending)
+    
+    def _work_done(self, future) -> None:
+        with self._pending_lock:
+            self._pending.discard(future)
+    
+    def drain(self, timeout: float = 10.0) -> Dict[str, int]:
+        """
+        Stop the branch monitor and finish queued webhook follow-up work
+        (branch snapshots, PR creation) within `timeout` seconds; work not
+        done by then is cancelled. Returns {"drained": n, "dropped": n}.
+        """
+        deadline = time.monotonic() + timeout
+        with self._pending_lock:
+            self._accepting_work = False
+            executor, self._executor = self._executor, None
+            pending = list(self._pending)
+        if self.running:
+            self.stop_branch_monitor()
+        if executor is None:
+            return {"drained": 0, "dropped": 0}
+        
+        done, not_done = wait_futures(pending, timeout=max(0.0, deadline - time.monotonic()))
+        executor.shutdown(wait=False, cancel_futures=True)
+        if not_done:
+            logger.warning(f"Dropped {len(not_done)} unfinished branch/PR task(s) at shutdown")
+        return {"drained": len(done), "dropped": len(not_done)}
+    
+    def _persist_branch_change(self, repo_name: str, branch_name: str, head_sha: Optional[str],
+                               deleted: bool) -> None:
+        """Apply a webhook branch creation/deletion to the stored snapshot (runs on the executor)"""
+        if not self.db_manager:
+            return
+        try:
+            self.db_manager.update_snapshot_branch(repo_name, branch_name, head_sha, deleted=deleted)
+        except Exception as e:
+            logger.error(f"Error saving branch snapshot for {branch_name} in {repo_name}: {e}")
+    
+    def _load_branch_snapshots(self) -> None:
+        """Seed known branches from the database so the first scan diffs against stored state"""
+        if not self.db_manager:
+            return
+        try:
+            snapshots = self.db_manager.get_branch_snapshots()
+        except Exception as e:
+            logger.error(f"Error loading branch snapshots, starting from an empty baseline: {e}")
+            return
+        
+        with self._branches_lock:
+            for repo_name, branches in snapshots.items():
+                self.known_branches.setdefault(repo_name, set()).update(branches)
+        logger.info(f"Loaded branch snapshots for {len(snapshots)} repositories")
+    
+    def _save_branch_snapshot(self, repo_name: str, branches: Dict[str, str]) -> None:
+        """Persist the branch set found by a scan"""
+        if not self.db_manager:
+            return
+        try:
+            self.db_manager.save_branch_snapshot(repo_name, branches)
+        except Exception as e:
+            logger.error(f"Error saving branch snapshot for {repo_name}: {e}")
+    
+    def _mark_branch_seen(self, repo_name: str, branch_name: str) -> bool:
+        """
+        Record a branch as known. Returns False if it was already seen, which
+        de-duplicates the `create` and `push` webhooks GitHub sends for one branch
+        and keeps the reconciliation scan from acting on it again.
+        """
+        with self._branches_lock:
+            key = (repo_name, branch_name)
+            if key in self._recent_branch_events:
+                return False
+            self._recent_branch_events[key] = None
+            if len(self._recent_branch_events) > 1000:
+                self._recent_branch_events.popitem(last=False)
+            
+            # Only extend repos that already have a baseline; the first scan of
+            # an unknown repo records all its branches without creating PRs
+            if repo_name in self.known_branches:
+                if branch_name in self.known_branches[repo_name]:
+                    return False
+                self.known_branches[repo_name].add(branch_name)
+            return True
+    
+    def _forget_branch(self, repo_name: str, branch_name: str) -> None:
+        """Drop a branch from the known set, so the next scan (or webhook) treats it as new again"""
+        with self._branches_lock:
+            self._recent_branch_events.pop((repo_name, branch_name), None)
+            if repo_name in self.known_branches:
+                self.known_branches[repo_name].discard(branch_name)
+    
+    def _create_pr_for_new_branch(self, repo_name: str, branch_name: str, head_sha: Optional[str] = None) -> None:
+        """
+        Create the PR for a branch reported by a webhook, if the settings call
+        for one, then record the branch in the stored snapshot (runs on the
+        executor). If creation fails the branch is not recorded, so a later
+        scan, also after a restart, retries it.
+        """
+        if self._should_create_pr(repo_name, branch_name):
+            try:
+                if not self.github_client:
+                    raise RuntimeError("GitHub client not initialized")
+                repo = self.github_client.get_repo(repo_name)
+                self.create_pull_request_for_branch(repo, branch_name, raise_errors=True)
+            except Exception as e:
+                logger.error(f"Error handling new branch {branch_name} in {repo_name}: {e}")
+                self._forget_branch(repo_name, branch_name)
+                return
+        
+        self._persist_branch_change(repo_name, branch_name, head_sha, False)
+    
     def start_branch_monitor(self) -> bool:
         """Start background thread to monitor for new branches"""
         if self.running:
@@ -340,7 +662,10 @@ class AutoBranchPRManager:
             return False
         
         self.running = True
-        self.branch_monitor_thread = threading.Thread(target=self._branch_monitor_loop)
+        # A new event per run: a previous loop still stuck in a request keeps its own, already set
+        self._stop_event = threading.Event()
+        self._load_branch_snapshots()
+        self.branch_monitor_thread = threading.Thread(target=self._branch_monitor_loop, args=(self._stop_event,))
         self.branch_monitor_thread.daemon = True
         self.branch_monitor_thread.start()
         logger.info("Branch monitor started")
@@ -353,70 +678,201 @@ class AutoBranchPRManager:
             return False
         
         self.running = False
+        self._stop_event.set()
         if self.branch_monitor_thread:
             self.branch_monitor_thread.join(timeout=3)
+        # The executor keeps serving webhooks; drain() shuts it down
         logger.info("Branch monitor stopped")
         return True
     
-    def _branch_monitor_loop(self) -> None:
-        """Background loop to monitor for new branches"""
+    def _poll_bounds(self) -> Tuple[int, int]:
+        """
+        Shortest and longest per-repository poll intervals. Frequent polling
+        is only needed when webhooks are not wired up; otherwise scans just reconcile.
+        """
+        settings = self.config["branch_monitor"]
+        if self.event_driven:
+            return settings["reconcile_interval"], max(settings["reconcile_interval"], settings["max_poll_interval"])
+        return settings["poll_interval"], settings["max_poll_interval"]
+    
+    def _event_rates(self) -> Dict[str, float]:
+        """Recent events per hour per repository from stored events (empty without a database)"""
+        if not self.db_manager:
+            return {}
+        try:
+            return self.db_manager.get_event_rates(self.config["branch_monitor"]["activity_window_hours"])
+        except Exception as e:
+            logger.error(f"Error reading repository event rates: {e}")
+            return {}
+    
+    def _branch_monitor_loop(self, stop_event: threading.Event) -> None:
+        """
+        Background loop to monitor for new branches. Each repository has its
+        own next-poll time: active repositories (by stored event rate) are
+        polled more often, and failing ones back off without delaying the rest.
+        Runs until `stop_event` is set; rate-limit pauses end early then too.
+        """
         if not self.github_client:
             logger.error("GitHub client not initialized")
             self.running = False
             return
         
-        known_branches = {}  # {repo_name: set(branch_names)}
+        from managers.repo_scanner import ConcurrentRepoScanner, ScanStopped
         
-        while self.running:
+        settings = self.config["branch_monitor"]
+        scanner = ConcurrentRepoScanner(
+            self.github_client,
+            max_workers=settings["max_workers"],
+            min_remaining=settings["min_rate_limit_remaining"],
+            stop_event=stop_event
+        )
+        discovery = None
+        if settings["discovery"] == "graphql":
+            from managers.graphql_discovery import GraphQLBranchDiscovery
+            discovery = GraphQLBranchDiscovery(
+                self.github_token,
+                min_remaining=settings["min_rate_limit_remaining"],
+                sleep=stop_event.wait
+            )
+        
+        min_interval, max_interval = self._poll_bounds()
+        scheduler = RepoPollScheduler(min_interval, max_interval, error_backoff=settings["error_backoff"])
+        repos = {}  # {repo_name: Repository or None}
+        next_repo_refresh = 0.0
+        
+        while not stop_event.is_set():
             try:
-                # Get repositories to monitor
-                included_repos = self.config["auto_pr_settings"]["included_repos"]
-                repos_to_check = []
+                # Refresh the monitored repository list at the slowest poll rate
+                if time.time() >= next_repo_refresh:
+                    scheduler.min_interval, scheduler.max_interval = self._poll_bounds()
+                    repos = self._list_monitored_repos(discovery)
+                    scheduler.sync(repos)
+                    next_repo_refresh = time.time() + scheduler.max_interval
                 
-                if included_repos:
-                    # Only check specified repositories
-                    for repo_name in included_repos:
-                        try:
-                            repo = self.github_client.get_repo(repo_name)
-                            repos_to_check.append(repo)
-                        except Exception as e:
-                            logger.error(f"Error accessing repository {repo_name}: {e}")
-                else:
-                    # Check all accessible repositories
-                    repos = self.github_client.get_user().get_repos()
-                    repos_to_check = list(repos)
+                due = scheduler.pop_due()
+                if due:
+                    self._poll_repos(due, repos, scheduler, scanner, discovery, stop_event)
+                
+                # Sleep until the next repository is due
+                wait = scheduler.seconds_until_next()
+                wait = next_repo_refresh - time.time() if wait is None else min(wait, next_repo_refresh - time.time())
+                stop_event.wait(max(1.0, wait))
+            except ScanStopped:
+                break
+            except Exception as e:
+                logger.error(f"Error in branch monitor loop: {e}")
+                stop_event.wait(120)  # Longer sleep when the repository list itself fails
+        
+        if discovery:
+            discovery.close()
+    
+    def _list_monitored_repos(self, discovery: Optional["GraphQLBranchDiscovery"]) -> Dict[str, Optional["Repository"]]:
+        """Get the repositories to monitor as {repo_name: Repository or None if not fetched yet}"""
+        included_repos = self.rules.included_repos
+        if included_repos and not included_repos.has_patterns:
+            # Only check specified repositories
+            return {repo_name: None for repo_name in included_repos.exact_values}
+        if discovery:
+            repos = {repo_name: None for repo_name in discovery.list_repositories()}
+        else:
+            # Check all accessible repositories
+            repos = {repo.full_name: repo for repo in self.github_client.get_user().get_repos()}
+        if included_repos:
+            # Glob/regex inclusions: keep the accessible repositories they match
+            repos = {name: repo for name, repo in repos.items() if self.rules.repo_included(name)}
+            for repo_name in included_repos.exact_values:
+                repos.setdefault(repo_name, None)
+        return repos
+    
+    def _poll_repos(self, due: List[str], repos: Dict[str, Optional["Repository"]], scheduler: RepoPollScheduler,
+                    scanner: "ConcurrentRepoScanner", discovery: Optional["GraphQLBranchDiscovery"],
+                    stop_event: Optional[threading.Event] = None) -> None:
+        """Scan the due repositories, create PRs for new branches and reschedule each one"""
+        if discovery:
+            branches_by_repo, open_pr_heads, errors = self._discover_with_graphql(discovery, due)
+        else:
+            branches_by_repo, errors = self._discover_with_rest(scanner, due, repos)
+            open_pr_heads = {}
+        if stop_event is not None and stop_event.is_set():
+            # Stopped mid-scan: results are partial, leave state for the next run
+            return
+        rates = self._event_rates()
+        
+        # Process each repository
+        for repo_name in due:
+            if repo_name in errors:
+                logger.error(f"Error getting branches for {repo_name}: {errors[repo_name]}")
+                scheduler.record_failure(repo_name)
+                continue
+            
+            try:
+                current_branches = set(branches_by_repo[repo_name])
                 
-                # Process each repository
-                for repo in repos_to_check:
-                    repo_name = repo.full_name
-                    
-                    # Get current branches
-                    try:
-                        current_branches = set(branch.name for branch in repo.get_branches())
-                    except Exception as e:
-                        logger.error(f"Error getting branches for {repo_name}: {e}")
-                        continue
-                    
+                with self._branches_lock:
                     # Initialize if first time seeing this repo
-                    if repo_name not in known_branches:
-                        known_branches[repo_name] = current_branches
-                        continue
-                    
-                    # Find new branches
-                    old_branches = known_branches[repo_name]
-                    new_branches = current_branches - old_branches
-                    
-                    # Create PRs for new branches
-                    for branch_name in new_branches:
-                        logger.info(f"New branch detected: {branch_name} in {repo_name}")
-                        if self.config["auto_pr_enabled"]:
-                            self.create_pull_request_for_branch(repo, branch_name)
-                    
-                    # Update known branches
-                    known_branches[repo_name] = current_branches
+                    if repo_name not in self.known_branches:
+                        self.known_branches[repo_name] = current_branches
+                        new_branches = set()
+                    else:
+                        # Find new branches (ones already handled from webhooks are known)
+                        old_branches = self.known_branches[repo_name]
+                        new_branches = current_branches - old_branches
+                        
+                        # Update known branches
+                        self.known_branches[repo_name] = current_branches
                 
-                # Sleep before next check
-                time.sleep(60)  # Check every minute
+                # Create PRs for new branches
+                failed = set()
+                for branch_name in new_branches:
+                    logger.info(f"New branch detected: {branch_name} in {repo_name}")
+                    if self.config["auto_pr_enabled"]:
+                        try:
+                            if repos.get(repo_name) is None:
+                                repos[repo_name] = self.github_client.get_repo(repo_name)
+                            self.create_pull_request_for_branch(repos[repo_name], branch_name,
+                                                                open_pr_heads.get(repo_name), raise_errors=True)
+                        except Exception as e:
+                            logger.error(f"Error creating PR for branch {branch_name} in {repo_name}: {e}")
+                            failed.add(branch_name)
+                
+                # Persist only after acting on new branches, so a crash in
+                # between makes the next start pick them up again; branches
+                # whose PR failed stay unknown and are retried on the next scan
+                for branch_name in failed:
+                    self._forget_branch(repo_name, branch_name)
+                self._save_branch_snapshot(repo_name, {name: sha for name, sha in branches_by_repo[repo_name].items()
+                                                       if name not in failed})
+                scheduler.record_success(repo_name, rates.get(repo_name, 0.0))
             except Exception as e:
-                logger.error(f"Error in branch monitor loop: {e}")
-                time.sleep(120)  # Longer sleep on error
+                logger.error(f"Error processing branches for {repo_name}: {e}")
+                scheduler.record_failure(repo_name)
+    
+    def _discover_with_rest(self, scanner: "ConcurrentRepoScanner", repo_names: List[str],
+                            repos: Dict[str, Optional["Repository"]]):
+        """
+        List branches with one REST call per repository, fetching (and keeping
+        in `repos`) Repository objects that are not known yet.
+        Returns ({repo_name: {branch: sha}}, {repo_name: error}).
+        """
+        def list_branches(repo_name: str) -> Dict[str, str]:
+            repo = repos.get(repo_name)
+            if repo is None:
+                repo = self.github_client.get_repo(repo_name)
+                repos[repo_name] = repo
+            return {branch.name: branch.commit.sha for branch in repo.get_branches()}
+        
+        # Get current branches and their head SHAs for all repositories concurrently
+        return scanner.scan(repo_names, list_branches, key=lambda name: name)
+    
+    def _discover_with_graphql(self, discovery: "GraphQLBranchDiscovery", repo_names: List[str]):
+        """
+        List branches and open PR heads for many repositories per GraphQL query.
+        Returns ({repo_name: {branch: sha}}, {repo_name: open PR heads}, {repo_name: error}).
+        """
+        found, errors = discovery.discover(repo_names)
+        logger.debug(f"GraphQL discovery covered {len(found)} repositories, "
+                     f"{discovery.last_rate_limit.get('remaining')} points left")
+        
+        branches_by_repo = {repo_name: result["branches"] for repo_name, result in found.items()}
+        open_pr_heads = {repo_name: result["open_pr_heads"] for repo_name, result in found.items()}
+        return branches_by_repo, open_pr_heads, errors
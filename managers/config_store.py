@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+def freeze(value: Any) -> Any:
+    """Recursively turn dicts into read-only mappings and lists into tuples"""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+def thaw(value: Any) -> Any:
+    """Mutable deep copy of a frozen (or plain) config value"""
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(item) for item in value]
+    return value
+
+
+class JsonConfigStore:
+    """
+    A JSON config file shared by several threads and processes.
+
+    - Readers get an immutable snapshot; a new snapshot is swapped in when the
+      file's mtime/size changes (checked at most every `check_interval` seconds),
+      so reads never take a lock and always see a complete config.
+    - Writers apply a function to a fresh copy of the on-disk config under an
+      inter-process lock and write it to a temp file that is renamed over the
+      original, so other processes never read a half-written file.
+    """
+
+    def __init__(self, path: str, defaults: Optional[Dict[str, Any]] = None, check_interval: float = 1.0):
+        """Initialize the store and load the file, creating it from the defaults if missing"""
+        self.path = path
+        self.defaults = defaults or {}
+        self.check_interval = check_interval
+        self.version = 0
+        self._lock = threading.Lock()
+        self._signature = None
+        self._next_check = 0.0
+        self._snapshot = freeze(self.defaults)
+
+        with self._lock:
+            if not os.path.exists(self.path):
+                try:
+                    self._write(self.defaults)
+                except Exception as e:
+                    logger.error(f"Error writing default config to {self.path}: {e}")
+            self._reload()
+
+    def snapshot(self) -> Mapping[str, Any]:
+        """The current config as a read-only mapping, reloaded if the file changed"""
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            if self._stat() != self._signature:
+                with self._lock:
+                    if self._stat() != self._signature:
+                        self._reload()
+        return self._snapshot
+
+    def update(self, mutate: Callable[[Dict[str, Any]], Any]) -> Any:
+        """
+        Apply `mutate` to a mutable copy of the latest config and save it atomically.
+        Returns whatever `mutate` returns; if it returns False nothing is written.
+        """
+        with self._lock, self._file_lock():
+            self._reload()
+            config = thaw(self._snapshot)
+            result = mutate(config)
+            if result is False:
+                return result
+            self._write(config)
+            self._reload()
+            return result
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+            # A rename always brings a new inode, even within the mtime resolution
+            return stat.st_ino, stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _reload(self) -> None:
+        """Read the file and swap in a new snapshot (caller holds the lock)"""
+        signature = self._stat()
+        if signature is not None and signature == self._signature:
+            return
+        try:
+            with open(self.path, "r") as f:
+                loaded = json.load(f)
+        except FileNotFoundError:
+            loaded = {}
+        except Exception as e:
+            # Keep serving the last good snapshot
+            logger.error(f"Error loading config from {self.path}: {e}")
+            self._signature = signature
+            return
+
+        self._snapshot = freeze(self._merge_defaults(loaded))
+        self._signature = signature
+        self.version += 1
+        if self.version > 1:
+            logger.info(f"Configuration reloaded from {self.path}")
+
+    def _merge_defaults(self, loaded: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge with default config to ensure all fields exist"""
+        for key, value in self.defaults.items():
+            if key not in loaded:
+                loaded[key] = thaw(value)
+            elif isinstance(value, dict) and isinstance(loaded[key], dict):
+                for subkey, subvalue in value.items():
+                    if subkey not in loaded[key]:
+                        loaded[key][subkey] = thaw(subvalue)
+        return loaded
+
+    def _write(self, config: Dict[str, Any]) -> None:
+        """Write to a temp file in the same directory and rename it over the config"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".config-", suffix=".tmp", dir=directory)
+        try:
+            # mkstemp creates the file private; keep the config's own permissions
+            try:
+                os.chmod(tmp_path, os.stat(self.path).st_mode & 0o777)
+            except OSError:
+                os.chmod(tmp_path, 0o644)
+            with os.fdopen(fd, "w") as f:
+                json.dump(config, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    @contextmanager
+    def _file_lock(self):
+        """Serialize writers across processes (advisory lock; a no-op where fcntl is unavailable)"""
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
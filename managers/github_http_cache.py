@@ -0,0 +1,236 @@
+import os
+import json
+import base64
+import hashlib
+import logging
+import threading
+import urllib.parse
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Any, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+if TYPE_CHECKING:
+    from github import Github
+
+logger = logging.getLogger(__name__)
+
+# Headers that must come from the live 304 response rather than the cached 200
+FRESH_HEADERS = ("date", "x-ratelimit-limit", "x-ratelimit-remaining", "x-ratelimit-reset",
+                 "x-ratelimit-used", "x-ratelimit-resource", "x-github-request-id")
+
+class ConditionalRequestCache:
+    """
+    Stores response bodies with their ETag/Last-Modified validators per URL.
+    Entries are kept in a bounded in-memory LRU and, if `store_dir` is set,
+    also written to disk so validators survive restarts.
+    """
+
+    def __init__(self, max_entries: int = 2048, store_dir: Optional[str] = None):
+        """Initialize the cache"""
+        self.max_entries = max_entries
+        self.store_dir = store_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0  # 304 responses served from the cache
+        self.misses = 0
+
+        if store_dir:
+            os.makedirs(store_dir, exist_ok=True)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get the cached entry for a key, loading it from disk if needed"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        entry = self._load(key)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        """Store an entry in memory and, if configured, on disk"""
+        self._remember(key, entry)
+        self._save(key, entry)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache hit/miss counters"""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "store_dir": self.store_dir,
+        }
+
+    def _remember(self, key: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.store_dir, hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.store_dir:
+            return None
+        try:
+            with open(self._path(key), "r") as f:
+                data = json.load(f)
+            data["body"] = base64.b64decode(data["body"])
+            return data
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable HTTP cache entry: {e}")
+            return None
+
+    def _save(self, key: str, entry: Dict[str, Any]) -> None:
+        if not self.store_dir:
+            return
+        try:
+            path = self._path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(dict(entry, body=base64.b64encode(entry["body"]).decode("ascii")), f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Error writing HTTP cache entry: {e}")
+
+
+class ConditionalCacheAdapter(requests.adapters.HTTPAdapter):
+    """
+    Transport adapter that turns repeated GETs into conditional requests.
+    A 304 is answered from the cache as a normal 200, so callers (PyGithub)
+    never see the difference; GitHub does not count 304s against the rate limit.
+    """
+
+    def __init__(self, cache: ConditionalRequestCache, **kwargs):
+        self.cache = cache
+        super().__init__(**kwargs)
+
+    def send(self, request, stream=False, **kwargs):
+        # Leave streamed downloads and caller-managed conditional requests alone
+        if (request.method != "GET" or stream
+                or "If-None-Match" in request.headers or "If-Modified-Since" in request.headers):
+            return super().send(request, stream=stream, **kwargs)
+
+        key = self._cache_key(request)
+        entry = self.cache.get(key)
+        if entry:
+            if entry.get("etag"):
+                request.headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                request.headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = super().send(request, stream=stream, **kwargs)
+
+        if response.status_code == 304 and entry:
+            self.cache.hits += 1
+            # Read the (empty) body so the connection goes back to the pool
+            response.content
+            return self._from_cache(entry, response)
+
+        self.cache.misses += 1
+        if response.status_code == 200:
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if etag or last_modified:
+                self.cache.put(key, {
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "headers": dict(response.headers),
+                    "body": response.content,
+                })
+        return response
+
+    @staticmethod
+    def _cache_key(request) -> str:
+        """Key on URL, Accept and a digest of the credentials (different tokens see different data)"""
+        auth = request.headers.get("Authorization", "")
+        auth_digest = hashlib.sha256(auth.encode()).hexdigest()[:16] if auth else "anonymous"
+        return f"{request.url}|{request.headers.get('Accept', '')}|{auth_digest}"
+
+    @staticmethod
+    def _from_cache(entry: Dict[str, Any], not_modified: requests.Response) -> requests.Response:
+        """Build a 200 response from a cache entry, keeping live rate-limit headers"""
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        for name in FRESH_HEADERS:
+            if name in not_modified.headers:
+                response.headers[name] = not_modified.headers[name]
+        response.headers["X-GitEvents-Cache"] = "HIT"
+        # The cached body is stored decoded
+        response.headers.pop("Content-Encoding", None)
+        response.headers["Content-Length"] = str(len(entry["body"]))
+        response._content = entry["body"]
+        response.url = not_modified.url
+        response.request = not_modified.request
+        response.connection = not_modified.connection
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+
+def mount_conditional_cache(client: "Github", cache: ConditionalRequestCache) -> bool:
+    """
+    Swap the caching adapter into a Github client's persistent connection.
+    Returns False, leaving the client uncached, if this PyGithub doesn't
+    have the internals it relies on.
+
+    PyGithub keeps one connection (a requests Session and its pool) per
+    client and reuses it for every call, so the adapter is mounted on that
+    session rather than injected through Requester.injectConnectionClasses,
+    which turns connection reuse off and opens a new session per request.
+    PyGithub has no public hook for the session: this uses the private
+    Requester.__createConnection, checked against the versions allowed in
+    requirements.txt.
+    """
+    requester = getattr(client, "requester", None)
+    # Created on first use and kept for the client's lifetime; create it now
+    create_connection = getattr(requester, "_Requester__createConnection", None)
+    connection = create_connection() if create_connection else None
+    if not all(hasattr(connection, name) for name in ("session", "adapter", "retry", "pool_size")):
+        logger.warning("This PyGithub version has no usable connection to add the HTTP cache to; "
+                       "GitHub requests will not be cached")
+        return False
+    if isinstance(connection.adapter, ConditionalCacheAdapter):
+        return True
+    adapter = ConditionalCacheAdapter(
+        cache,
+        max_retries=connection.retry,
+        pool_connections=connection.pool_size,
+        pool_maxsize=connection.pool_size,
+    )
+    connection.session.mount(f"{urllib.parse.urlparse(requester.base_url).scheme}://", adapter)
+    connection.adapter.close()
+    connection.adapter = adapter
+    return True
+
+
+_installed_cache = None
+_install_lock = threading.Lock()
+
+def enable_conditional_requests(client: "Github", store_dir: Optional[str] = None,
+                                max_entries: int = 2048) -> ConditionalRequestCache:
+    """
+    Route a Github client's requests through the shared conditional-request
+    cache, creating the cache on first use. Safe to call more than once.
+    """
+    global _installed_cache
+    with _install_lock:
+        if _installed_cache is None:
+            _installed_cache = ConditionalRequestCache(max_entries=max_entries, store_dir=store_dir)
+            logger.info(f"GitHub conditional request cache enabled (store: {store_dir or 'memory only'})")
+    mount_conditional_cache(client, _installed_cache)
+    return _installed_cache
+
+def get_conditional_request_cache() -> Optional[ConditionalRequestCache]:
+    """Get the installed cache, if any"""
+    return _installed_cache
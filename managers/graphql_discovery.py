@@ -0,0 +1,265 @@
+import os
+import time
+import math
+import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GRAPHQL_URL = "https://api.github.com/graphql"
+
+REFS_CONNECTION = (
+    'refs(refPrefix: "refs/heads/", first: {page_size}, after: ${cursor}) '
+    '{{ pageInfo {{ hasNextPage endCursor }} nodes {{ name target {{ oid }} }} }}'
+)
+PULLS_CONNECTION = (
+    'pullRequests(states: OPEN, first: {page_size}, after: ${cursor}) '
+    '{{ pageInfo {{ hasNextPage endCursor }} nodes {{ headRefName headRepositoryOwner {{ login }} }} }}'
+)
+VIEWER_REPOS_QUERY = (
+    'query($after: String) { rateLimit { cost remaining resetAt } '
+    'viewer { repositories(first: 100, after: $after, '
+    'affiliations: [OWNER, COLLABORATOR, ORGANIZATION_MEMBER]) '
+    '{ pageInfo { hasNextPage endCursor } nodes { nameWithOwner } } } }'
+)
+
+class GraphQLError(Exception):
+    """Raised when a GraphQL query fails as a whole"""
+
+
+class GraphQLBranchDiscovery:
+    """
+    Discovers branches (with head SHAs) and open PR head branches for many
+    repositories per GitHub GraphQL query, instead of one `get_branches`
+    call per repository plus one `get_pulls` call per new branch.
+
+    Repositories are packed into aliased `repository(...)` fields until the
+    estimated query cost reaches `max_cost`. Connections with more pages are
+    re-queried with their cursors in later batches, so a repository with many
+    branches doesn't hold up the rest. The `rateLimit` field of each response
+    is checked and discovery pauses until the reset once the remaining budget
+    drops below `min_remaining`.
+    """
+
+    def __init__(self, token: str, url: Optional[str] = None, page_size: int = 100,
+                 max_cost: int = 1, max_repos_per_query: int = 25, min_remaining: int = 100,
+                 max_retries: int = 3, timeout: float = 30.0, sleep: Callable[[float], Any] = time.sleep):
+        """Initialize the discovery client"""
+        self.url = url or os.getenv("GITHUB_GRAPHQL_URL", DEFAULT_GRAPHQL_URL)
+        self.page_size = page_size
+        self.max_cost = max_cost
+        self.max_repos_per_query = max_repos_per_query
+        self.min_remaining = min_remaining
+        self.max_retries = max_retries
+        self.sleep = sleep
+        self.last_rate_limit: Dict[str, Any] = {}
+        self.queries = 0
+        self.client = httpx.Client(
+            timeout=timeout,
+            headers={
+                "Authorization": f"bearer {token}",
+                "Accept": "application/vnd.github+json",
+                "User-Agent": "GitEvents",
+            },
+        )
+
+    def close(self) -> None:
+        """Close the underlying HTTP connection pool"""
+        self.client.close()
+
+    def list_repositories(self) -> List[str]:
+        """Get the full names of all repositories the token can access"""
+        names = []
+        after = None
+        while True:
+            data = self._execute(VIEWER_REPOS_QUERY, {"after": after})
+            repositories = data["viewer"]["repositories"]
+            names.extend(node["nameWithOwner"] for node in repositories["nodes"] if node)
+            if not repositories["pageInfo"]["hasNextPage"]:
+                return names
+            after = repositories["pageInfo"]["endCursor"]
+
+    def discover(self, repo_names: Iterable[str]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Exception]]:
+        """
+        Fetch branches and open PR heads for the given repositories. Open PR
+        heads only include PRs from the repository's own branches, not forks.
+        Returns ({repo: {"branches": {name: sha}, "open_pr_heads": set()}}, {repo: exception}).
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        errors: Dict[str, Exception] = {}
+        # repo -> {"refs": cursor, "pulls": cursor} for the connections still to fetch
+        pending: Dict[str, Dict[str, Optional[str]]] = {}
+
+        for repo_name in repo_names:
+            if "/" not in repo_name:
+                errors[repo_name] = ValueError(f"Not a full repository name: {repo_name}")
+                continue
+            results[repo_name] = {"branches": {}, "open_pr_heads": set()}
+            pending[repo_name] = {"refs": None, "pulls": None}
+
+        while pending:
+            batch = self._next_batch(pending)
+            query, variables, aliases = self._build_query(batch, pending)
+            try:
+                data, alias_errors = self._execute(query, variables, partial=True)
+            except Exception as e:
+                for repo_name in batch:
+                    errors[repo_name] = e
+                    results.pop(repo_name, None)
+                    pending.pop(repo_name, None)
+                continue
+
+            for alias, repo_name in aliases.items():
+                repository = data.get(alias)
+                if repository is None:
+                    errors[repo_name] = GraphQLError(alias_errors.get(alias, "Repository not found"))
+                    results.pop(repo_name, None)
+                    pending.pop(repo_name, None)
+                    continue
+                self._collect(repo_name, repository, results[repo_name], pending[repo_name])
+                if not pending[repo_name]:
+                    del pending[repo_name]
+
+        return results, errors
+
+    def _next_batch(self, pending: Dict[str, Dict[str, Optional[str]]]) -> List[str]:
+        """Take repositories in order until the estimated cost would exceed the budget"""
+        batch = []
+        connections = 0
+        for repo_name, remaining in pending.items():
+            if batch and (len(batch) >= self.max_repos_per_query
+                          or self._estimate_cost(connections + len(remaining)) > self.max_cost):
+                break
+            batch.append(repo_name)
+            connections += len(remaining)
+        return batch
+
+    @staticmethod
+    def _estimate_cost(connections: int) -> int:
+        """GitHub charges one point per 100 top-level connection requests, minimum 1"""
+        return max(1, math.ceil(connections / 100))
+
+    def _build_query(self, batch: List[str], pending: Dict[str, Dict[str, Optional[str]]]
+                     ) -> Tuple[str, Dict[str, Any], Dict[str, str]]:
+        """Build one aliased query for a batch. Returns (query, variables, {alias: repo})."""
+        declarations = []
+        fields = []
+        variables: Dict[str, Any] = {}
+        aliases = {}
+
+        for i, repo_name in enumerate(batch):
+            alias = f"r{i}"
+            aliases[alias] = repo_name
+            owner, name = repo_name.split("/", 1)
+            variables[f"o{i}"] = owner
+            variables[f"n{i}"] = name
+            declarations += [f"$o{i}: String!", f"$n{i}: String!"]
+
+            connections = []
+            if "refs" in pending[repo_name]:
+                variables[f"rc{i}"] = pending[repo_name]["refs"]
+                declarations.append(f"$rc{i}: String")
+                connections.append(REFS_CONNECTION.format(page_size=self.page_size, cursor=f"rc{i}"))
+            if "pulls" in pending[repo_name]:
+                variables[f"pc{i}"] = pending[repo_name]["pulls"]
+                declarations.append(f"$pc{i}: String")
+                connections.append(PULLS_CONNECTION.format(page_size=self.page_size, cursor=f"pc{i}"))
+
+            fields.append(f"  {alias}: repository(owner: $o{i}, name: $n{i}) {{ nameWithOwner {' '.join(connections)} }}")
+
+        query = (
+            f"query({', '.join(declarations)}) {{\n"
+            "  rateLimit { cost remaining resetAt }\n"
+            + "\n".join(fields)
+            + "\n}"
+        )
+        return query, variables, aliases
+
+    @staticmethod
+    def _collect(repo_name: str, repository: Dict[str, Any], result: Dict[str, Any],
+                 remaining: Dict[str, Optional[str]]) -> None:
+        """Merge one page of a repository's connections and advance its cursors"""
+        refs = repository.get("refs")
+        if refs is not None:
+            for node in refs["nodes"]:
+                if node:
+                    result["branches"][node["name"]] = (node.get("target") or {}).get("oid")
+            if refs["pageInfo"]["hasNextPage"]:
+                remaining["refs"] = refs["pageInfo"]["endCursor"]
+            else:
+                remaining.pop("refs", None)
+
+        pulls = repository.get("pullRequests")
+        if pulls is not None:
+            owner = repo_name.split("/", 1)[0].lower()
+            for node in pulls["nodes"]:
+                # A fork's PR from a same-named branch says nothing about our branch
+                head_owner = (node or {}).get("headRepositoryOwner") or {}
+                if node and (head_owner.get("login") or "").lower() == owner:
+                    result["open_pr_heads"].add(node["headRefName"])
+            if pulls["pageInfo"]["hasNextPage"]:
+                remaining["pulls"] = pulls["pageInfo"]["endCursor"]
+            else:
+                remaining.pop("pulls", None)
+
+    def _execute(self, query: str, variables: Dict[str, Any], partial: bool = False):
+        """
+        Run a query, retrying on rate limits.
+        With `partial`, returns (data, {alias: error message}) instead of
+        failing on errors that only affect individual aliased fields.
+        """
+        for attempt in range(self.max_retries + 1):
+            response = self.client.post(self.url, json={"query": query, "variables": variables})
+            self.queries += 1
+
+            if response.status_code in (403, 429) and attempt < self.max_retries:
+                retry_after = response.headers.get("Retry-After")
+                if retry_after or "rate limit" in response.text.lower():
+                    pause = float(retry_after or 60)
+                    logger.warning(f"GitHub GraphQL rate limited, retrying in {pause:.0f}s")
+                    self.sleep(pause)
+                    continue
+            response.raise_for_status()
+
+            payload = response.json()
+            data = payload.get("data") or {}
+            errors = payload.get("errors") or []
+
+            if any(error.get("type") == "RATE_LIMITED" for error in errors) and attempt < self.max_retries:
+                self._wait_for_reset(data.get("rateLimit") or self.last_rate_limit)
+                continue
+
+            if data.get("rateLimit"):
+                self.last_rate_limit = data["rateLimit"]
+                self._check_rate_limit(data["rateLimit"])
+
+            alias_errors = {}
+            for error in errors:
+                path = error.get("path") or []
+                if path and path[0] in data:
+                    alias_errors[path[0]] = error.get("message", "Unknown error")
+            global_errors = [error for error in errors if not error.get("path")]
+            if global_errors or (errors and not partial):
+                raise GraphQLError("; ".join(error.get("message", "Unknown error") for error in errors))
+
+            return (data, alias_errors) if partial else data
+
+        raise GraphQLError("GitHub GraphQL rate limit retries exhausted")
+
+    def _check_rate_limit(self, rate_limit: Dict[str, Any]) -> None:
+        """Pause until the reset once the remaining point budget drops below the floor"""
+        remaining = rate_limit.get("remaining")
+        if remaining is not None and remaining < self.min_remaining:
+            logger.warning(f"GitHub GraphQL budget low ({remaining} points left), pausing until reset")
+            self._wait_for_reset(rate_limit)
+
+    def _wait_for_reset(self, rate_limit: Dict[str, Any]) -> None:
+        reset_at = rate_limit.get("resetAt")
+        pause = 60.0
+        if reset_at:
+            reset = datetime.fromisoformat(reset_at.replace("Z", "+00:00"))
+            pause = max(1.0, (reset - datetime.now(timezone.utc)).total_seconds() + 1)
+        self.sleep(pause)
@@ -0,0 +1,122 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Shutdown stages, in the order they run
+STOP_ACCEPTING = "stop_accepting"  # Servers stop taking requests and finish the ones in flight
+DRAIN = "drain"                    # Queued background work is finished or dropped
+FLUSH = "flush"                    # Buffered writes (notification digests, sinks) are sent
+CLOSE = "close"                    # Connection pools and tunnels are closed
+STAGES = [STOP_ACCEPTING, DRAIN, FLUSH, CLOSE]
+
+# Called with the seconds left before the shutdown deadline; may return counts
+# such as {"drained": 3, "dropped": 0}
+ShutdownHook = Callable[[float], Optional[Dict[str, Any]]]
+
+class LifecycleManager:
+    """
+    Coordinates an orderly shutdown of the process.
+
+    Components register named hooks for a stage. `shutdown()` runs the stages
+    in order, and within a stage the hooks in reverse order of registration,
+    all against one overall deadline. "drained" and "dropped" counts returned
+    by hooks are added up in the shutdown report.
+
+    Only the first call runs the hooks; later calls (e.g. from an app's
+    lifespan while the process is already stopping) return immediately.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hooks: Dict[str, Tuple[str, ShutdownHook]] = {}
+        self._state = "running"
+        self._stopped = threading.Event()
+        self.report: Optional[Dict[str, Any]] = None
+
+    @property
+    def accepting(self) -> bool:
+        """False once shutdown has started"""
+        return self._state == "running"
+
+    def register(self, name: str, hook: ShutdownHook, stage: str = CLOSE) -> None:
+        """Run `hook(seconds_left)` during `stage`. Registering a name again replaces its hook."""
+        if stage not in STAGES:
+            raise ValueError(f"Unknown shutdown stage: {stage}")
+        with self._lock:
+            self._hooks.pop(name, None)
+            self._hooks[name] = (stage, hook)
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            self._hooks.pop(name, None)
+
+    def shutdown(self, timeout: Optional[float] = None, reason: str = "shutdown") -> Optional[Dict[str, Any]]:
+        """
+        Run every shutdown hook once, within `timeout` seconds overall
+        (GRACEFUL_SHUTDOWN_TIMEOUT, 30 by default). Returns the report, or
+        None if another caller is still running the shutdown.
+        """
+        with self._lock:
+            if self._state != "running":
+                return self.report
+            self._state = "stopping"
+            hooks: List[Tuple[str, Tuple[str, ShutdownHook]]] = list(self._hooks.items())
+
+        if timeout is None:
+            timeout = float(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", 30))
+        started = time.monotonic()
+        deadline = started + timeout
+        logger.info(f"Shutting down ({reason}), {timeout:.0f}s to finish in-flight work")
+
+        report: Dict[str, Any] = {"reason": reason, "drained": 0, "dropped": 0, "errors": 0, "hooks": {}}
+        for stage in STAGES:
+            for name, (hook_stage, hook) in reversed(hooks):
+                if hook_stage != stage:
+                    continue
+                hook_started = time.monotonic()
+                try:
+                    counts = hook(max(0.0, deadline - hook_started)) or {}
+                except Exception as e:
+                    logger.error(f"Shutdown hook {name} failed: {e}")
+                    counts = {"error": str(e)}
+                    report["errors"] += 1
+                report["hooks"][name] = {"stage": stage, "seconds": round(time.monotonic() - hook_started, 3), **counts}
+                report["drained"] += counts.get("drained", 0)
+                report["dropped"] += counts.get("dropped", 0)
+        report["seconds"] = round(time.monotonic() - started, 3)
+
+        details = ", ".join(
+            f"{name}: {counts.get('drained', 0)} drained/{counts.get('dropped', 0)} dropped"
+            for name, counts in report["hooks"].items() if "drained" in counts or "dropped" in counts
+        )
+        log = logger.warning if report["dropped"] or report["errors"] else logger.info
+        log(f"Shutdown complete in {report['seconds']:.1f}s: {report['drained']} drained, "
+            f"{report['dropped']} dropped" + (f" ({details})" if details else ""))
+
+        self.report = report
+        self._state = "stopped"
+        self._stopped.set()
+        return report
+
+    def wait_stopped(self, timeout: Optional[float] = None) -> bool:
+        """Block until a shutdown has completed. Returns False on timeout."""
+        return self._stopped.wait(timeout)
+
+# Shared by everything in the process
+lifecycle = LifecycleManager()
+
+@asynccontextmanager
+async def shutdown_on_exit(app):
+    """
+    FastAPI lifespan that runs the process shutdown when the server stops.
+    Needed where the server owns the process (uvicorn workers); where main.py
+    already runs the shutdown this is a no-op.
+    """
+    yield
+    await asyncio.get_running_loop().run_in_executor(None, lifecycle.shutdown, None, "server stopped")
@@ -1,18 +1,135 @@
 import logging
 import os
+import time
+import queue
+import shutil
 import subprocess
 import platform
+import threading
 import webbrowser
-from typing import Dict, Any, Optional
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+
+from managers.notification_sinks import NotificationSink, create_sink, notification_record
 
 logger = logging.getLogger(__name__)
 
+class _ToastBackend:
+    """Windows toasts through one long-lived win10toast notifier"""
+
+    def __init__(self):
+        from win10toast import ToastNotifier
+        self.toaster = ToastNotifier()
+
+    def send(self, title: str, message: str, url: Optional[str] = None) -> bool:
+        # Not threaded: the dispatcher already runs off the caller's thread, and a
+        # threaded toast is silently skipped while another one is still showing
+        callback = (lambda: webbrowser.open(url)) if url else None
+        self.toaster.show_toast(
+            title,
+            message,
+            icon_path=None,
+            duration=5,
+            threaded=False,
+            callback_on_click=callback
+        )
+        return True
+
+
+class _CommandBackend:
+    """Notifications through a command-line tool resolved once at startup"""
+
+    def __init__(self, executable: str, timeout: float = 10.0):
+        self.executable = executable
+        self.timeout = timeout
+
+    def arguments(self, title: str, message: str) -> List[str]:
+        raise NotImplementedError
+
+    def send(self, title: str, message: str, url: Optional[str] = None) -> bool:
+        subprocess.run([self.executable, *self.arguments(title, message)],
+                       check=True, capture_output=True, timeout=self.timeout)
+        return True
+
+
+class _NotifySendBackend(_CommandBackend):
+    """Linux libnotify notifications"""
+
+    def arguments(self, title: str, message: str) -> List[str]:
+        return [title, message]
+
+
+class _OsascriptBackend(_CommandBackend):
+    """macOS notifications through AppleScript"""
+
+    @staticmethod
+    def _quote(text: str) -> str:
+        return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+    def arguments(self, title: str, message: str) -> List[str]:
+        return ["-e", f"display notification {self._quote(message)} with title {self._quote(title)}"]
+
+
+def _create_backend():
+    """The notification backend for this system, or None if notifications aren't supported"""
+    system = platform.system()
+    if system == "Windows":
+        try:
+            return _ToastBackend()
+        except ImportError:
+            logger.warning("win10toast not installed. Windows notifications disabled.")
+            return None
+    elif system == "Darwin":  # macOS
+        executable = shutil.which("osascript")
+        return _OsascriptBackend(executable) if executable else None
+    elif system == "Linux":
+        # Look up libnotify's CLI on PATH instead of running it
+        executable = shutil.which("notify-send")
+        if executable:
+            return _NotifySendBackend(executable)
+        logger.warning("notify-send not found. Linux notifications disabled.")
+    return None
+
+
+class _PendingDigest:
+    """Notifications for one (repository, event type) waiting to be sent together"""
+
+    def __init__(self, repo_name: Optional[str], event_type: str):
+        self.repo_name = repo_name
+        self.event_type = event_type
+        self.items: List[Tuple[str, str, Optional[str]]] = []  # (title, message, url)
+        self.timer: Optional[threading.Timer] = None
+
+
 class NotificationManager:
-    """Handles system notifications for GitHub events"""
+    """
+    Handles system notifications for GitHub events.
+
+    With a coalescing window, notifications are held per (repository, event
+    type) for `window` seconds and a burst is sent as one digest. Each
+    repository may also be limited to `max_per_repo` notifications per
+    `rate_period` seconds; a digest over that budget is held back (and keeps
+    collecting) until the repository may notify again, so nothing is dropped.
+
+    Delivery happens on a background dispatcher thread fed by a bounded queue,
+    so callers never wait on the desktop; when the queue is full new
+    notifications are dropped (and counted) rather than blocking. Besides the
+    desktop, every notification goes to the configured sinks (see
+    `managers.notification_sinks`).
+    """
     
-    def __init__(self):
+    def __init__(self, coalescing: Optional[Dict[str, Any]] = None, queue_size: int = 100,
+                 sinks: Optional[List[Dict[str, Any]]] = None):
         """Initialize notification manager"""
-        self.enabled = self._check_notification_support()
+        self._backend = _create_backend()
+        self.enabled = self._backend is not None
+        self.sinks: List[NotificationSink] = []
+        for sink_config in sinks or []:
+            if sink_config.get("enabled", True):
+                try:
+                    self.add_sink(create_sink(sink_config))
+                except Exception as e:
+                    logger.error(f"Error creating notification sink {sink_config.get('type', 'webhook')}: {e}")
         self.notification_settings = {
             "pull_request:opened": True,
             "pull_request:closed": True,
@@ -21,125 +138,197 @@ class NotificationManager:
             "branch:deleted": False,
             "push": False
         }
-    
-    def _check_notification_support(self) -> bool:
-        """Check if notifications are supported on this system"""
-        system = platform.system()
-        if system == "Windows":
-            try:
-                # Import Windows-specific libraries
-                import win10toast
-                return True
-            except ImportError:
-                logger.warning("win10toast not installed. Windows notifications disabled.")
-                return False
-        elif system == "Darwin":  # macOS
-            return True
-        elif system == "Linux":
-            # Check for libnotify
-            try:
-                subprocess.run(["notify-send", "--version"], check=True, capture_output=True)
-                return True
-            except (subprocess.CalledProcessError, FileNotFoundError):
-                logger.warning("notify-send not found. Linux notifications disabled.")
-                return False
-        return False
+        self.coalescing = {
+            "window": 0,           # Seconds to collect a burst; 0 sends every notification immediately
+            "max_per_repo": 0,     # Notifications per repository per rate_period; 0 for no limit
+            "rate_period": 60,
+            "digest_lines": 5      # Items listed in a digest before "... and N more"
+        }
+        if coalescing:
+            self.update_coalescing(coalescing)
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[Optional[str], str], _PendingDigest] = {}
+        self._sent: Dict[Optional[str], deque] = {}  # Send times per repository, for the rate limit
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=queue_size)
+        self._dispatcher: Optional[threading.Thread] = None
+        self.dropped = 0
     
     def update_settings(self, settings: Dict[str, bool]) -> None:
         """Update notification settings"""
         for key, value in settings.items():
             if key in self.notification_settings:
                 self.notification_settings[key] = value
+
+    def add_sink(self, sink: NotificationSink) -> None:
+        """Also deliver notifications to a sink"""
+        self.sinks.append(sink)
+
+    def update_coalescing(self, settings: Dict[str, Any]) -> None:
+        """Update the coalescing window and per-repository rate limit"""
+        for key, value in settings.items():
+            if key in self.coalescing:
+                self.coalescing[key] = value
     
     def send_notification(self, title: str, message: str, event_type: str, 
                          url: Optional[str] = None, repo_name: Optional[str] = None) -> bool:
-        """Send system notification based on event type"""
-        if not self.enabled:
+        """
+        Send system notification based on event type.
+        With coalescing enabled the notification is queued for a digest and
+        True means it was accepted.
+        """
+        if not self.enabled and not self.sinks:
             return False
             
         # Check if notifications for this event type are enabled
         if event_type in self.notification_settings and not self.notification_settings[event_type]:
             return False
-            
-        system = platform.system()
-        success = False
-        
-        try:
-            if system == "Windows":
-                success = self._send_windows_notification(title, message, url)
-            elif system == "Darwin":  # macOS
-                success = self._send_mac_notification(title, message, url)
-            elif system == "Linux":
-                success = self._send_linux_notification(title, message, url)
-            
-            if success:
-                logger.info(f"Notification sent: {title}")
-            return success
-        except Exception as e:
-            logger.error(f"Error sending notification: {e}")
-            return False
-    
-    def _send_windows_notification(self, title: str, message: str, url: Optional[str] = None) -> bool:
-        """Send Windows toast notification"""
-        try:
-            from win10toast import ToastNotifier
-            
-            toaster = ToastNotifier()
-            
-            # If URL provided, set up callback to open browser
-            if url:
-                # Define a callback function that will be executed on click
-                def open_url():
-                    webbrowser.open(url)
-                
-                # Show notification with callback
-                toaster.show_toast(
-                    title,
-                    message,
-                    icon_path=None,
-                    duration=5,
-                    threaded=True,
-                    callback_on_click=open_url
-                )
-            else:
-                # Show notification without callback
-                toaster.show_toast(
-                    title,
-                    message,
-                    icon_path=None,
-                    duration=5,
-                    threaded=True
-                )
-            
-            return True
-        except Exception as e:
-            logger.error(f"Error sending Windows notification: {e}")
-            return False
-    
-    def _send_mac_notification(self, title: str, message: str, url: Optional[str] = None) -> bool:
-        """Send macOS notification"""
-        try:
-            # For macOS, use osascript
-            script = f'display notification "{message}" with title "{title}"'
-            subprocess.run(["osascript", "-e", script], check=True)
-            return True
-        except Exception as e:
-            logger.error(f"Error sending macOS notification: {e}")
-            return False
-    
-    def _send_linux_notification(self, title: str, message: str, url: Optional[str] = None) -> bool:
-        """Send Linux notification"""
+
+        if self.coalescing["window"] <= 0 and self.coalescing["max_per_repo"] <= 0:
+            return self._deliver(title, message, url, event_type, repo_name)
+
+        with self._lock:
+            key = (repo_name, event_type)
+            digest = self._pending.get(key)
+            if digest is None:
+                digest = self._pending[key] = _PendingDigest(repo_name, event_type)
+                self._schedule(digest, self.coalescing["window"])
+            digest.items.append((title, message, url))
+        return True
+
+    def flush(self) -> int:
+        """Send every pending digest now, ignoring the rate limit. Returns the number sent."""
+        with self._lock:
+            digests = list(self._pending.values())
+            self._pending.clear()
+            for digest in digests:
+                if digest.timer:
+                    digest.timer.cancel()
+                self._record_send(digest.repo_name, time.monotonic())
+        for digest in digests:
+            self._deliver(*self._render_digest(digest), digest.event_type, digest.repo_name)
+        return len(digests)
+
+    def _schedule(self, digest: _PendingDigest, delay: float) -> None:
+        """Flush a digest after `delay` seconds (caller holds the lock)"""
+        digest.timer = threading.Timer(max(0.0, delay), self._flush_digest, args=(digest,))
+        digest.timer.daemon = True
+        digest.timer.start()
+
+    def _flush_digest(self, digest: _PendingDigest) -> None:
+        """Timer callback: send a digest, or hold it back while its repository is over the rate limit"""
+        key = (digest.repo_name, digest.event_type)
+        with self._lock:
+            if self._pending.get(key) is not digest:
+                return  # Already flushed
+            now = time.monotonic()
+            wait = self._rate_limit_wait(digest.repo_name, now)
+            if wait > 0:
+                logger.debug(f"Holding {len(digest.items)} {digest.event_type} notification(s) "
+                             f"for {digest.repo_name} for {wait:.0f}s (rate limit)")
+                self._schedule(digest, wait)
+                return
+            del self._pending[key]
+            self._record_send(digest.repo_name, now)
+        self._deliver(*self._render_digest(digest), digest.event_type, digest.repo_name)
+
+    def _rate_limit_wait(self, repo_name: Optional[str], now: float) -> float:
+        """Seconds until the repository may send another notification (caller holds the lock)"""
+        limit = self.coalescing["max_per_repo"]
+        sent = self._sent.get(repo_name)
+        if limit <= 0 or not sent:
+            return 0.0
+        period = self.coalescing["rate_period"]
+        while sent and sent[0] <= now - period:
+            sent.popleft()
+        if len(sent) < limit:
+            return 0.0
+        return sent[0] + period - now
+
+    def _record_send(self, repo_name: Optional[str], now: float) -> None:
+        if self.coalescing["max_per_repo"] > 0:
+            self._sent.setdefault(repo_name, deque()).append(now)
+
+    def _render_digest(self, digest: _PendingDigest) -> Tuple[str, str, Optional[str]]:
+        """A single notification stays as it is; a burst becomes one summary"""
+        if len(digest.items) == 1:
+            return digest.items[0]
+
+        count = len(digest.items)
+        shown = max(1, int(self.coalescing["digest_lines"]))
+        subject = digest.repo_name or "GitHub"
+        title = f"{subject}: {count} {digest.event_type} events"
+        lines = [item_title for item_title, _, _ in digest.items[:shown]]
+        if count > shown:
+            lines.append(f"... and {count - shown} more")
+        # Digest clicks go to the repository rather than one of the items
+        url = f"https://github.com/{digest.repo_name}" if digest.repo_name else digest.items[-1][2]
+        return title, "\n".join(lines), url
+
+    def _deliver(self, title: str, message: str, url: Optional[str] = None,
+                 event_type: Optional[str] = None, repo_name: Optional[str] = None) -> bool:
+        """Queue one notification for the dispatcher thread. False if the queue is full."""
+        self._ensure_dispatcher()
         try:
-            subprocess.run(["notify-send", title, message], check=True)
+            self._queue.put_nowait(notification_record(title, message, event_type, repo_name, url))
             return True
-        except Exception as e:
-            logger.error(f"Error sending Linux notification: {e}")
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Notification queue full, dropping notification: {title}")
             return False
+
+    def _ensure_dispatcher(self) -> None:
+        if self._dispatcher is not None and self._dispatcher.is_alive():
+            return
+        with self._lock:
+            if self._dispatcher is None or not self._dispatcher.is_alive():
+                self._dispatcher = threading.Thread(target=self._dispatch_loop, name="notification-dispatcher",
+                                                    daemon=True)
+                self._dispatcher.start()
+
+    def _dispatch_loop(self) -> None:
+        """Show queued notifications one at a time on this platform's backend and hand them to the sinks"""
+        while True:
+            notification = self._queue.get()
+            if notification is None:
+                return
+            title = notification["title"]
+            if self._backend is not None:
+                try:
+                    if self._backend.send(title, notification["message"], notification["url"]):
+                        logger.info(f"Notification sent: {title}")
+                except Exception as e:
+                    logger.error(f"Error sending notification: {e}")
+            for sink in self.sinks:
+                try:
+                    sink.send(notification)
+                except Exception as e:
+                    logger.error(f"Error passing notification to sink {sink.name}: {e}")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Send pending digests, let the dispatcher finish the queue, then close the sinks"""
+        self.flush()
+        if self._dispatcher is not None and self._dispatcher.is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+                self._dispatcher.join(timeout=timeout)
+            except queue.Full:
+                logger.warning("Notification queue still full on shutdown")
+        self._dispatcher = None
+        for sink in self.sinks:
+            try:
+                sink.close(timeout)
+            except Exception as e:
+                logger.error(f"Error closing notification sink {sink.name}: {e}")
     
     def get_status(self) -> Dict[str, Any]:
         """Get notification manager status"""
         return {
             "enabled": self.enabled,
             "platform": platform.system(),
-            "settings": self.notification_settings
-        }
\ No newline at end of file
+            "settings": self.notification_settings,
+            "coalescing": self.coalescing,
+            "pending_digests": len(self._pending),
+            "queued": self._queue.qsize(),
+            "dropped": self.dropped,
+            "sinks": [sink.get_status() for sink in self.sinks]
+        }
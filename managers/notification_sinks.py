@@ -0,0 +1,303 @@
+import os
+import json
+import time
+import uuid
+import queue
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class NotificationSink:
+    """
+    Somewhere NotificationManager delivers notifications besides the desktop.
+
+    `send` is called on the notification dispatcher thread and should return
+    quickly; sinks that talk to the network queue the notification and deliver
+    it on their own thread.
+    """
+
+    name = "sink"
+
+    def send(self, notification: Dict[str, Any]) -> bool:
+        """Accept one notification ({title, message, event_type, repo_name, url, timestamp})"""
+        raise NotImplementedError
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Deliver what can still be delivered and release resources"""
+
+    def get_status(self) -> Dict[str, Any]:
+        return {"name": self.name, "type": type(self).__name__}
+
+
+class WebhookSink(NotificationSink):
+    """
+    Delivers notifications as JSON POSTs to an HTTP endpoint.
+
+    - One keep-alive `httpx.Client` is reused for every request.
+    - Notifications are sent in batches of up to `batch_size`, waiting at
+      most `flush_interval` seconds for a batch to fill.
+    - Connection errors, 429 and 5xx responses are retried up to `max_retries`
+      times with full-jitter exponential backoff.
+    - A batch that still fails is written to `spool_dir`; spooled batches are
+      resent, oldest first, after the next successful delivery and every
+      `spool_retry_interval` seconds while nothing else is sent. With no
+      `spool_dir` such batches are dropped.
+    """
+
+    def __init__(self, url: str, name: Optional[str] = None, headers: Optional[Dict[str, str]] = None,
+                 batch_size: int = 50, flush_interval: float = 2.0, queue_size: int = 10000,
+                 max_retries: int = 4, backoff: float = 0.5, max_backoff: float = 30.0,
+                 timeout: float = 10.0, spool_dir: Optional[str] = None,
+                 spool_retry_interval: float = 60.0):
+        """Initialize the sink and start its sender thread"""
+        self.url = url
+        self.name = name or url
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.spool_dir = spool_dir
+        self.spool_retry_interval = spool_retry_interval
+        # httpx is only needed once a sink is configured
+        import httpx
+        self._http_error = httpx.HTTPError
+        self.client = httpx.Client(
+            timeout=timeout,
+            headers={"User-Agent": "GitEvents", **(headers or {})},
+            limits=httpx.Limits(max_connections=2, max_keepalive_connections=2),
+        )
+        self.stats = {"sent": 0, "batches": 0, "retries": 0, "dropped": 0, "spooled": 0, "replayed": 0}
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=queue_size)
+        self._stopping = threading.Event()
+        if self.spool_dir:
+            os.makedirs(self.spool_dir, exist_ok=True)
+        # When to next try resending the spool; None while it is empty. Batches
+        # left by an earlier run are retried right away.
+        self._next_replay = time.monotonic() if self._spool_files() else None
+        self._thread = threading.Thread(target=self._run, name=f"notification-sink-{self.name}", daemon=True)
+        self._thread.start()
+
+    def send(self, notification: Dict[str, Any]) -> bool:
+        try:
+            self._queue.put_nowait(notification)
+            return True
+        except queue.Full:
+            self.stats["dropped"] += 1
+            logger.warning(f"Notification sink {self.name} queue full, dropping: {notification.get('title')}")
+            return False
+
+    def close(self, timeout: float = 5.0) -> None:
+        """
+        Send what is queued and close the connection pool. After `timeout`
+        seconds retries stop and whatever is left is spooled.
+        """
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=max(0.0, deadline - time.monotonic()))
+        if self._thread.is_alive():
+            self._stopping.set()
+            self._thread.join(timeout=timeout)
+        if not self._thread.is_alive():
+            self.client.close()
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            **super().get_status(),
+            "url": self.url,
+            "queued": self._queue.qsize(),
+            "spooled_batches": len(self._spool_files()),
+            **self.stats,
+        }
+
+    def payload(self, batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """JSON body for one batch"""
+        return {"source": "gitevents", "count": len(batch), "notifications": batch}
+
+    def _run(self) -> None:
+        """Sender thread: collect batches and deliver them"""
+        while True:
+            batch, closing = self._next_batch()
+            if batch:
+                try:
+                    if self._deliver(batch):
+                        self._replay_spool()
+                    else:
+                        self._spool(batch)
+                except Exception as e:
+                    logger.error(f"Error delivering notifications to {self.name}: {e}")
+                    self._spool(batch)
+            elif self._replay_due():
+                # Nothing new to send, so the spool is retried on its own schedule
+                try:
+                    self._replay_spool()
+                except Exception as e:
+                    logger.error(f"Error resending spooled notifications to {self.name}: {e}")
+                    self._next_replay = time.monotonic() + self.spool_retry_interval
+            if closing:
+                return
+
+    def _next_batch(self):
+        """Block for the first notification, then take more until the batch is full or the interval passes"""
+        batch: List[Dict[str, Any]] = []
+        # Wake up in time for a due spool retry
+        timeout = None if self._next_replay is None else max(0.0, self._next_replay - time.monotonic())
+        try:
+            item = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return batch, False
+        if item is None:
+            return batch, True
+        batch.append(item)
+        # Once stopping, drain without waiting for batches to fill
+        deadline = time.monotonic() + (0 if self._stopping.is_set() else self.flush_interval)
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _deliver(self, batch: List[Dict[str, Any]], retry: bool = True) -> bool:
+        """POST one batch, retrying transient failures (until the sink is stopping). Returns True on success."""
+        attempts = self.max_retries + 1 if retry else 1
+        for attempt in range(attempts):
+            if attempt:
+                if self._stopping.is_set():
+                    break
+                self.stats["retries"] += 1
+                # Full jitter keeps many senders from retrying in lockstep
+                time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1))))
+            try:
+                response = self.client.post(self.url, json=self.payload(batch))
+            except self._http_error as e:
+                logger.warning(f"Notification sink {self.name} request failed: {e}")
+                continue
+
+            if response.status_code < 300:
+                self.stats["sent"] += len(batch)
+                self.stats["batches"] += 1
+                return True
+            if response.status_code != 429 and response.status_code < 500:
+                # The endpoint rejected the payload itself; retrying won't help
+                logger.error(f"Notification sink {self.name} rejected a batch: HTTP {response.status_code}")
+                self.stats["dropped"] += len(batch)
+                return True
+            logger.warning(f"Notification sink {self.name} returned HTTP {response.status_code}")
+        return False
+
+    def _spool(self, batch: List[Dict[str, Any]]) -> None:
+        """Keep a batch that couldn't be delivered on disk for a later retry"""
+        if not self.spool_dir:
+            self.stats["dropped"] += len(batch)
+            logger.error(f"Notification sink {self.name} is unreachable, dropping {len(batch)} notification(s)")
+            return
+        # Time-ordered names so replay goes oldest first; write-then-rename so replay never sees half a file
+        file_name = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.json"
+        path = os.path.join(self.spool_dir, file_name)
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(batch, f)
+            os.replace(path + ".tmp", path)
+            self.stats["spooled"] += len(batch)
+            if self._next_replay is None:
+                self._next_replay = time.monotonic() + self.spool_retry_interval
+            logger.warning(f"Notification sink {self.name} is unreachable, spooled {len(batch)} notification(s)")
+        except OSError as e:
+            self.stats["dropped"] += len(batch)
+            logger.error(f"Error spooling notifications for {self.name}: {e}")
+
+    def _spool_files(self) -> List[str]:
+        if not self.spool_dir:
+            return []
+        try:
+            return sorted(name for name in os.listdir(self.spool_dir) if name.endswith(".json"))
+        except OSError:
+            return []
+
+    def _replay_due(self) -> bool:
+        return self._next_replay is not None and time.monotonic() >= self._next_replay and not self._stopping.is_set()
+
+    def _replay_spool(self) -> None:
+        """
+        Resend spooled batches after the endpoint is reachable again; stop at
+        the first failure and try again after `spool_retry_interval`.
+        """
+        for file_name in self._spool_files():
+            path = os.path.join(self.spool_dir, file_name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    batch = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Discarding unreadable spooled notifications {path}: {e}")
+                os.unlink(path)
+                continue
+            if not self._deliver(batch, retry=False):
+                self._next_replay = time.monotonic() + self.spool_retry_interval
+                return
+            os.unlink(path)
+            self.stats["replayed"] += len(batch)
+        self._next_replay = None
+
+
+class ChatSink(WebhookSink):
+    """
+    Posts to a chat incoming webhook (Slack, Mattermost and Rocket.Chat accept
+    the same `{"text": ...}` body). A batch becomes a single message.
+    """
+
+    def __init__(self, url: str, name: Optional[str] = None, max_lines: int = 20, **kwargs):
+        kwargs.setdefault("batch_size", 20)
+        kwargs.setdefault("flush_interval", 5.0)
+        self.max_lines = max_lines
+        super().__init__(url, name=name or "chat", **kwargs)
+
+    def payload(self, batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+        lines = []
+        for notification in batch[:self.max_lines]:
+            title = notification.get("title") or ""
+            url = notification.get("url")
+            lines.append(f"*<{url}|{title}>*" if url else f"*{title}*")
+            if notification.get("message"):
+                lines.append(notification["message"])
+        if len(batch) > self.max_lines:
+            lines.append(f"... and {len(batch) - self.max_lines} more")
+        return {"text": "\n".join(lines)}
+
+
+SINK_TYPES = {
+    "webhook": WebhookSink,
+    "chat": ChatSink,
+}
+
+def create_sink(config: Dict[str, Any]) -> NotificationSink:
+    """Build a sink from a config entry such as {"type": "webhook", "url": "...", "batch_size": 20}"""
+    options = dict(config)
+    sink_type = options.pop("type", "webhook")
+    options.pop("enabled", None)
+    if sink_type not in SINK_TYPES:
+        raise ValueError(f"Unknown notification sink type: {sink_type}")
+    return SINK_TYPES[sink_type](**options)
+
+def notification_record(title: str, message: str, event_type: Optional[str] = None,
+                        repo_name: Optional[str] = None, url: Optional[str] = None) -> Dict[str, Any]:
+    """The dict handed to sinks for one notification"""
+    return {
+        "title": title,
+        "message": message,
+        "event_type": event_type,
+        "repo_name": repo_name,
+        "url": url,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
@@ -0,0 +1,91 @@
+import heapq
+import random
+import time
+import logging
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class RepoPollScheduler:
+    """
+    Per-repository polling schedule kept in a priority queue of next-poll times.
+
+    - A repository's interval shrinks with its recent event rate, from
+      `max_interval` for idle repositories down to `min_interval`.
+    - A failed poll only delays that repository, with exponential backoff
+      from `error_backoff` up to `max_interval`.
+    - Intervals get +/-10% jitter so repositories added together drift apart.
+    """
+
+    def __init__(self, min_interval: float = 60, max_interval: float = 1800, error_backoff: float = 120,
+                 lookahead: float = 5.0):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.error_backoff = error_backoff
+        self.lookahead = lookahead  # Seconds early a repo may be polled to join a batch
+        self._heap = []  # (next_poll, repo_name)
+        self._next_poll: Dict[str, float] = {}
+        self._failures: Dict[str, int] = {}
+
+    def sync(self, repo_names: Iterable[str]) -> None:
+        """Schedule new repositories immediately and drop ones no longer monitored"""
+        repo_names = set(repo_names)
+        for repo_name in repo_names - set(self._next_poll):
+            self._schedule(repo_name, time.time())
+        for repo_name in set(self._next_poll) - repo_names:
+            # Heap entries are skipped lazily once the repo is forgotten
+            del self._next_poll[repo_name]
+            self._failures.pop(repo_name, None)
+
+    def pop_due(self, now: Optional[float] = None) -> List[str]:
+        """Take every repository due now (or within the lookahead) off the schedule"""
+        now = now or time.time()
+        horizon = now + min(self.lookahead, self.min_interval / 10)
+        due = []
+        while self._heap and self._heap[0][0] <= horizon:
+            next_poll, repo_name = heapq.heappop(self._heap)
+            if self._next_poll.get(repo_name) != next_poll:
+                continue  # Stale entry
+            del self._next_poll[repo_name]
+            due.append(repo_name)
+        return due
+
+    def record_success(self, repo_name: str, events_per_hour: float = 0.0) -> float:
+        """Reschedule after a successful poll. Returns the interval used."""
+        self._failures.pop(repo_name, None)
+        interval = self.interval_for_rate(events_per_hour)
+        self._schedule(repo_name, time.time() + self._jitter(interval))
+        return interval
+
+    def record_failure(self, repo_name: str) -> float:
+        """Reschedule after a failed poll with exponential backoff. Returns the delay."""
+        failures = self._failures.get(repo_name, 0) + 1
+        self._failures[repo_name] = failures
+        delay = min(self.max_interval, self.error_backoff * 2 ** (failures - 1))
+        self._schedule(repo_name, time.time() + self._jitter(delay))
+        logger.info(f"Backing off {repo_name} for {delay:.0f}s after {failures} failed poll(s)")
+        return delay
+
+    def interval_for_rate(self, events_per_hour: float) -> float:
+        """Idle repositories get `max_interval`; each event per hour shortens it"""
+        return max(self.min_interval, self.max_interval / (1.0 + max(0.0, events_per_hour)))
+
+    def seconds_until_next(self, now: Optional[float] = None) -> Optional[float]:
+        """Seconds until the earliest scheduled poll, or None if nothing is scheduled"""
+        while self._heap and self._next_poll.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)  # Drop stale entries
+        if not self._heap:
+            return None
+        now = now or time.time()
+        return max(0.0, self._heap[0][0] - now)
+
+    def __len__(self) -> int:
+        return len(self._next_poll)
+
+    def _schedule(self, repo_name: str, next_poll: float) -> None:
+        self._next_poll[repo_name] = next_poll
+        heapq.heappush(self._heap, (next_poll, repo_name))
+
+    @staticmethod
+    def _jitter(seconds: float) -> float:
+        return seconds * random.uniform(0.9, 1.1)
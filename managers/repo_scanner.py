@@ -0,0 +1,166 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from github import Github
+from github.GithubException import GithubException, RateLimitExceededException
+
+logger = logging.getLogger(__name__)
+
+class ScanStopped(Exception):
+    """Raised to requests still waiting for a slot once the scan's stop event is set"""
+
+
+class RateLimitGovernor:
+    """
+    Bounds the number of in-flight GitHub requests and backs off on rate limits.
+
+    - Concurrency shrinks as `X-RateLimit-Remaining` approaches `min_remaining`
+      and all workers pause until `X-RateLimit-Reset` once it is reached.
+    - A secondary rate limit pauses every worker for Retry-After (or 60s) and
+      halves the concurrency; it then grows back by one per `recovery_successes`.
+    - Once `stop_event` is set, waiting requests raise ScanStopped instead of
+      sitting out a pause that may last until the hourly reset.
+    """
+
+    def __init__(self, github_client: Github, max_in_flight: int = 8, min_remaining: int = 100,
+                 recovery_successes: int = 20, stop_event: Optional[threading.Event] = None):
+        self.github_client = github_client
+        self.stop_event = stop_event or threading.Event()
+        self.max_in_flight = max_in_flight
+        self.min_remaining = min_remaining
+        self.recovery_successes = recovery_successes
+        self.limit = max_in_flight
+        self.in_flight = 0
+        self._pause_until = 0.0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        """Wait for a request slot, honouring any rate-limit pause. Raises ScanStopped once stopped."""
+        with self._condition:
+            while True:
+                if self.stop_event.is_set():
+                    raise ScanStopped()
+                pause = self._pause_until - time.time()
+                if pause > 0:
+                    # In short steps, so a stop is noticed within a second
+                    self._condition.wait(min(pause, 1.0))
+                    continue
+                if self.in_flight < self._effective_limit():
+                    self.in_flight += 1
+                    return
+                self._condition.wait(1.0)
+
+    def release(self, success: bool = True) -> None:
+        """Return a request slot and re-check the primary rate limit"""
+        with self._condition:
+            self.in_flight -= 1
+            if success:
+                self._successes += 1
+                if self.limit < self.max_in_flight and self._successes >= self.recovery_successes:
+                    self.limit += 1
+                    self._successes = 0
+            self._check_primary_limit()
+            self._condition.notify_all()
+
+    def on_rate_limited(self, exc: GithubException) -> float:
+        """Pause all workers after a rate-limit response. Returns the pause in seconds."""
+        headers = {k.lower(): v for k, v in (exc.headers or {}).items()}
+        now = time.time()
+
+        if headers.get("x-ratelimit-remaining") == "0" and headers.get("x-ratelimit-reset"):
+            # Primary limit exhausted: wait for the window to reset
+            pause = max(1.0, float(headers["x-ratelimit-reset"]) - now + 1)
+        else:
+            # Secondary limit: honour Retry-After and back off concurrency
+            pause = float(headers.get("retry-after", 60))
+            with self._condition:
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+
+        with self._condition:
+            self._pause_until = max(self._pause_until, now + pause)
+            self._condition.notify_all()
+
+        logger.warning(f"GitHub rate limit hit, pausing requests for {pause:.0f}s (concurrency {self.limit})")
+        return pause
+
+    def _effective_limit(self) -> int:
+        """Scale concurrency down as the remaining primary budget runs low"""
+        remaining, _ = self._rate_limiting()
+        if remaining is None or remaining >= self.min_remaining * 2:
+            return self.limit
+        return max(1, min(self.limit, remaining * self.limit // (self.min_remaining * 2)))
+
+    def _check_primary_limit(self) -> None:
+        """Pause until the reset time once the remaining budget drops below the floor"""
+        remaining, reset_time = self._rate_limiting()
+        if remaining is not None and remaining < self.min_remaining and reset_time:
+            if reset_time > self._pause_until:
+                logger.warning(f"GitHub rate limit low ({remaining} left), pausing until reset")
+                self._pause_until = reset_time + 1
+
+    def _rate_limiting(self) -> Tuple[Optional[int], Optional[float]]:
+        """Read the last seen rate-limit headers without making a request"""
+        requester = self.github_client.requester
+        remaining, _ = requester.rate_limiting
+        if remaining < 0:
+            # No response seen yet
+            return None, None
+        return remaining, requester.rate_limiting_resettime
+
+
+class ConcurrentRepoScanner:
+    """Runs a blocking PyGithub call for many repositories on a bounded thread pool"""
+
+    def __init__(self, github_client: Github, max_workers: int = 8, min_remaining: int = 100,
+                 max_retries: int = 3, stop_event: Optional[threading.Event] = None):
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.governor = RateLimitGovernor(github_client, max_workers, min_remaining, stop_event=stop_event)
+
+    def scan(self, items: Iterable[Any], fn: Callable[[Any], Any],
+             key: Callable[[Any], str] = lambda repo: repo.full_name) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+        """
+        Apply `fn` to every item concurrently.
+        Returns ({key: result}, {key: exception}) for successes and failures.
+        """
+        results = {}
+        errors = {}
+        items = list(items)
+        if not items:
+            return results, errors
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="repo-scan") as executor:
+            futures = {executor.submit(self._call, fn, item): key(item) for item in items}
+            for future, item_key in futures.items():
+                try:
+                    results[item_key] = future.result()
+                except Exception as e:
+                    errors[item_key] = e
+
+        return results, errors
+
+    def _call(self, fn: Callable[[Any], Any], item: Any) -> Any:
+        """Call `fn` inside a governor slot, retrying after rate-limit pauses"""
+        for attempt in range(self.max_retries + 1):
+            self.governor.acquire()
+            success = False
+            try:
+                result = fn(item)
+                success = True
+                return result
+            except RateLimitExceededException as e:
+                if attempt == self.max_retries:
+                    raise
+                self.governor.on_rate_limited(e)
+            except GithubException as e:
+                # Some secondary limits surface as a plain 403
+                if e.status != 403 or "rate limit" not in str(e.data).lower() or attempt == self.max_retries:
+                    raise
+                self.governor.on_rate_limited(e)
+            finally:
+                self.governor.release(success)
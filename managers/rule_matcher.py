@@ -0,0 +1,234 @@
+import re
+import fnmatch
+import logging
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+
+logger = logging.getLogger(__name__)
+
+GLOB_PREFIX = "glob:"
+REGEX_PREFIX = "re:"
+
+class _AhoCorasick:
+    """Multi-pattern substring search in one pass over the text, independent of the pattern count"""
+
+    def __init__(self, words: Sequence[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]  # Pattern ids ending at each node (including via fail links)
+
+        for word_id, word in enumerate(words):
+            node = 0
+            for ch in word:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(word_id)
+
+        # Breadth-first pass to link every node to its longest proper suffix in the trie
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def _walk(self, text: str):
+        node = 0
+        for ch in text:
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            if self._out[node]:
+                yield self._out[node]
+
+    def first(self, text: str) -> Optional[int]:
+        """Id of a pattern found in the text (the one ending earliest), or None"""
+        for ids in self._walk(text):
+            return min(ids)
+        return None
+
+    def all(self, text: str) -> Set[int]:
+        """Ids of every pattern found in the text"""
+        found = set()
+        for ids in self._walk(text):
+            found.update(ids)
+        return found
+
+
+class _AnyOf:
+    """Fallback when patterns can't share one regex (e.g. one uses global inline flags)"""
+
+    def __init__(self, regexes: List[re.Pattern]):
+        self.regexes = regexes
+
+    def search(self, value: str) -> bool:
+        return any(regex.search(value) for regex in self.regexes)
+
+
+def _combine(regexes: List[re.Pattern]):
+    """One alternation over all regexes, or None if there are none"""
+    if not regexes:
+        return None
+    try:
+        return re.compile("|".join(f"(?:{regex.pattern})" for regex in regexes))
+    except re.error:
+        return _AnyOf(regexes)
+
+
+def _pattern_regex(pattern: str) -> str:
+    """Regex for a `glob:` (whole-string) or `re:` (search) pattern"""
+    if pattern.startswith(GLOB_PREFIX):
+        return "^" + fnmatch.translate(pattern[len(GLOB_PREFIX):])
+    return pattern[len(REGEX_PREFIX):]
+
+
+class PatternSet:
+    """
+    A compiled group of patterns, each one of:
+      - `glob:<pattern>`  shell-style match of the whole string (`glob:feature/*`)
+      - `re:<regex>`      regular expression searched anywhere (`re:^release-\\d+$`)
+      - plain text        a substring, or the exact value with `plain="exact"`
+
+    Plain values go into a hash set or an Aho-Corasick automaton and all
+    glob/regex patterns into one combined regex, so matching cost doesn't grow
+    with the number of patterns; results are also cached per value.
+    """
+
+    def __init__(self, patterns: Iterable[str], plain: str = "substring", cache_size: int = 4096):
+        if plain not in ("substring", "exact"):
+            raise ValueError(f"Unknown plain pattern mode: {plain}")
+        self.patterns = [pattern for pattern in patterns if isinstance(pattern, str)]
+        self.plain = plain
+
+        literals = [p for p in self.patterns if not p.startswith((GLOB_PREFIX, REGEX_PREFIX))]
+        self.exact_values = frozenset(literals) if plain == "exact" else frozenset()
+        self._match_all = plain == "substring" and "" in literals
+        self._literals = literals
+        self._automaton = _AhoCorasick(literals) if plain == "substring" and literals else None
+
+        self._expressions = []
+        for pattern in self.patterns:
+            if pattern.startswith((GLOB_PREFIX, REGEX_PREFIX)):
+                try:
+                    self._expressions.append((pattern, re.compile(_pattern_regex(pattern))))
+                except re.error as e:
+                    logger.error(f"Ignoring invalid pattern {pattern!r}: {e}")
+        self._combined = _combine([regex for _, regex in self._expressions])
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+
+    @property
+    def has_patterns(self) -> bool:
+        """True if any glob/regex pattern is present (so the set can't be enumerated)"""
+        return bool(self._expressions)
+
+    def __bool__(self) -> bool:
+        return bool(self.patterns)
+
+    def _match(self, value: str) -> Optional[str]:
+        """Return a pattern matching the value, or None"""
+        if self._match_all:
+            return ""
+        if value in self.exact_values:
+            return value
+        if self._automaton:
+            word_id = self._automaton.first(value)
+            if word_id is not None:
+                return self._literals[word_id]
+        if self._combined and self._combined.search(value):
+            # Only on a hit: find which pattern it was, for logging
+            for pattern, regex in self._expressions:
+                if regex.search(value):
+                    return pattern
+        return None
+
+
+class PatternIndex:
+    """
+    Maps many keyed pattern groups (e.g. one per post-merge script) and finds
+    every key whose patterns match a value in a single automaton pass plus one
+    combined-regex pre-check, instead of looping over every group.
+    A key registered with no patterns matches everything.
+    """
+
+    def __init__(self, cache_size: int = 4096):
+        self._keys: List[Any] = []
+        self._always: Set[int] = set()
+        self._literal_owner: List[int] = []
+        self._literals: List[str] = []
+        self._expressions: List[tuple] = []  # (key index, compiled regex)
+        self._automaton = None
+        self._combined = None
+        self.matching = lru_cache(maxsize=cache_size)(self._matching)
+
+    def add(self, key: Any, patterns: Iterable[str]) -> None:
+        index = len(self._keys)
+        self._keys.append(key)
+        patterns = [pattern for pattern in patterns if isinstance(pattern, str)]
+        if not patterns or "" in patterns:
+            self._always.add(index)
+            return
+        for pattern in patterns:
+            if pattern.startswith((GLOB_PREFIX, REGEX_PREFIX)):
+                try:
+                    self._expressions.append((index, re.compile(_pattern_regex(pattern))))
+                except re.error as e:
+                    logger.error(f"Ignoring invalid pattern {pattern!r}: {e}")
+            else:
+                self._literal_owner.append(index)
+                self._literals.append(pattern)
+
+    def build(self) -> "PatternIndex":
+        """Compile the added patterns; call once after the last `add`"""
+        self._automaton = _AhoCorasick(self._literals) if self._literals else None
+        self._combined = _combine([regex for _, regex in self._expressions])
+        self.matching.cache_clear()
+        return self
+
+    def _matching(self, value: str) -> tuple:
+        """Keys whose patterns match the value, in the order they were added"""
+        indexes = set(self._always)
+        if self._automaton:
+            indexes.update(self._literal_owner[word_id] for word_id in self._automaton.all(value))
+        if self._combined and self._combined.search(value):
+            indexes.update(index for index, regex in self._expressions
+                           if index not in indexes and regex.search(value))
+        return tuple(self._keys[index] for index in sorted(indexes))
+
+
+class RuleMatcher:
+    """Compiled branch/repository rules of an AutoBranchPRManager config, rebuilt once per config change"""
+
+    def __init__(self, config: Dict[str, Any]):
+        settings = config["auto_pr_settings"]
+        self.excluded_branches = PatternSet(settings["excluded_branches"])
+        self.included_repos = PatternSet(settings["included_repos"], plain="exact")
+
+        self.post_merge_scripts = PatternIndex()
+        for position, script in enumerate(config["post_merge_scripts"]["scripts"]):
+            if script.get("enabled", True):
+                self.post_merge_scripts.add(position, script.get("repo_patterns") or [])
+        self.post_merge_scripts.build()
+        self._scripts = config["post_merge_scripts"]["scripts"]
+
+    def excluded_branch_pattern(self, branch_name: str) -> Optional[str]:
+        """The exclusion pattern matching a branch, or None if PRs may be created for it"""
+        return self.excluded_branches.match(branch_name)
+
+    def repo_included(self, repo_name: str) -> bool:
+        """True if the repository is monitored (an empty inclusion list includes everything)"""
+        return not self.included_repos or self.included_repos.match(repo_name) is not None
+
+    def scripts_for_repo(self, repo_name: str) -> List[Dict[str, Any]]:
+        """Enabled post-merge scripts whose repo patterns match, in config order"""
+        return [self._scripts[position] for position in self.post_merge_scripts.matching(repo_name)]
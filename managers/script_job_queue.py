@@ -0,0 +1,318 @@
+import os
+import re
+import sys
+import signal
+import socket
+import logging
+import threading
+import time
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import RotatingFileHandler
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+class PostMergeJobQueue:
+    """
+    Runs post-merge scripts from the persistent `script_jobs` table.
+
+    - A dispatcher thread claims queued jobs (respecting each project's
+      `max_concurrent`) and hands them to a pool of `workers` threads.
+    - Each script is killed after its `timeout`.
+    - Output is streamed line by line to a rotating log file per project;
+      only the last `tail_lines` lines are kept in memory and stored on the job.
+    - Jobs survive restarts: queued jobs are picked up again on start. Jobs
+      left running by a dead process are failed every `stale_check_interval`
+      seconds: right away if it ran on this host, otherwise once past their
+      timeout. Until then they count against their project's limit.
+    """
+
+    def __init__(self, db_manager, workers: int = 2, log_dir: str = "logs/post_merge",
+                 poll_interval: float = 5.0, tail_lines: int = 50,
+                 log_max_bytes: int = 5 * 1024 * 1024, log_backup_count: int = 5,
+                 stale_check_interval: float = 60.0):
+        """Initialize the queue"""
+        self.db_manager = db_manager
+        self.workers = workers
+        self.log_dir = log_dir
+        self.poll_interval = poll_interval
+        self.tail_lines = tail_lines
+        self.log_max_bytes = log_max_bytes
+        self.log_backup_count = log_backup_count
+        self.stale_check_interval = stale_check_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.running = False
+        self._wakeup = threading.Event()
+        self._slots = threading.Semaphore(workers)
+        self._executor = None
+        self._dispatcher = None
+        self._loggers: Dict[str, logging.Logger] = {}
+        self._loggers_lock = threading.Lock()
+        self._active: Dict[int, Optional[subprocess.Popen]] = {}  # Running job id -> script process
+        self._interrupted = set()
+        self._active_changed = threading.Condition()
+
+    def start(self) -> bool:
+        """Start the dispatcher and worker pool"""
+        if self.running:
+            return False
+        self.running = True
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"  # Started after a fork, the pid differs
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="post-merge")
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="post-merge-dispatcher", daemon=True)
+        self._dispatcher.start()
+        logger.info(f"Post-merge job queue started with {self.workers} workers")
+        return True
+
+    def stop(self, wait: bool = False) -> None:
+        """Stop claiming jobs; running scripts finish (or time out) unless the process exits"""
+        if not self.running:
+            return
+        self.running = False
+        self._wakeup.set()
+        if self._dispatcher:
+            self._dispatcher.join(timeout=3)
+        if self._executor:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+        logger.info("Post-merge job queue stopped")
+
+    def drain(self, timeout: float = 30.0) -> Dict[str, int]:
+        """
+        Stop claiming jobs and give running scripts up to `timeout` seconds to
+        finish. Scripts still running then are killed and their jobs failed as
+        interrupted; jobs not claimed yet stay queued for the next start.
+        Returns {"drained": n, "dropped": n}.
+        """
+        deadline = time.monotonic() + timeout
+        self.stop()
+        with self._active_changed:
+            running = len(self._active)
+            self._active_changed.wait_for(lambda: not self._active, timeout=max(0.0, deadline - time.monotonic()))
+            stuck = dict(self._active)
+            self._interrupted.update(stuck)
+        
+        if stuck:
+            logger.warning(f"Interrupting {len(stuck)} post-merge job(s) still running at shutdown")
+            for process in stuck.values():
+                if process is not None:
+                    self._kill(process)
+            # Give the workers a moment to record the interrupted jobs
+            with self._active_changed:
+                self._active_changed.wait_for(lambda: not self._active, timeout=2)
+        return {"drained": running - len(stuck), "dropped": len(stuck)}
+
+    def submit(self, script: Dict[str, Any], repo_name: str, branch_name: str, pr_number: int,
+               default_timeout: int = 1800) -> int:
+        """Queue a script run. Returns the job id."""
+        job_id = self.db_manager.enqueue_script_job({
+            "project_name": script["project_name"],
+            "script_path": script["script_path"],
+            "timeout": int(script.get("timeout") or default_timeout),
+            "max_concurrent": int(script.get("max_concurrent") or 1),
+            "repository_full_name": repo_name,
+            "branch": branch_name,
+            "pr_number": pr_number,
+        })
+        logger.info(f"Queued post-merge job #{job_id} for {script['project_name']} ({repo_name}#{pr_number})")
+        self._wakeup.set()
+        return job_id
+
+    def _dispatch_loop(self) -> None:
+        """Claim jobs while worker slots are free; poll for jobs queued by other processes"""
+        next_stale_check = 0.0
+        while self.running:
+            if time.monotonic() >= next_stale_check:
+                self._fail_interrupted_jobs()
+                next_stale_check = time.monotonic() + self.stale_check_interval
+
+            self._wakeup.clear()
+            claimed = False
+            if self._slots.acquire(timeout=self.poll_interval):
+                try:
+                    job = self.db_manager.claim_script_job(self.worker_id)
+                except Exception as e:
+                    logger.error(f"Error claiming post-merge job: {e}")
+                    job = None
+
+                if job and self.running:
+                    self._executor.submit(self._run_job, job)
+                    claimed = True
+                else:
+                    if job:
+                        # Stopped while claiming: leave the job for the next start
+                        self._requeue(job)
+                    self._slots.release()
+
+            if not claimed:
+                self._wakeup.wait(self.poll_interval)
+
+    def _requeue(self, job: Dict[str, Any]) -> None:
+        try:
+            self.db_manager.requeue_script_job(job["id"], self.worker_id)
+            logger.info(f"Returned post-merge job #{job['id']} to the queue")
+        except Exception as e:
+            logger.error(f"Error requeuing post-merge job #{job['id']}: {e}")
+
+    def _fail_interrupted_jobs(self) -> None:
+        """Fail jobs whose worker died, freeing their project's concurrency slots"""
+        try:
+            host = socket.gethostname()
+            dead_workers = []
+            for worker in self.db_manager.get_script_job_workers():
+                worker_host, _, pid = (worker or "").rpartition(":")
+                if worker_host == host and worker != self.worker_id and pid.isdigit() and not self._pid_alive(int(pid)):
+                    dead_workers.append(worker)
+            failed = self.db_manager.fail_stale_script_jobs(dead_workers=dead_workers)
+            if failed:
+                logger.warning(f"Marked {failed} interrupted post-merge job(s) as failed")
+        except Exception as e:
+            logger.error(f"Error checking for interrupted post-merge jobs: {e}")
+
+    @staticmethod
+    def _pid_alive(pid: int) -> bool:
+        if os.name == "nt":
+            return True  # os.kill would terminate it; rely on the timeout instead
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _run_job(self, job: Dict[str, Any]) -> None:
+        """Run one claimed job and record its outcome (runs on the worker pool)"""
+        with self._active_changed:
+            self._active[job["id"]] = None
+        try:
+            self._execute(job)
+        except Exception as e:
+            logger.error(f"Error running post-merge job #{job['id']}: {e}")
+            try:
+                self.db_manager.finish_script_job(job["id"], "failed", error=str(e))
+            except Exception:
+                pass
+        finally:
+            with self._active_changed:
+                self._active.pop(job["id"], None)
+                self._interrupted.discard(job["id"])
+                self._active_changed.notify_all()
+            self._slots.release()
+            self._wakeup.set()
+
+    def _execute(self, job: Dict[str, Any]) -> None:
+        script_path = job["script_path"]
+        project_name = job["project_name"]
+        job_logger, log_file = self._project_logger(project_name)
+
+        # Set up environment variables for the script
+        env = os.environ.copy()
+        env["GITHUB_REPOSITORY"] = job["repository"] or ""
+        env["GITHUB_BRANCH"] = job["branch"] or ""
+        env["GITHUB_PR_NUMBER"] = str(job["pr_number"])
+        env["GITHUB_PROJECT"] = project_name
+        env["GITEVENTS_JOB_ID"] = str(job["id"])
+
+        if script_path.endswith(".py"):
+            command, shell = [sys.executable, script_path], False
+        elif script_path.endswith(".bat"):
+            command, shell = [script_path], True
+        else:
+            self.db_manager.finish_script_job(job["id"], "failed", error=f"Unsupported script type: {script_path}")
+            return
+
+        popen_kwargs = {}
+        if os.name == "nt":
+            popen_kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            popen_kwargs["start_new_session"] = True  # So a timeout kills the whole process group
+
+        job_logger.info(f"[job {job['id']}] Starting {script_path} for {job['repository']}#{job['pr_number']}")
+        process = subprocess.Popen(
+            command,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+            shell=shell,
+            **popen_kwargs
+        )
+        with self._active_changed:
+            self._active[job["id"]] = process
+            interrupted = job["id"] in self._interrupted
+        if interrupted:
+            self._kill(process)  # drain() gave up on this job while it was starting
+
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            self._kill(process)
+
+        timer = threading.Timer(job["timeout"], kill)
+        timer.daemon = True
+        timer.start()
+
+        tail = deque(maxlen=self.tail_lines)
+        try:
+            for line in process.stdout:
+                line = line.rstrip("\n")
+                tail.append(line)
+                job_logger.info(f"[job {job['id']}] {line}")
+            exit_code = process.wait()
+        finally:
+            timer.cancel()
+            process.stdout.close()
+
+        if job["id"] in self._interrupted:
+            status, error = "failed", "Interrupted by shutdown"
+        elif timed_out.is_set():
+            status, error = "timed_out", f"Script exceeded its {job['timeout']}s timeout"
+        elif exit_code == 0:
+            status, error = "succeeded", None
+        else:
+            status, error = "failed", f"Script exited with code {exit_code}"
+
+        job_logger.info(f"[job {job['id']}] Finished: {status} (exit code {exit_code})")
+        if status == "succeeded":
+            logger.info(f"Successfully executed post-merge script: {project_name} (job #{job['id']})")
+        else:
+            logger.error(f"Post-merge job #{job['id']} for {project_name} {status}: {error}")
+
+        self.db_manager.finish_script_job(
+            job["id"], status, exit_code=exit_code, error=error,
+            output_tail="\n".join(tail), log_file=log_file
+        )
+
+    @staticmethod
+    def _kill(process: subprocess.Popen) -> None:
+        """Kill a script and everything it started"""
+        try:
+            if os.name == "nt":
+                subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+            else:
+                os.killpg(process.pid, signal.SIGKILL)
+        except Exception:
+            process.kill()
+
+    def _project_logger(self, project_name: str):
+        """Get the logger writing to this project's rotating output log"""
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", project_name) or "project"
+        log_file = os.path.join(self.log_dir, f"{safe_name}.log")
+        with self._loggers_lock:
+            job_logger = self._loggers.get(safe_name)
+            if job_logger is None:
+                os.makedirs(self.log_dir, exist_ok=True)
+                job_logger = logging.getLogger(f"{__name__}.output.{safe_name}")
+                job_logger.setLevel(logging.INFO)
+                job_logger.propagate = False
+                handler = RotatingFileHandler(log_file, maxBytes=self.log_max_bytes,
+                                              backupCount=self.log_backup_count, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+                job_logger.addHandler(handler)
+                self._loggers[safe_name] = job_logger
+        return job_logger, log_file
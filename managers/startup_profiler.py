@@ -0,0 +1,106 @@
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+class _ImportTimer:
+    """
+    Meta path finder that times module execution. It finds nothing itself:
+    it asks the finders after it for the spec and wraps that spec's loader
+    instance, so modules keep their real loader class.
+    """
+
+    def __init__(self, profiler: "StartupProfiler"):
+        self.profiler = profiler
+
+    def find_spec(self, name, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is None:
+                continue
+            loader = spec.loader
+            # Built-in and frozen importers are classes shared by every module; leave them alone
+            if loader is not None and not isinstance(loader, type) and hasattr(loader, "exec_module") \
+                    and "exec_module" not in vars(loader):
+                loader.exec_module = self.profiler._timed(name, loader.exec_module)
+            return spec
+        return None
+
+
+class StartupProfiler:
+    """
+    Measures where startup time goes: how long each module takes to import
+    (cumulative, and excluding the modules it imports itself) and how long
+    named startup phases take. Used by `python main.py --profile-startup`.
+
+    Install it as early as possible; modules imported before `install()`
+    are not seen.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imports: Dict[str, List[float]] = {}  # {module: [cumulative, self]}
+        self.phases: List[Tuple[str, float]] = []
+        self._stack = threading.local()
+        self._finder: Optional[_ImportTimer] = None
+
+    def install(self) -> "StartupProfiler":
+        if self._finder is None:
+            self._finder = _ImportTimer(self)
+            sys.meta_path.insert(0, self._finder)
+        return self
+
+    def uninstall(self) -> None:
+        if self._finder is not None and self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+        self._finder = None
+
+    def _timed(self, name: str, exec_module):
+        def exec_and_time(module):
+            stack = self._stack.__dict__.setdefault("frames", [])
+            stack.append(0.0)  # Time spent importing nested modules
+            started = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                elapsed = time.perf_counter() - started
+                nested = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                self.imports[name] = [elapsed, elapsed - nested]
+        return exec_and_time
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a startup phase: `with profiler.phase("init database"): ...`"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def report(self, limit: int = 30) -> str:
+        """Phases in order, then the slowest modules and top-level packages"""
+        lines = ["Startup phases:"]
+        for name, elapsed in self.phases:
+            lines.append(f"  {elapsed * 1000:9.1f} ms  {name}")
+        lines.append(f"  {(time.perf_counter() - self.started) * 1000:9.1f} ms  total")
+
+        packages: Dict[str, float] = {}
+        for name, (_, own) in self.imports.items():
+            top = name.partition(".")[0]
+            packages[top] = packages.get(top, 0.0) + own
+        lines.append("")
+        lines.append(f"Import time by top-level package ({len(self.imports)} modules):")
+        for top, own in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:limit]:
+            lines.append(f"  {own * 1000:9.1f} ms  {top}")
+
+        lines.append("")
+        lines.append("Slowest modules (cumulative / self):")
+        slowest = sorted(self.imports.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+        for name, (cumulative, own) in slowest:
+            lines.append(f"  {cumulative * 1000:9.1f} ms {own * 1000:9.1f} ms  {name}")
+        return "\n".join(lines)
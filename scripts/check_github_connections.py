@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+GitEvents - GitHub Connection Reuse Check
+
+Points a PyGithub client with the conditional-request cache enabled at a
+local ETag-serving stub and checks that API calls reuse the client's
+persistent connection pool: sequential calls must share one TCP
+connection, concurrent calls at most `pool_size`, and repeated calls must
+be answered from the cache (304s).
+
+Exits non-zero if a check fails.
+
+Usage:
+    python scripts/check_github_connections.py [--calls 50] [--threads 8]
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from github import Github
+
+from managers.github_http_cache import enable_conditional_requests
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers GET /repos/<owner>/<name> with an ETag, keeping connections alive"""
+
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with StubHandler.lock:
+            StubHandler.connections += 1
+
+    def do_GET(self):
+        full_name = self.path.split("?")[0][len("/repos/"):]
+        body = json.dumps({"id": 1, "name": full_name.split("/")[-1], "full_name": full_name}).encode()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that GitHub API calls reuse pooled connections")
+    parser.add_argument("--calls", type=int, default=50, help="API calls per phase")
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent callers (and client pool size)")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = Github(base_url=f"http://127.0.0.1:{server.server_port}", pool_size=args.threads)
+    cache = enable_conditional_requests(client)
+
+    failures = []
+    for _ in range(args.calls):
+        client.get_repo("stub-org/repo")
+    sequential = StubHandler.connections
+    print(f"{args.calls} sequential calls: {sequential} connection(s)")
+    if sequential != 1:
+        failures.append(f"sequential calls opened {sequential} connections, expected 1")
+
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        list(executor.map(lambda i: client.get_repo(f"stub-org/repo-{i % 4}"), range(args.calls)))
+    concurrent = StubHandler.connections
+    print(f"{args.calls} calls from {args.threads} threads: {concurrent} connection(s) in total")
+    if concurrent > args.threads:
+        failures.append(f"concurrent calls opened {concurrent} connections, pool size is {args.threads}")
+
+    stats = cache.get_stats()
+    print(f"Cache: {stats['hits']} hits, {stats['misses']} misses")
+    if stats["hits"] < args.calls:
+        failures.append(f"only {stats['hits']} calls were answered from the cache")
+
+    server.shutdown()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+GitEvents - GitHub GraphQL Stub Server
+
+Serves the subset of the GitHub GraphQL API used by the GraphQL branch
+discovery (aliased repository refs/open pull requests, viewer repositories
+and rateLimit), backed by generated in-memory repositories, so discovery
+can be exercised offline.
+
+Usage:
+    python scripts/graphql_stub_server.py [--port 8765] [--repos 50] [--branches 120] [--open-prs 10]
+
+    Then set GITHUB_GRAPHQL_URL=http://localhost:8765/graphql
+
+Extra endpoints:
+    POST /stub/branches   {"repo": "stub-org/repo-0", "name": "feature-x", "sha": "..."}  add a branch
+    DELETE /stub/branches {"repo": "stub-org/repo-0", "name": "feature-x"}                remove a branch
+    GET  /stub/stats      query count and points spent
+"""
+
+import re
+import json
+import time
+import hashlib
+import argparse
+import logging
+import threading
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger("GitEvents-GraphQLStub")
+
+ALIAS_PATTERN = re.compile(r"^\s*(\w+): repository\(owner: \$(\w+), name: \$(\w+)\) \{(.*)\}\s*$", re.MULTILINE)
+CONNECTION_PATTERN = re.compile(r"(refs|pullRequests)\([^)]*first: (\d+), after: \$(\w+)\)")
+
+
+class StubState:
+    """In-memory repositories plus a point-based rate limit"""
+
+    def __init__(self, repos: int, branches: int, open_prs: int, owner: str, points: int):
+        self.lock = threading.Lock()
+        self.repositories = {}
+        for i in range(repos):
+            name = f"{owner}/repo-{i}"
+            branch_names = ["main"] + [f"feature-{j}" for j in range(branches - 1)]
+            self.repositories[name] = {
+                "branches": {branch: self._sha(name, branch) for branch in branch_names},
+                "open_pr_heads": branch_names[1:open_prs + 1],
+            }
+        self.points = points
+        self.remaining = points
+        self.reset_at = time.time() + 3600
+        self.queries = 0
+        self.spent = 0
+
+    @staticmethod
+    def _sha(repo: str, branch: str) -> str:
+        return hashlib.sha1(f"{repo}:{branch}".encode()).hexdigest()
+
+    def charge(self, connections: int) -> dict:
+        """Apply the GitHub cost formula and return the rateLimit field"""
+        cost = max(1, -(-connections // 100))
+        with self.lock:
+            if time.time() >= self.reset_at:
+                self.remaining = self.points
+                self.reset_at = time.time() + 3600
+            self.remaining = max(0, self.remaining - cost)
+            self.queries += 1
+            self.spent += cost
+            return {
+                "cost": cost,
+                "remaining": self.remaining,
+                "resetAt": datetime.fromtimestamp(self.reset_at, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }
+
+
+def paginate(items, first: int, after):
+    """Slice a list with opaque integer cursors"""
+    start = int(after) if after else 0
+    page = items[start:start + first]
+    end = start + len(page)
+    return page, {"hasNextPage": end < len(items), "endCursor": str(end) if page else after}
+
+
+def execute(state: StubState, query: str, variables: dict) -> dict:
+    """Resolve a query produced by GraphQLBranchDiscovery"""
+    data = {}
+    errors = []
+
+    if "viewer" in query:
+        names = sorted(state.repositories)
+        page, page_info = paginate(names, 100, variables.get("after"))
+        data["viewer"] = {"repositories": {"pageInfo": page_info, "nodes": [{"nameWithOwner": n} for n in page]}}
+        data["rateLimit"] = state.charge(1)
+        return {"data": data}
+
+    connections = 0
+    for alias, owner_var, name_var, body in ALIAS_PATTERN.findall(query):
+        full_name = f"{variables.get(owner_var)}/{variables.get(name_var)}"
+        repo = state.repositories.get(full_name)
+        if repo is None:
+            data[alias] = None
+            errors.append({
+                "type": "NOT_FOUND",
+                "path": [alias],
+                "message": f"Could not resolve to a Repository with the name '{full_name}'.",
+            })
+            continue
+
+        result = {"nameWithOwner": full_name}
+        for field, first, cursor_var in CONNECTION_PATTERN.findall(body):
+            connections += 1
+            if field == "refs":
+                items = sorted(repo["branches"].items())
+                page, page_info = paginate(items, int(first), variables.get(cursor_var))
+                result["refs"] = {
+                    "pageInfo": page_info,
+                    "nodes": [{"name": name, "target": {"oid": sha}} for name, sha in page],
+                }
+            else:
+                page, page_info = paginate(repo["open_pr_heads"], int(first), variables.get(cursor_var))
+                result["pullRequests"] = {"pageInfo": page_info, "nodes": [
+                    {"headRefName": h, "headRepositoryOwner": {"login": full_name.split("/")[0]}} for h in page
+                ]}
+        data[alias] = result
+
+    data["rateLimit"] = state.charge(connections)
+    response = {"data": data}
+    if errors:
+        response["errors"] = errors
+    return response
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self) -> dict:
+            length = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_POST(self):
+            if self.path == "/graphql":
+                if not self.headers.get("Authorization"):
+                    self._send(401, {"message": "This endpoint requires you to be authenticated."})
+                    return
+                request = self._read_json()
+                self._send(200, execute(state, request.get("query", ""), request.get("variables") or {}))
+            elif self.path == "/stub/branches":
+                request = self._read_json()
+                with state.lock:
+                    repo = state.repositories.setdefault(request["repo"], {"branches": {}, "open_pr_heads": []})
+                    repo["branches"][request["name"]] = request.get("sha") or state._sha(request["repo"], request["name"])
+                self._send(201, {"ok": True})
+            else:
+                self._send(404, {"message": "Not Found"})
+
+        def do_DELETE(self):
+            if self.path == "/stub/branches":
+                request = self._read_json()
+                with state.lock:
+                    state.repositories.get(request["repo"], {"branches": {}})["branches"].pop(request["name"], None)
+                self._send(200, {"ok": True})
+            else:
+                self._send(404, {"message": "Not Found"})
+
+        def do_GET(self):
+            if self.path == "/stub/stats":
+                self._send(200, {"queries": state.queries, "points_spent": state.spent, "remaining": state.remaining})
+            else:
+                self._send(404, {"message": "Not Found"})
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GitEvents - GitHub GraphQL stub server")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--owner", default="stub-org", help="Owner of the generated repositories")
+    parser.add_argument("--repos", type=int, default=50, help="Number of generated repositories")
+    parser.add_argument("--branches", type=int, default=120, help="Branches per repository (including main)")
+    parser.add_argument("--open-prs", type=int, default=10, help="Open pull requests per repository")
+    parser.add_argument("--points", type=int, default=5000, help="Rate limit points per hour")
+    args = parser.parse_args()
+
+    state = StubState(args.repos, args.branches, args.open_prs, args.owner, args.points)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    logger.info(f"GraphQL stub serving {args.repos} repositories on http://{args.host}:{args.port}/graphql")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
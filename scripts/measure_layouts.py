@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+GitEvents - Server Layout Measurements
+
+Starts the application in the two-server layout (`python main.py`) and in
+the combined layout (`python main.py --combined`) and reports, per layout:
+time until the API and webhook endpoints answer, resident memory after
+startup and after a burst of requests, and open handles on the database
+file (one set per engine/connection pool).
+
+Linux only (memory and file handles are read from /proc).
+
+Usage:
+    python scripts/measure_layouts.py [--runs 3] [--requests 200] [--layouts two-server combined]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import signal
+import argparse
+import tempfile
+import statistics
+import subprocess
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAYOUTS = {
+    "two-server": [],
+    "combined": ["--combined"],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get(url: str, timeout: float = 2.0) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except Exception:
+        return 0
+
+
+def post_webhook(url: str, delivery: int) -> int:
+    body = json.dumps({"zen": "Keep it logically awesome.", "hook_id": delivery}).encode()
+    request = urllib.request.Request(url, data=body, method="POST", headers={
+        "Content-Type": "application/json",
+        "X-GitHub-Event": "ping",
+        "X-GitHub-Delivery": str(delivery),
+    })
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
+            return response.status
+    except Exception:
+        return 0
+
+
+def rss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def db_handles(pid: int, db_path: str) -> int:
+    """Open file descriptors on the database file (including -wal/-journal files)"""
+    count = 0
+    fd_dir = f"/proc/{pid}/fd"
+    for fd in os.listdir(fd_dir):
+        try:
+            if os.readlink(os.path.join(fd_dir, fd)).startswith(db_path):
+                count += 1
+        except OSError:
+            pass
+    return count
+
+
+def measure(layout: str, requests: int) -> dict:
+    workdir = tempfile.mkdtemp(prefix=f"gitevents-{layout}-")
+    db_path = os.path.join(workdir, "github_events.db")
+    api_port = free_port()
+    webhook_port = api_port if layout == "combined" else free_port()
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": REPO_ROOT,
+        "API_PORT": str(api_port),
+        "WEBHOOK_PORT": str(webhook_port),
+        "GITHUB_EVENTS_DB": db_path,
+        "DB_TYPE": "sqlite",
+        "ENABLE_NGROK": "false",
+        "OPEN_BROWSER": "false",
+        "GITHUB_TOKEN": "",
+        "GITHUB_WEBHOOK_SECRET": "",
+        "API_RATE_LIMIT": "0",
+    })
+
+    api_url = f"http://127.0.0.1:{api_port}/api/repos"
+    health_url = f"http://127.0.0.1:{webhook_port}/webhook/health"
+    webhook_url = f"http://127.0.0.1:{webhook_port}/webhook/github"
+
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(REPO_ROOT, "main.py"), *LAYOUTS[layout]],
+                               cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while not (get(api_url) == 200 and get(health_url) == 200):
+            if process.poll() is not None:
+                raise RuntimeError(f"{layout} exited with code {process.returncode}")
+            if time.perf_counter() - started > 60:
+                raise RuntimeError(f"{layout} did not start within 60s")
+            time.sleep(0.05)
+        startup = time.perf_counter() - started
+        time.sleep(1)  # Let startup work settle
+        result = {"startup_s": startup, "rss_idle_mb": rss_kb(process.pid) / 1024,
+                  "db_handles": db_handles(process.pid, db_path)}
+
+        for i in range(requests):
+            get(api_url)
+            post_webhook(webhook_url, i)
+        result["rss_after_requests_mb"] = rss_kb(process.pid) / 1024
+        result["db_handles_after_requests"] = db_handles(process.pid, db_path)
+        return result
+    finally:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the two-server and combined server layouts")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per layout (medians are reported)")
+    parser.add_argument("--requests", type=int, default=200, help="API + webhook request pairs per run")
+    parser.add_argument("--layouts", nargs="+", choices=list(LAYOUTS), default=list(LAYOUTS),
+                        help="Layouts to measure")
+    args = parser.parse_args()
+
+    if not os.path.isdir("/proc/self"):
+        sys.exit("This script reads /proc and only runs on Linux")
+
+    print(f"{'layout':<12} {'startup s':>10} {'RSS idle MB':>12} {'RSS load MB':>12} {'DB handles':>11}")
+    for layout in args.layouts:
+        runs = [measure(layout, args.requests) for _ in range(args.runs)]
+        median = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        print(f"{layout:<12} {median['startup_s']:>10.2f} {median['rss_idle_mb']:>12.1f} "
+              f"{median['rss_after_requests_mb']:>12.1f} "
+              f"{median['db_handles']:>5.0f} -> {median['db_handles_after_requests']:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+GitEvents - Notification Receiver
+
+A local endpoint for notification sinks. It accepts the JSON batches posted
+by WebhookSink/ChatSink, counts them, and can simulate an unreliable
+endpoint. Use it to check sink configuration and to measure throughput.
+
+Usage:
+    python scripts/notification_receiver.py [--port 8766] [--fail-rate 0.2] [--latency 0.05]
+
+    Then add a sink such as {"type": "webhook", "url": "http://localhost:8766/notify"}
+
+    python scripts/notification_receiver.py --bench 20000 [--batch-size 50]
+    Starts the receiver, pushes that many notifications through a WebhookSink
+    and reports the throughput.
+
+Extra endpoints:
+    GET  /stats           notifications, batches and failures received
+    POST /control         {"down": true, "fail_rate": 0.5, "latency": 0.1}  change behaviour at runtime
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import logging
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger("GitEvents-NotificationReceiver")
+
+
+class ReceiverState:
+    """Counters plus the simulated failure behaviour"""
+
+    def __init__(self, fail_rate: float = 0.0, latency: float = 0.0):
+        self.lock = threading.Lock()
+        self.fail_rate = fail_rate
+        self.latency = latency
+        self.down = False
+        self.notifications = 0
+        self.batches = 0
+        self.failures = 0
+        self.started = time.time()
+
+    def stats(self) -> dict:
+        with self.lock:
+            elapsed = max(time.time() - self.started, 1e-9)
+            return {
+                "notifications": self.notifications,
+                "batches": self.batches,
+                "failures": self.failures,
+                "notifications_per_second": round(self.notifications / elapsed, 1),
+                "down": self.down,
+                "fail_rate": self.fail_rate,
+                "latency": self.latency,
+            }
+
+
+def make_handler(state: ReceiverState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like a real endpoint
+        disable_nagle_algorithm = True  # Headers and body are written separately
+
+        def _send(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self) -> dict:
+            length = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_POST(self):
+            if self.path == "/control":
+                request = self._read_json()
+                with state.lock:
+                    for key in ("down", "fail_rate", "latency"):
+                        if key in request:
+                            setattr(state, key, request[key])
+                self._send(200, state.stats())
+                return
+            if self.path != "/notify":
+                self._send(404, {"message": "Not Found"})
+                return
+
+            request = self._read_json()
+            if state.latency:
+                time.sleep(state.latency)
+            with state.lock:
+                if state.down or random.random() < state.fail_rate:
+                    state.failures += 1
+                    failed = True
+                else:
+                    # WebhookSink sends {"notifications": [...]}, ChatSink {"text": ...}
+                    state.notifications += len(request.get("notifications") or [request])
+                    state.batches += 1
+                    failed = False
+            self._send(503 if failed else 200, {"ok": not failed})
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send(200, state.stats())
+            else:
+                self._send(404, {"message": "Not Found"})
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return Handler
+
+
+def run_benchmark(server: ThreadingHTTPServer, state: ReceiverState, count: int, batch_size: int) -> None:
+    """Push `count` notifications through a WebhookSink and wait until all have arrived"""
+    from managers.notification_sinks import WebhookSink, notification_record
+
+    url = f"http://{server.server_address[0]}:{server.server_address[1]}/notify"
+    spool_dir = tempfile.mkdtemp(prefix="gitevents-spool-")
+    sink = WebhookSink(url, name="bench", batch_size=batch_size, flush_interval=0.05,
+                       queue_size=count, backoff=0.05, spool_dir=spool_dir)
+
+    started = time.perf_counter()
+    for i in range(count):
+        sink.send(notification_record(f"PR #{i} merged", "Benchmark notification", "pull_request:closed",
+                                      "bench/repo", f"https://github.com/bench/repo/pull/{i}"))
+    enqueued = time.perf_counter() - started
+
+    sink.close(timeout=60)
+    elapsed = time.perf_counter() - started
+    status = sink.get_status()
+    logger.info(f"Enqueued {count} notifications in {enqueued * 1000:.1f} ms")
+    logger.info(f"Delivered {state.notifications}/{count} in {elapsed:.2f}s "
+                f"({state.notifications / elapsed:.0f}/s, {state.batches} batches, "
+                f"{status['retries']} retries, {status['spooled']} spooled, {status['dropped']} dropped)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GitEvents - notification sink test receiver")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8766, help="Port to listen on (0 picks a free port)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering")
+    parser.add_argument("--bench", type=int, default=0, help="Send this many notifications through a WebhookSink and exit")
+    parser.add_argument("--batch-size", type=int, default=50, help="WebhookSink batch size for --bench")
+    args = parser.parse_args()
+
+    state = ReceiverState(args.fail_rate, args.latency)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    server.daemon_threads = True
+    logger.info(f"Notification receiver listening on http://{args.host}:{server.server_address[1]}/notify")
+
+    if args.bench:
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            run_benchmark(server, state, args.bench, args.batch_size)
+        finally:
+            server.shutdown()
+            server.server_close()
+        return
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()